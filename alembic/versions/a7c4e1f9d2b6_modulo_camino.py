@@ -0,0 +1,44 @@
+"""Camino materializado de la jerarquía de módulos
+
+Revision ID: a7c4e1f9d2b6
+Revises: f3a8d1c5b9e2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e1f9d2b6'
+down_revision: Union[str, None] = 'f3a8d1c5b9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('modulos', sa.Column('camino', sa.Text(), server_default='/', nullable=False))
+
+    # Caminos de los módulos existentes, recorriendo parent_id desde las raíces
+    op.execute(
+        'WITH RECURSIVE arbol (id, camino) AS ('
+        "  SELECT id, CAST('/' AS TEXT) FROM modulos WHERE parent_id IS NULL"
+        '  UNION ALL'
+        "  SELECT m.id, CAST(a.camino || a.id || '/' AS TEXT)"
+        '  FROM modulos m JOIN arbol a ON m.parent_id = a.id'
+        ') '
+        'UPDATE modulos SET camino = arbol.camino FROM arbol WHERE modulos.id = arbol.id'
+    )
+
+    # text_pattern_ops: LIKE 'prefijo%' usa el índice con cualquier collation
+    op.create_index(
+        'ix_modulos_camino', 'modulos', ['tenant_id', 'camino'], unique=False,
+        postgresql_ops={'camino': 'text_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_modulos_camino', table_name='modulos')
+    op.drop_column('modulos', 'camino')
@@ -0,0 +1,69 @@
+"""ON DELETE CASCADE en tablas intermedias y personas
+
+Revision ID: b3d9e2c47a10
+Revises: 6f1b1810c06a
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d9e2c47a10'
+down_revision: Union[str, None] = '6f1b1810c06a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tabla, columna, tabla referenciada, ON DELETE)
+FOREIGN_KEYS = [
+    ('usuario_rol', 'usuario_id', 'usuarios', 'CASCADE'),
+    ('usuario_rol', 'rol_id', 'roles', 'CASCADE'),
+    ('rol_permiso', 'rol_id', 'roles', 'CASCADE'),
+    ('rol_permiso', 'permiso_id', 'permisos', 'CASCADE'),
+    ('rol_modulo', 'rol_id', 'roles', 'CASCADE'),
+    ('rol_modulo', 'modulo_id', 'modulos', 'CASCADE'),
+    ('modulo_permiso', 'modulo_id', 'modulos', 'CASCADE'),
+    ('modulo_permiso', 'permiso_id', 'permisos', 'CASCADE'),
+    ('personas', 'usuario_id', 'usuarios', 'CASCADE'),
+    ('modulos', 'parent_id', 'modulos', 'SET NULL'),
+]
+
+
+def _recrear(ondelete: bool) -> None:
+    for tabla, columna, referida, accion in FOREIGN_KEYS:
+        nombre = f'{tabla}_{columna}_fkey'
+        op.drop_constraint(nombre, tabla, type_='foreignkey')
+        op.create_foreign_key(
+            nombre, tabla, referida, [columna], ['id'],
+            ondelete=accion if ondelete else None
+        )
+
+
+def upgrade() -> None:
+    _recrear(ondelete=True)
+    # Índices para que el borrado en cascada no recorra las tablas completas
+    op.create_index('ix_usuario_rol_usuario_id', 'usuario_rol', ['usuario_id'], unique=False)
+    op.create_index('ix_usuario_rol_rol_id', 'usuario_rol', ['rol_id'], unique=False)
+    op.create_index('ix_rol_permiso_rol_id', 'rol_permiso', ['rol_id'], unique=False)
+    op.create_index('ix_rol_permiso_permiso_id', 'rol_permiso', ['permiso_id'], unique=False)
+    op.create_index('ix_rol_modulo_rol_id', 'rol_modulo', ['rol_id'], unique=False)
+    op.create_index('ix_rol_modulo_modulo_id', 'rol_modulo', ['modulo_id'], unique=False)
+    op.create_index('ix_modulo_permiso_modulo_id', 'modulo_permiso', ['modulo_id'], unique=False)
+    op.create_index('ix_modulo_permiso_permiso_id', 'modulo_permiso', ['permiso_id'], unique=False)
+    op.create_index('ix_modulos_parent_id', 'modulos', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_modulos_parent_id', table_name='modulos')
+    op.drop_index('ix_modulo_permiso_permiso_id', table_name='modulo_permiso')
+    op.drop_index('ix_modulo_permiso_modulo_id', table_name='modulo_permiso')
+    op.drop_index('ix_rol_modulo_modulo_id', table_name='rol_modulo')
+    op.drop_index('ix_rol_modulo_rol_id', table_name='rol_modulo')
+    op.drop_index('ix_rol_permiso_permiso_id', table_name='rol_permiso')
+    op.drop_index('ix_rol_permiso_rol_id', table_name='rol_permiso')
+    op.drop_index('ix_usuario_rol_rol_id', table_name='usuario_rol')
+    op.drop_index('ix_usuario_rol_usuario_id', table_name='usuario_rol')
+    _recrear(ondelete=False)
@@ -0,0 +1,41 @@
+"""Vigencia de las asignaciones de roles: valid_from / valid_until
+
+Revision ID: b8e5f2a0c3d7
+Revises: a7c4e1f9d2b6
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e5f2a0c3d7'
+down_revision: Union[str, None] = 'a7c4e1f9d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# usuario_rol está particionada por HASH (tenant_id), ver e9b2c6d4f1a7
+PARTICIONES = 16
+
+
+def upgrade() -> None:
+    op.add_column('usuario_rol', sa.Column('valid_from', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('usuario_rol', sa.Column('valid_until', sa.DateTime(timezone=True), nullable=True))
+
+    # Parcial: solo las asignaciones temporales (las que lee el programador)
+    op.execute('CREATE INDEX ix_usuario_rol_valid_until ON ONLY usuario_rol (valid_until) WHERE valid_until IS NOT NULL')
+    for i in range(PARTICIONES):
+        op.execute(
+            f'CREATE INDEX ix_usuario_rol_valid_until_p{i} ON usuario_rol_p{i} (valid_until) '
+            'WHERE valid_until IS NOT NULL'
+        )
+        op.execute(f'ALTER INDEX ix_usuario_rol_valid_until ATTACH PARTITION ix_usuario_rol_valid_until_p{i}')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usuario_rol_valid_until', table_name='usuario_rol')
+    op.drop_column('usuario_rol', 'valid_until')
+    op.drop_column('usuario_rol', 'valid_from')
@@ -0,0 +1,31 @@
+"""Inicio pendiente de aviso en las asignaciones de roles
+
+Revision ID: c4f7a2d9e6b1
+Revises: b8e5f2a0c3d7
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f7a2d9e6b1'
+down_revision: Union[str, None] = 'b8e5f2a0c3d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'usuario_rol',
+        sa.Column('inicio_pendiente', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+    )
+    # Las que todavía no empezaron: el programador avisará su inicio
+    op.execute("UPDATE usuario_rol SET inicio_pendiente = true WHERE valid_from > now()")
+
+
+def downgrade() -> None:
+    op.drop_column('usuario_rol', 'inicio_pendiente')
@@ -0,0 +1,36 @@
+"""Índices del directorio de personas
+
+Revision ID: c8a41f5e92d3
+Revises: b3d9e2c47a10
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8a41f5e92d3'
+down_revision: Union[str, None] = 'b3d9e2c47a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filtros por ubicación (pais → estado → ciudad) y por ciudad sola
+    op.create_index('ix_personas_pais_estado_ciudad', 'personas', ['pais', 'estado_provincia', 'ciudad'], unique=False)
+    op.create_index('ix_personas_ciudad', 'personas', ['ciudad'], unique=False)
+    # Género + rango de edad, y rango de edad solo
+    op.create_index('ix_personas_genero_fecha_nacimiento', 'personas', ['genero', 'fecha_nacimiento'], unique=False)
+    op.create_index('ix_personas_fecha_nacimiento', 'personas', ['fecha_nacimiento'], unique=False)
+    # Orden de la página de resultados
+    op.create_index('ix_usuarios_nombre_completo', 'usuarios', ['nombre_completo'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usuarios_nombre_completo', table_name='usuarios')
+    op.drop_index('ix_personas_fecha_nacimiento', table_name='personas')
+    op.drop_index('ix_personas_genero_fecha_nacimiento', table_name='personas')
+    op.drop_index('ix_personas_ciudad', table_name='personas')
+    op.drop_index('ix_personas_pais_estado_ciudad', table_name='personas')
@@ -0,0 +1,48 @@
+"""Tabla de auditoría particionada por mes
+
+Revision ID: d5f0a7b3c1e8
+Revises: c8a41f5e92d3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f0a7b3c1e8'
+down_revision: Union[str, None] = 'c8a41f5e92d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Particionada por rango de ocurrido_en: la clave primaria debe incluirla
+    op.create_table('auditoria',
+    sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('ocurrido_en', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('accion', sa.String(length=30), nullable=False),
+    sa.Column('entidad', sa.String(length=50), nullable=False),
+    sa.Column('entidad_id', sa.Integer(), nullable=True),
+    sa.Column('antes', sa.JSON(), nullable=True),
+    sa.Column('despues', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'ocurrido_en'),
+    postgresql_partition_by='RANGE (ocurrido_en)'
+    )
+    op.create_index('ix_auditoria_actor_fecha', 'auditoria', ['actor_id', 'ocurrido_en'], unique=False)
+    op.create_index('ix_auditoria_entidad_fecha', 'auditoria', ['entidad', 'entidad_id', 'ocurrido_en'], unique=False)
+    op.create_index('ix_auditoria_ocurrido_en', 'auditoria', ['ocurrido_en'], unique=False)
+    # Las particiones mensuales las crea el escritor de auditoría por adelantado;
+    # la partición por defecto recibe lo que llegue sin partición propia
+    op.execute('CREATE TABLE auditoria_default PARTITION OF auditoria DEFAULT')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_auditoria_ocurrido_en', table_name='auditoria')
+    op.drop_index('ix_auditoria_entidad_fecha', table_name='auditoria')
+    op.drop_index('ix_auditoria_actor_fecha', table_name='auditoria')
+    # Borra también todas las particiones
+    op.drop_table('auditoria')
@@ -0,0 +1,214 @@
+"""Multi-tenant: tenant_id en todas las tablas y particiones por tenant
+
+Revision ID: e9b2c6d4f1a7
+Revises: d5f0a7b3c1e8
+Create Date: 2026-10-19 16:00:00.000000
+
+Los datos existentes pasan al tenant DEFAULT_TENANT. usuarios, personas y
+usuario_rol (las que crecen con la cantidad de usuarios) se recrean
+particionadas por HASH (tenant_id): una consulta con tenant_id = :tenant
+solo lee una partición. La clave primaria física de esas tablas pasa a ser
+(tenant_id, id).
+
+El downgrade solo es posible con un único tenant (los únicos vuelven a ser
+globales).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b2c6d4f1a7'
+down_revision: Union[str, None] = 'd5f0a7b3c1e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Particiones HASH (tenant_id) por tabla; cambiarlo exige recrear las tablas
+PARTICIONES = 16
+
+TABLAS = [
+    'usuarios', 'roles', 'modulos', 'permisos', 'personas',
+    'usuario_rol', 'rol_modulo', 'rol_permiso', 'modulo_permiso',
+]
+
+PARTICIONADAS = ['usuarios', 'personas', 'usuario_rol']
+
+# Índices de las tablas que se recrean (además de UNICOS e INDICES)
+INDICES_PROPIOS = {
+    'usuarios': [('ix_usuarios_id', ['id'])],
+    'personas': [('ix_personas_id', ['id'])],
+    'usuario_rol': [
+        ('ix_usuario_rol_id', ['id']),
+        ('ix_usuario_rol_usuario_id', ['usuario_id']),
+        ('ix_usuario_rol_rol_id', ['rol_id']),
+    ],
+}
+
+# Únicos que pasan a ser por tenant: (índice, tabla, columnas)
+UNICOS = [
+    ('ix_usuarios_username', 'usuarios', ['username']),
+    ('ix_usuarios_email', 'usuarios', ['email']),
+    ('ix_roles_nombre', 'roles', ['nombre']),
+    ('ix_modulos_nombre', 'modulos', ['nombre']),
+    ('ix_permisos_codigo', 'permisos', ['codigo']),
+    ('ix_permisos_nombre', 'permisos', ['nombre']),
+    ('ix_personas_dni', 'personas', ['dni']),
+    ('ix_personas_usuario_id', 'personas', ['usuario_id']),
+]
+
+# Índices de búsqueda que pasan a empezar por tenant_id
+INDICES = [
+    ('ix_usuarios_nombre_completo', 'usuarios', ['nombre_completo']),
+    ('ix_personas_pais_estado_ciudad', 'personas', ['pais', 'estado_provincia', 'ciudad']),
+    ('ix_personas_genero_fecha_nacimiento', 'personas', ['genero', 'fecha_nacimiento']),
+    ('ix_personas_ciudad', 'personas', ['ciudad']),
+    ('ix_personas_fecha_nacimiento', 'personas', ['fecha_nacimiento']),
+]
+
+# Destino de las claves foráneas compuestas en las tablas no particionadas
+TENANT_ID_ID = ['roles', 'modulos', 'permisos']
+
+# (tabla, columna, tabla referenciada): pasan a ser (tenant_id, columna) ->
+# (tenant_id, id), así una fila nunca apunta a otro tenant
+FOREIGN_KEYS = [
+    ('usuario_rol', 'usuario_id', 'usuarios'),
+    ('usuario_rol', 'rol_id', 'roles'),
+    ('rol_permiso', 'rol_id', 'roles'),
+    ('rol_permiso', 'permiso_id', 'permisos'),
+    ('rol_modulo', 'rol_id', 'roles'),
+    ('rol_modulo', 'modulo_id', 'modulos'),
+    ('modulo_permiso', 'modulo_id', 'modulos'),
+    ('modulo_permiso', 'permiso_id', 'permisos'),
+    ('personas', 'usuario_id', 'usuarios'),
+]
+
+
+def _recrear(tabla: str, particionada: bool) -> None:
+    """Copiar la tabla a una nueva, particionada por HASH (tenant_id) o sin particionar"""
+    anterior = f'{tabla}_anterior'
+    op.execute(f'ALTER TABLE {tabla} RENAME TO {anterior}')
+    # La secuencia del id sobrevive al DROP de la tabla anterior
+    op.execute(f'ALTER SEQUENCE {tabla}_id_seq OWNED BY NONE')
+    if particionada:
+        op.execute(f'CREATE TABLE {tabla} (LIKE {anterior} INCLUDING DEFAULTS) PARTITION BY HASH (tenant_id)')
+        for i in range(PARTICIONES):
+            op.execute(
+                f'CREATE TABLE {tabla}_p{i} PARTITION OF {tabla} '
+                f'FOR VALUES WITH (MODULUS {PARTICIONES}, REMAINDER {i})'
+            )
+        clave = 'tenant_id, id'
+    else:
+        op.execute(f'CREATE TABLE {tabla} (LIKE {anterior} INCLUDING DEFAULTS)')
+        clave = 'id'
+    op.execute(f'INSERT INTO {tabla} SELECT * FROM {anterior}')
+    op.execute(f'DROP TABLE {anterior}')
+    op.execute(f'ALTER SEQUENCE {tabla}_id_seq OWNED BY {tabla}.id')
+    op.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT {tabla}_pkey PRIMARY KEY ({clave})')
+
+
+def _crear_indice(nombre: str, tabla: str, columnas, unique: bool = False) -> None:
+    """
+    Índice en la tabla; en las particionadas, el de cada partición se llama
+    <nombre>_p<n> (app.services.integrity lo traduce al nombre del padre).
+    """
+    if tabla not in PARTICIONADAS:
+        op.create_index(nombre, tabla, columnas, unique=unique)
+        return
+    tipo = 'UNIQUE INDEX' if unique else 'INDEX'
+    lista = ', '.join(columnas)
+    op.execute(f'CREATE {tipo} {nombre} ON ONLY {tabla} ({lista})')
+    for i in range(PARTICIONES):
+        op.execute(f'CREATE {tipo} {nombre}_p{i} ON {tabla}_p{i} ({lista})')
+        op.execute(f'ALTER INDEX {nombre} ATTACH PARTITION {nombre}_p{i}')
+
+
+def upgrade() -> None:
+    op.create_table('tenants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=50), nullable=False),
+    sa.Column('nombre', sa.String(length=200), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tenants_id'), 'tenants', ['id'], unique=False)
+    op.create_index(op.f('ix_tenants_slug'), 'tenants', ['slug'], unique=True)
+    tenant_id = op.get_bind().execute(
+        sa.text('INSERT INTO tenants (slug, nombre, is_active) VALUES (:slug, :slug, true) RETURNING id'),
+        {'slug': settings.DEFAULT_TENANT}
+    ).scalar_one()
+
+    # Las claves foráneas se recrean compuestas al final
+    for tabla, columna, _ in FOREIGN_KEYS:
+        op.drop_constraint(f'{tabla}_{columna}_fkey', tabla, type_='foreignkey')
+    for nombre, tabla, _ in UNICOS + INDICES:
+        op.drop_index(nombre, table_name=tabla)
+
+    for tabla in TABLAS:
+        op.add_column(tabla, sa.Column('tenant_id', sa.Integer(), nullable=True))
+        op.execute(sa.text(f'UPDATE {tabla} SET tenant_id = :tenant_id').bindparams(tenant_id=tenant_id))
+        op.alter_column(tabla, 'tenant_id', nullable=False)
+
+    for tabla in PARTICIONADAS:
+        _recrear(tabla, particionada=True)
+        for nombre, columnas in INDICES_PROPIOS[tabla]:
+            _crear_indice(nombre, tabla, columnas)
+
+    for tabla in TABLAS:
+        op.create_foreign_key(f'{tabla}_tenant_id_fkey', tabla, 'tenants', ['tenant_id'], ['id'], ondelete='CASCADE')
+    for tabla in TENANT_ID_ID:
+        op.create_index(f'ix_{tabla}_tenant_id_id', tabla, ['tenant_id', 'id'], unique=True)
+    for tabla, columna, referida in FOREIGN_KEYS:
+        op.create_foreign_key(
+            f'{tabla}_{columna}_fkey', tabla, referida,
+            ['tenant_id', columna], ['tenant_id', 'id'], ondelete='CASCADE'
+        )
+    for nombre, tabla, columnas in UNICOS:
+        _crear_indice(nombre, tabla, ['tenant_id'] + columnas, unique=True)
+    for nombre, tabla, columnas in INDICES:
+        _crear_indice(nombre, tabla, ['tenant_id'] + columnas)
+
+    # Auditoría: sigue particionada por mes; el listado por tenant usa su índice
+    op.add_column('auditoria', sa.Column('tenant_id', sa.Integer(), nullable=True))
+    op.execute(sa.text('UPDATE auditoria SET tenant_id = :tenant_id').bindparams(tenant_id=tenant_id))
+    op.drop_index('ix_auditoria_ocurrido_en', table_name='auditoria')
+    op.create_index('ix_auditoria_tenant_fecha', 'auditoria', ['tenant_id', 'ocurrido_en'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_auditoria_tenant_fecha', table_name='auditoria')
+    op.create_index('ix_auditoria_ocurrido_en', 'auditoria', ['ocurrido_en'], unique=False)
+    op.drop_column('auditoria', 'tenant_id')
+
+    for nombre, tabla, _ in UNICOS + INDICES:
+        op.drop_index(nombre, table_name=tabla)
+    for tabla, columna, _ in FOREIGN_KEYS:
+        op.drop_constraint(f'{tabla}_{columna}_fkey', tabla, type_='foreignkey')
+    for tabla in TENANT_ID_ID:
+        op.drop_index(f'ix_{tabla}_tenant_id_id', table_name=tabla)
+    for tabla in TABLAS:
+        op.drop_constraint(f'{tabla}_tenant_id_fkey', tabla, type_='foreignkey')
+
+    for tabla in PARTICIONADAS:
+        _recrear(tabla, particionada=False)
+    for tabla in TABLAS:
+        op.drop_column(tabla, 'tenant_id')
+    for tabla in PARTICIONADAS:
+        for nombre, columnas in INDICES_PROPIOS[tabla]:
+            op.create_index(nombre, tabla, columnas, unique=False)
+
+    for nombre, tabla, columnas in UNICOS:
+        op.create_index(nombre, tabla, columnas, unique=True)
+    for nombre, tabla, columnas in INDICES:
+        op.create_index(nombre, tabla, columnas, unique=False)
+    for tabla, columna, referida in FOREIGN_KEYS:
+        op.create_foreign_key(f'{tabla}_{columna}_fkey', tabla, referida, [columna], ['id'], ondelete='CASCADE')
+
+    op.drop_index(op.f('ix_tenants_slug'), table_name='tenants')
+    op.drop_index(op.f('ix_tenants_id'), table_name='tenants')
+    op.drop_table('tenants')
@@ -0,0 +1,57 @@
+"""Jerarquía de roles: parent_id y clausura transitiva rol_jerarquia
+
+Revision ID: f3a8d1c5b9e2
+Revises: e9b2c6d4f1a7
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d1c5b9e2'
+down_revision: Union[str, None] = 'e9b2c6d4f1a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('roles', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('roles_parent_id_fkey', 'roles', 'roles', ['parent_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_roles_parent_id'), 'roles', ['parent_id'], unique=False)
+
+    op.create_table('rol_jerarquia',
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.Column('descendiente_id', sa.Integer(), nullable=False),
+    sa.Column('ancestro_id', sa.Integer(), nullable=False),
+    sa.Column('profundidad', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], name='rol_jerarquia_tenant_id_fkey', ondelete='CASCADE'),
+    # Compuestas como las de las demás tablas: ambos roles del mismo tenant
+    sa.ForeignKeyConstraint(
+        ['tenant_id', 'descendiente_id'], ['roles.tenant_id', 'roles.id'],
+        name='rol_jerarquia_descendiente_id_fkey', ondelete='CASCADE'
+    ),
+    sa.ForeignKeyConstraint(
+        ['tenant_id', 'ancestro_id'], ['roles.tenant_id', 'roles.id'],
+        name='rol_jerarquia_ancestro_id_fkey', ondelete='CASCADE'
+    ),
+    sa.PrimaryKeyConstraint('descendiente_id', 'ancestro_id')
+    )
+    op.create_index(op.f('ix_rol_jerarquia_ancestro_id'), 'rol_jerarquia', ['ancestro_id'], unique=False)
+
+    # Roles existentes: sin padre, solo la fila propia
+    op.execute(
+        'INSERT INTO rol_jerarquia (tenant_id, descendiente_id, ancestro_id, profundidad) '
+        'SELECT tenant_id, id, id, 0 FROM roles'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rol_jerarquia_ancestro_id'), table_name='rol_jerarquia')
+    op.drop_table('rol_jerarquia')
+    op.drop_index(op.f('ix_roles_parent_id'), table_name='roles')
+    op.drop_constraint('roles_parent_id_fkey', 'roles', type_='foreignkey')
+    op.drop_column('roles', 'parent_id')
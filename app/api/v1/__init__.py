@@ -1,11 +1,13 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, usuarios, roles, modulos, permisos, personas
+from app.core.responses import FastJSONResponse
+from app.api.v1 import auth, usuarios, roles, modulos, permisos, personas, auditoria
 
-api_router = APIRouter()
+api_router = APIRouter(default_response_class=FastJSONResponse)
 
 api_router.include_router(auth.router, prefix="/api/v1")
 api_router.include_router(usuarios.router, prefix="/api/v1")
 api_router.include_router(roles.router, prefix="/api/v1")
 api_router.include_router(modulos.router, prefix="/api/v1")
 api_router.include_router(permisos.router, prefix="/api/v1")
-api_router.include_router(personas.router, prefix="/api/v1")
\ No newline at end of file
+api_router.include_router(personas.router, prefix="/api/v1")
+api_router.include_router(auditoria.router, prefix="/api/v1")
\ No newline at end of file
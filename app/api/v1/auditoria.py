@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from app.core.database import get_db
+from app.core.responses import FastJSONResponse
+from app.core.security import get_current_superuser
+from app.schemas.auditoria import AuditoriaResponse
+from app.services.auditoria_service import AuditoriaService
+from app.models.usuario import Usuario
+
+router = APIRouter(prefix="/auditoria", tags=["Auditoría"])
+
+
+@router.get("", response_model=List[AuditoriaResponse])
+async def get_auditoria(
+    actor_id: Optional[int] = None,
+    entidad: Optional[str] = Query(None, description="Tabla: usuarios, roles, modulos, permisos"),
+    entidad_id: Optional[int] = None,
+    accion: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Consultar el registro de cambios (solo superusuarios)"""
+    registros = AuditoriaService.get_registros(
+        db,
+        actor_id=actor_id,
+        entidad=entidad,
+        entidad_id=entidad_id,
+        accion=accion,
+        desde=desde,
+        hasta=hasta,
+        skip=skip,
+        limit=limit
+    )
+    return FastJSONResponse([AuditoriaResponse.model_construct(**r) for r in registros])
@@ -1,93 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
-from app.core.database import get_db
+from typing import List, Optional, Tuple
+from app.core.database import SessionLocal, get_db
 from app.core.config import settings
+from app.core.login_throttle import login_throttle
+from app.core.tenancy import establecer_tenant, tenant_por_slug
+from app.core.responses import FastJSONResponse
 from app.core.security import (
     verify_password,
+    password_needs_rehash,
     create_access_token,
-    get_current_active_user
+    get_current_active_user,
+    oauth2_scheme,
+    usuario_desde_token
 )
 from app.schemas.usuario import UsuarioLogin, Token, UsuarioResponse
+from app.schemas.permiso import PermisoCheckRequest, PermisoCheckResponse
 from app.services.usuario_service import UsuarioService
+from app.services.eventos_acceso import eventos_acceso, flujo_sse
+from app.services.permisos_efectivos import verificar_permisos
 from app.models.usuario import Usuario
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
 
-@router.post("/login", response_model=Token)
-async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
-):
-    """Login de usuario"""
-    user = UsuarioService.get_usuario_by_username(db, form_data.username)
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
+def _client_ip(request: Request) -> Optional[str]:
+    """IP del cliente que hace la petición"""
+    return request.client.host if request.client else None
+
+
+def _tenant_slug(request: Request) -> str:
+    """Tenant del login: cabecera TENANT_HEADER o el tenant por defecto"""
+    return request.headers.get(settings.TENANT_HEADER) or settings.DEFAULT_TENANT
+
+
+def _autenticar_usuario(
+    db: Session,
+    tenant_slug: str,
+    username: str,
+    password: str,
+    background_tasks: BackgroundTasks,
+    client_ip: Optional[str]
+) -> Usuario:
+    """Validar credenciales y programar el rehash si el hash está obsoleto"""
+    # El mismo username puede existir en varios tenants
+    clave_usuario = f"{tenant_slug}/{username}"
+
+    # Rechazar antes de verificar la contraseña si hay demasiados intentos
+    espera = login_throttle.check(clave_usuario, client_ip)
+    if espera is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos de login. Intente más tarde.",
+            headers={"Retry-After": str(math.ceil(espera))},
+        )
+
+    tenant = tenant_por_slug(db, tenant_slug)
+    user = None
+    if tenant is not None:
+        establecer_tenant(db, tenant.id)
+        user = UsuarioService.get_usuario_by_username(db, username)
+
+    if not user or not verify_password(password, user.hashed_password):
+        login_throttle.register_failure(clave_usuario, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Usuario inactivo"
         )
-    
+
+    login_throttle.register_success(clave_usuario, client_ip)
+
+    # Recalcular el hash fuera del request si cambió el esquema o el coste
+    if password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(
+            UsuarioService.rehash_password, user.id, user.hashed_password, password
+        )
+
+    return user
+
+
+def _emitir_token(db: Session, user: Usuario) -> FastJSONResponse:
+    """Generar token de acceso y registrar el login"""
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.id},
+        data={"sub": user.username, "user_id": user.id, "tid": user.tenant_id},
         expires_delta=access_token_expires
     )
-    
+
     # Actualizar último login
     UsuarioService.update_last_login(db, user)
-    
-    return {
+
+    return FastJSONResponse({
         "access_token": access_token,
         "token_type": "bearer",
         "user": UsuarioResponse.model_validate(user)
-    }
+    })
+
+
+@router.post("/login", response_model=Token)
+async def login(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Login de usuario (el tenant se indica en la cabecera X-Tenant)"""
+    user = _autenticar_usuario(
+        db, _tenant_slug(request), form_data.username, form_data.password,
+        background_tasks, _client_ip(request)
+    )
+    return _emitir_token(db, user)
 
 
 @router.post("/login/json", response_model=Token)
 async def login_json(
     credentials: UsuarioLogin,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    """Login de usuario (JSON)"""
-    user = UsuarioService.get_usuario_by_username(db, credentials.username)
-    
-    if not user or not verify_password(credentials.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario o contraseña incorrectos",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Usuario inactivo"
-        )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.id},
-        expires_delta=access_token_expires
+    """Login de usuario (JSON; el tenant se indica en la cabecera X-Tenant)"""
+    user = _autenticar_usuario(
+        db, _tenant_slug(request), credentials.username, credentials.password,
+        background_tasks, _client_ip(request)
     )
-    
-    # Actualizar último login
-    UsuarioService.update_last_login(db, user)
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": UsuarioResponse.model_validate(user)
-    }
+    return _emitir_token(db, user)
 
 
 @router.get("/me", response_model=UsuarioResponse)
@@ -95,4 +144,74 @@ async def get_current_user_info(
     current_user: Usuario = Depends(get_current_active_user)
 ):
     """Obtener información del usuario actual"""
-    return UsuarioResponse.model_validate(current_user)
+    return FastJSONResponse(UsuarioResponse.model_validate(current_user))
+
+
+@router.post("/check", response_model=PermisoCheckResponse)
+async def check_permisos(
+    consulta: PermisoCheckRequest,
+    current_user: Usuario = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Verificar varios códigos de permiso de una vez (p. ej. para mostrar u
+    ocultar acciones en el frontend). Con `usuario_id` se consulta otro
+    usuario (solo superusuarios).
+    """
+    usuario = current_user
+    if consulta.usuario_id is not None and consulta.usuario_id != current_user.id:
+        if not current_user.is_superuser:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos suficientes"
+            )
+        usuario = UsuarioService.get_usuario(db, consulta.usuario_id)
+        if usuario is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado"
+            )
+
+    permisos = verificar_permisos(db, usuario, consulta.codigos)
+    return FastJSONResponse(PermisoCheckResponse.model_construct(usuario_id=usuario.id, permisos=permisos))
+
+
+def _suscriptor(token: str) -> Tuple[int, List[int]]:
+    """Usuario del token y sus roles activos, con una sesión que se cierra enseguida"""
+    db = SessionLocal()
+    try:
+        user = usuario_desde_token(db, token)
+        return user.id, UsuarioService.get_rol_ids(db, user.id)
+    finally:
+        db.close()
+
+
+@router.get("/me/eventos", response_class=StreamingResponse)
+async def eventos_acceso_stream(token: str = Depends(oauth2_scheme)):
+    """
+    Cambios de acceso del usuario actual como Server-Sent Events: roles
+    reasignados (`roles`), roles o módulos modificados (`rol`, `permisos`,
+    `modulos`), cuenta desactivada o eliminada (`cuenta`) y `resync` si el
+    cliente se quedó atrás. Al recibir un evento, volver a consultar /auth/me.
+
+    No usa get_db: la sesión se cierra antes de empezar el stream, así una
+    conexión abierta durante horas no retiene una conexión del pool.
+    """
+    usuario_id, rol_ids = await run_in_threadpool(_suscriptor, token)
+    suscripcion = eventos_acceso.suscribir(usuario_id, rol_ids)
+    if suscripcion is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas conexiones de eventos",
+            headers={"Retry-After": str(math.ceil(settings.SSE_HEARTBEAT_SECONDS))},
+        )
+
+    return StreamingResponse(
+        flujo_sse(suscripcion),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: no bufferizar el stream
+            "Content-Encoding": "identity",  # GZipMiddleware no retiene los eventos
+        }
+    )
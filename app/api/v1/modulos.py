@@ -1,15 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.batch import parse_ids, validar_ids, ordenar_por_ids
 from app.core.database import get_db
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_active_user, get_current_superuser
-from app.schemas.modulo import ModuloCreate, ModuloUpdate, ModuloResponse, ModuloWithRelations
+from app.schemas.batch import BatchResponse, BulkUpdateResponse
+from app.schemas.modulo import ModuloCreate, ModuloUpdate, ModuloResponse, ModuloWithRelations, ModuloBulkUpdate
+from app.schemas.permiso import PermisoSimple
 from app.services.modulo_service import ModuloService
+from app.models.modulo import Modulo
 from app.models.usuario import Usuario
 
 router = APIRouter(prefix="/modulos", tags=["Módulos"])
 
 
+def _modulo_con_relaciones(db: Session, modulo: Modulo) -> ModuloWithRelations:
+    """Construir la respuesta con permisos, conteo de usuarios e hijos"""
+    base = ModuloResponse.model_validate(modulo)
+
+    # Los campos ya están validados: construcción directa sin otra pasada
+    return ModuloWithRelations.model_construct(
+        **dict(base),
+        permisos=[PermisoSimple.model_validate(mp.permiso) for mp in modulo.permisos if mp.is_active],
+        usuarios_count=ModuloService.count_usuarios(db, modulo.id),
+        children=[ModuloResponse.model_validate(child) for child in modulo.children]
+    )
+
+
 @router.get("", response_model=List[ModuloResponse])
 async def get_modulos(
     skip: int = Query(0, ge=0),
@@ -23,7 +41,37 @@ async def get_modulos(
     modulos = ModuloService.get_modulos(
         db, skip=skip, limit=limit, is_active=is_active, parent_id=parent_id
     )
-    return [ModuloResponse.model_validate(m) for m in modulos]
+    return FastJSONResponse([ModuloResponse.model_construct(**m) for m in modulos])
+
+
+def _modulos_por_ids(db: Session, ids: List[int]) -> FastJSONResponse:
+    """Respuesta de lote: módulos en el orden pedido y los ids inexistentes"""
+    ids = validar_ids(ids)
+    filas, faltantes = ordenar_por_ids(ModuloService.get_modulos_by_ids(db, ids), ids)
+    return FastJSONResponse(BatchResponse[ModuloResponse].model_construct(
+        items=[ModuloResponse.model_construct(**f) for f in filas],
+        missing=faltantes
+    ))
+
+
+@router.get("/batch", response_model=BatchResponse[ModuloResponse])
+async def get_modulos_batch(
+    ids: str = Query(..., description="Ids separados por coma (ej. 1,2,3)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios módulos por ID en una sola consulta (en el orden pedido)"""
+    return _modulos_por_ids(db, parse_ids(ids))
+
+
+@router.post("/batch", response_model=BatchResponse[ModuloResponse])
+async def post_modulos_batch(
+    ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios módulos por ID (lista en el cuerpo, para lotes grandes)"""
+    return _modulos_por_ids(db, ids)
 
 
 @router.get("/{modulo_id}", response_model=ModuloWithRelations)
@@ -39,15 +87,30 @@ async def get_modulo(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Módulo no encontrado"
         )
-    
-    from app.schemas.permiso import PermisoSimple
-    
-    response = ModuloWithRelations.model_validate(modulo)
-    response.permisos = [PermisoSimple.model_validate(mp.permiso) for mp in modulo.permisos if mp.is_active]
-    response.usuarios_count = len([um for um in modulo.usuarios if um.is_active])
-    response.children = [ModuloResponse.model_validate(child) for child in modulo.children]
-    
-    return response
+
+    return FastJSONResponse(_modulo_con_relaciones(db, modulo))
+
+
+@router.get("/{modulo_id}/submodulos", response_model=List[ModuloResponse])
+async def get_submodulos(
+    modulo_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Todo el subárbol del módulo (ordenado por camino y orden)"""
+    modulos = ModuloService.get_submodulos(db, modulo_id)
+    return FastJSONResponse([ModuloResponse.model_construct(**m) for m in modulos])
+
+
+@router.get("/{modulo_id}/breadcrumb", response_model=List[ModuloResponse])
+async def get_breadcrumb(
+    modulo_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Ancestros del módulo desde la raíz, terminando en el propio módulo"""
+    modulos = ModuloService.get_ancestros(db, modulo_id)
+    return FastJSONResponse([ModuloResponse.model_construct(**m) for m in modulos])
 
 
 @router.post("", response_model=ModuloResponse, status_code=status.HTTP_201_CREATED)
@@ -58,7 +121,10 @@ async def create_modulo(
 ):
     """Crear nuevo módulo"""
     nuevo_modulo = ModuloService.create_modulo(db, modulo)
-    return ModuloResponse.model_validate(nuevo_modulo)
+    return FastJSONResponse(
+        ModuloResponse.model_validate(nuevo_modulo),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.put("/{modulo_id}", response_model=ModuloResponse)
@@ -70,7 +136,18 @@ async def update_modulo(
 ):
     """Actualizar módulo"""
     modulo = ModuloService.update_modulo(db, modulo_id, modulo_update)
-    return ModuloResponse.model_validate(modulo)
+    return FastJSONResponse(ModuloResponse.model_validate(modulo))
+
+
+@router.patch("", response_model=BulkUpdateResponse)
+async def bulk_update_modulos(
+    datos: ModuloBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Actualizar módulos en lote (ids o filtro + cambios) con un único UPDATE"""
+    afectados = ModuloService.bulk_update_modulos(db, datos)
+    return FastJSONResponse(BulkUpdateResponse(affected=afectados))
 
 
 @router.delete("/{modulo_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -93,11 +170,4 @@ async def asignar_permisos_modulo(
 ):
     """Asignar permisos a módulo"""
     modulo = ModuloService.asignar_permisos(db, modulo_id, permiso_ids)
-    
-    from app.schemas.permiso import PermisoSimple
-    
-    response = ModuloWithRelations.model_validate(modulo)
-    response.permisos = [PermisoSimple.model_validate(mp.permiso) for mp in modulo.permisos if mp.is_active]
-    response.usuarios_count = len([um for um in modulo.usuarios if um.is_active])
-    
-    return response
+    return FastJSONResponse(_modulo_con_relaciones(db, modulo))
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.batch import parse_ids, validar_ids, ordenar_por_ids
 from app.core.database import get_db
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_active_user, get_current_superuser
-from app.schemas.permiso import PermisoCreate, PermisoUpdate, PermisoResponse, PermisoWithRelations
+from app.schemas.batch import BatchResponse, BulkUpdateResponse
+from app.schemas.permiso import PermisoCreate, PermisoUpdate, PermisoResponse, PermisoWithRelations, PermisoBulkUpdate
 from app.services.permiso_service import PermisoService
 from app.models.usuario import Usuario
 
@@ -20,7 +23,37 @@ async def get_permisos(
 ):
     """Obtener lista de permisos"""
     permisos = PermisoService.get_permisos(db, skip=skip, limit=limit, is_active=is_active)
-    return [PermisoResponse.model_validate(p) for p in permisos]
+    return FastJSONResponse([PermisoResponse.model_construct(**p) for p in permisos])
+
+
+def _permisos_por_ids(db: Session, ids: List[int]) -> FastJSONResponse:
+    """Respuesta de lote: permisos en el orden pedido y los ids inexistentes"""
+    ids = validar_ids(ids)
+    filas, faltantes = ordenar_por_ids(PermisoService.get_permisos_by_ids(db, ids), ids)
+    return FastJSONResponse(BatchResponse[PermisoResponse].model_construct(
+        items=[PermisoResponse.model_construct(**f) for f in filas],
+        missing=faltantes
+    ))
+
+
+@router.get("/batch", response_model=BatchResponse[PermisoResponse])
+async def get_permisos_batch(
+    ids: str = Query(..., description="Ids separados por coma (ej. 1,2,3)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios permisos por ID en una sola consulta (en el orden pedido)"""
+    return _permisos_por_ids(db, parse_ids(ids))
+
+
+@router.post("/batch", response_model=BatchResponse[PermisoResponse])
+async def post_permisos_batch(
+    ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios permisos por ID (lista en el cuerpo, para lotes grandes)"""
+    return _permisos_por_ids(db, ids)
 
 
 @router.get("/{permiso_id}", response_model=PermisoWithRelations)
@@ -37,11 +70,14 @@ async def get_permiso(
             detail="Permiso no encontrado"
         )
     
-    response = PermisoWithRelations.model_validate(permiso)
-    response.roles_count = len([rp for rp in permiso.roles if rp.is_active])
-    response.modulos_count = len([mp for mp in permiso.modulos if mp.is_active])
-    
-    return response
+    # Los campos ya están validados: construcción directa sin otra pasada
+    response = PermisoWithRelations.model_construct(
+        **dict(PermisoResponse.model_validate(permiso)),
+        roles_count=len([rp for rp in permiso.roles if rp.is_active]),
+        modulos_count=len([mp for mp in permiso.modulos if mp.is_active])
+    )
+
+    return FastJSONResponse(response)
 
 
 @router.post("", response_model=PermisoResponse, status_code=status.HTTP_201_CREATED)
@@ -52,7 +88,10 @@ async def create_permiso(
 ):
     """Crear nuevo permiso"""
     nuevo_permiso = PermisoService.create_permiso(db, permiso)
-    return PermisoResponse.model_validate(nuevo_permiso)
+    return FastJSONResponse(
+        PermisoResponse.model_validate(nuevo_permiso),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.put("/{permiso_id}", response_model=PermisoResponse)
@@ -64,7 +103,18 @@ async def update_permiso(
 ):
     """Actualizar permiso"""
     permiso = PermisoService.update_permiso(db, permiso_id, permiso_update)
-    return PermisoResponse.model_validate(permiso)
+    return FastJSONResponse(PermisoResponse.model_validate(permiso))
+
+
+@router.patch("", response_model=BulkUpdateResponse)
+async def bulk_update_permisos(
+    datos: PermisoBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Actualizar permisos en lote (ids o filtro + cambios) con un único UPDATE"""
+    afectados = PermisoService.bulk_update_permisos(db, datos)
+    return FastJSONResponse(BulkUpdateResponse(affected=afectados))
 
 
 @router.delete("/{permiso_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,21 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.fields import parse_fields
+from app.core.responses import FastJSONResponse, archivo_response
 from app.core.security import get_current_active_user, get_current_superuser
 from app.schemas.persona import (
     PersonaCreate,
     PersonaUpdate,
-    PersonaResponse
+    PersonaResponse,
+    PersonaFiltros,
+    PersonaDirectorioItem,
+    PersonaDirectorioResponse,
+    FacetaValor,
+    PersonaBulkUpsert,
+    PersonaBulkResponse,
+    PersonaBulkConflicto
 )
+from app.models.persona import Genero
 from app.services.persona_service import PersonaService
+from app.services import foto_storage
+from app.services.thumbnails import thumbnails
+from app.models.persona import Persona
 from app.models.usuario import Usuario
 
 router = APIRouter(prefix="/personas", tags=["Personas"])
 
+# Campos que se pueden pedir con ?fields=
+CAMPOS_PERSONA = list(PersonaResponse.model_fields)
+
+
+def _persona_respuesta(persona: Persona, campos: Optional[List[str]]) -> FastJSONResponse:
+    """Respuesta completa o solo los campos pedidos (ya cargados con load_only)"""
+    if campos is None:
+        return FastJSONResponse(PersonaResponse.model_validate(persona))
+    return FastJSONResponse({campo: getattr(persona, campo) for campo in campos})
+
+
+@router.get("", response_model=PersonaDirectorioResponse)
+async def buscar_personas(
+    ciudad: Optional[str] = None,
+    estado_provincia: Optional[str] = None,
+    pais: Optional[str] = None,
+    genero: Optional[Genero] = None,
+    edad_min: Optional[int] = Query(None, ge=0, le=150),
+    edad_max: Optional[int] = Query(None, ge=0, le=150),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Directorio de personas con filtros y conteos por faceta"""
+    try:
+        filtros = PersonaFiltros(
+            ciudad=ciudad,
+            estado_provincia=estado_provincia,
+            pais=pais,
+            genero=genero,
+            edad_min=edad_min,
+            edad_max=edad_max
+        )
+    except ValidationError as e:
+        # Validación entre parámetros (edad_min > edad_max): 422 como la del resto
+        raise RequestValidationError([
+            {**error, "loc": ("query", *error["loc"])}
+            for error in e.errors(include_url=False, include_context=False)
+        ])
+    total, items, facetas = PersonaService.buscar_directorio(db, filtros, skip=skip, limit=limit)
+
+    return FastJSONResponse(PersonaDirectorioResponse.model_construct(
+        total=total,
+        items=[PersonaDirectorioItem.model_construct(**item) for item in items],
+        facetas={
+            faceta: [FacetaValor.model_construct(valor=valor, total=n) for valor, n in valores]
+            for faceta, valores in facetas.items()
+        }
+    ))
+
+
+@router.post("/bulk", response_model=PersonaBulkResponse)
+async def bulk_upsert_personas(
+    datos: PersonaBulkUpsert,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """
+    Crear o actualizar personas en lote (clave: usuario_id).
+    Las filas en conflicto (usuario inexistente, DNI repetido o en uso) no se
+    aplican y se devuelven en `conflicts`.
+    """
+    creadas, actualizadas, conflictos = PersonaService.bulk_upsert_personas(db, datos.items)
+    return FastJSONResponse(PersonaBulkResponse.model_construct(
+        created=creadas,
+        updated=actualizadas,
+        conflicts=[PersonaBulkConflicto.model_construct(**c) for c in conflictos]
+    ))
+
 
 @router.get("/usuario/{usuario_id}", response_model=PersonaResponse)
 async def get_persona_usuario(
     usuario_id: int,
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (ej. id,dni,ciudad)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_active_user)
 ):
@@ -27,30 +117,33 @@ async def get_persona_usuario(
             detail="No tienes permisos para ver estos datos"
         )
     
-    persona = PersonaService.get_persona(db, usuario_id)
+    campos = parse_fields(fields, CAMPOS_PERSONA)
+    persona = PersonaService.get_persona(db, usuario_id, campos)
     if not persona:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Persona no encontrada"
         )
     
-    return PersonaResponse.model_validate(persona)
+    return _persona_respuesta(persona, campos)
 
 
 @router.get("/me", response_model=PersonaResponse)
 async def get_mi_persona(
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (ej. id,dni,ciudad)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     """Obtener mi propia persona"""
-    persona = PersonaService.get_persona(db, current_user.id)
+    campos = parse_fields(fields, CAMPOS_PERSONA)
+    persona = PersonaService.get_persona(db, current_user.id, campos)
     if not persona:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No tienes datos personales registrados"
         )
     
-    return PersonaResponse.model_validate(persona)
+    return _persona_respuesta(persona, campos)
 
 
 @router.post("/usuario/{usuario_id}", response_model=PersonaResponse, status_code=status.HTTP_201_CREATED)
@@ -69,7 +162,10 @@ async def create_persona(
         )
     
     persona = PersonaService.create_persona(db, usuario_id, datos)
-    return PersonaResponse.model_validate(persona)
+    return FastJSONResponse(
+        PersonaResponse.model_validate(persona),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.post("/me", response_model=PersonaResponse, status_code=status.HTTP_201_CREATED)
@@ -80,7 +176,10 @@ async def create_mi_persona(
 ):
     """Crear mi propia persona"""
     persona = PersonaService.create_persona(db, current_user.id, datos)
-    return PersonaResponse.model_validate(persona)
+    return FastJSONResponse(
+        PersonaResponse.model_validate(persona),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.put("/usuario/{usuario_id}", response_model=PersonaResponse)
@@ -99,7 +198,7 @@ async def update_persona(
         )
     
     persona = PersonaService.update_persona(db, usuario_id, datos_update)
-    return PersonaResponse.model_validate(persona)
+    return FastJSONResponse(PersonaResponse.model_validate(persona))
 
 
 @router.put("/me", response_model=PersonaResponse)
@@ -110,7 +209,110 @@ async def update_mi_persona(
 ):
     """Actualizar mi propia persona"""
     persona = PersonaService.update_persona(db, current_user.id, datos_update)
-    return PersonaResponse.model_validate(persona)
+    return FastJSONResponse(PersonaResponse.model_validate(persona))
+
+
+async def _subir_foto(
+    db: Session,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    usuario_id: int
+) -> FastJSONResponse:
+    """Guardar la foto del request y asociarla a la persona del usuario"""
+    # Validar antes de leer el cuerpo para no almacenar subidas huérfanas
+    if not PersonaService.get_persona(db, usuario_id, ["id"]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Persona no encontrada"
+        )
+    # Liberar la conexión mientras el cliente envía el cuerpo (puede tardar):
+    # una subida lenta no retiene una conexión del pool "idle in transaction"
+    db.commit()
+
+    foto = await foto_storage.recibir_foto(request)
+    url = request.app.url_path_for("get_foto", nombre=foto.nombre)
+
+    # Transacción nueva: la persona pudo eliminarse durante la subida
+    persona = PersonaService.get_persona(db, usuario_id)
+    if not persona:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Persona no encontrada"
+        )
+    persona = PersonaService.set_foto_perfil(db, persona, url)
+
+    # Miniaturas fuera del request (si el contenido ya existía, ya están hechas)
+    pendientes = foto_storage.miniaturas_pendientes(foto.sha256)
+    if pendientes:
+        background_tasks.add_task(thumbnails.submit, foto.path, pendientes)
+
+    return FastJSONResponse(PersonaResponse.model_validate(persona))
+
+
+@router.post("/usuario/{usuario_id}/foto", response_model=PersonaResponse)
+async def subir_foto_persona(
+    usuario_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Subir foto de perfil de un usuario (multipart/form-data, campo `foto`)"""
+    # Solo superusuarios o el mismo usuario pueden cambiar la foto
+    if not current_user.is_superuser and current_user.id != usuario_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para actualizar estos datos"
+        )
+
+    return await _subir_foto(db, request, background_tasks, usuario_id)
+
+
+@router.post("/me/foto", response_model=PersonaResponse)
+async def subir_mi_foto(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Subir mi foto de perfil (multipart/form-data, campo `foto`)"""
+    return await _subir_foto(db, request, background_tasks, current_user.id)
+
+
+@router.get("/fotos/{nombre}", name="get_foto", response_class=FileResponse)
+async def get_foto(
+    nombre: str,
+    request: Request,
+    size: Optional[int] = Query(None, description="Lado mayor de la miniatura en px")
+):
+    """
+    Descargar una foto de perfil (o su miniatura).
+    El nombre es el hash del contenido: la respuesta se cachea indefinidamente.
+    """
+    if not foto_storage.NOMBRE_FOTO.match(nombre):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Foto no encontrada")
+    if size is not None and size not in settings.thumbnail_sizes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tamaños disponibles: {settings.FOTO_THUMBNAIL_SIZES}"
+        )
+
+    sha256, extension = nombre.split(".")
+    original = foto_storage.path_original(sha256, extension)
+    if not os.path.exists(original):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Foto no encontrada")
+
+    cache = f"public, max-age={settings.FOTO_CACHE_MAX_AGE}, immutable"
+    if size is not None:
+        miniatura = foto_storage.path_miniatura(sha256, size)
+        if os.path.exists(miniatura):
+            return archivo_response(request, miniatura, "image/jpeg", f"{sha256}-{size}", cache)
+        # Miniatura aún en proceso: original con cache corto
+        cache = "public, max-age=60"
+
+    return archivo_response(
+        request, original, foto_storage.MEDIA_TYPES[extension], sha256, cache
+    )
 
 
 @router.delete("/usuario/{usuario_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,15 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.batch import parse_ids, validar_ids, ordenar_por_ids
 from app.core.database import get_db
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_active_user, get_current_superuser
-from app.schemas.rol import RolCreate, RolUpdate, RolResponse, RolWithRelations
+from app.schemas.batch import BatchResponse, BulkUpdateResponse
+from app.schemas.rol import RolCreate, RolUpdate, RolResponse, RolWithRelations, RolBulkUpdate
+from app.schemas.permiso import PermisoSimple
+from app.schemas.usuario import ModuloSimple
 from app.services.rol_service import RolService
+from app.models.rol import Rol
 from app.models.usuario import Usuario
 
 router = APIRouter(prefix="/roles", tags=["Roles"])
 
 
+def _rol_con_relaciones(rol: Rol) -> RolWithRelations:
+    """Construir la respuesta con permisos, módulos y conteo de usuarios"""
+    base = RolResponse.model_validate(rol)
+
+    # Los campos ya están validados: construcción directa sin otra pasada
+    return RolWithRelations.model_construct(
+        **dict(base),
+        permisos=[PermisoSimple.model_validate(rp.permiso) for rp in rol.permisos if rp.is_active],
+        modulos=[
+            ModuloSimple.model_validate(rm.modulo)
+            for rm in rol.modulos
+            if rm.is_active and rm.modulo.is_active
+        ],
+        usuarios_count=len([ur for ur in rol.usuarios if ur.vigente])
+    )
+
+
 @router.get("", response_model=List[RolResponse])
 async def get_roles(
     skip: int = Query(0, ge=0),
@@ -20,7 +43,37 @@ async def get_roles(
 ):
     """Obtener lista de roles"""
     roles = RolService.get_roles(db, skip=skip, limit=limit, is_active=is_active)
-    return [RolResponse.model_validate(r) for r in roles]
+    return FastJSONResponse([RolResponse.model_construct(**r) for r in roles])
+
+
+def _roles_por_ids(db: Session, ids: List[int]) -> FastJSONResponse:
+    """Respuesta de lote: roles en el orden pedido y los ids inexistentes"""
+    ids = validar_ids(ids)
+    filas, faltantes = ordenar_por_ids(RolService.get_roles_by_ids(db, ids), ids)
+    return FastJSONResponse(BatchResponse[RolResponse].model_construct(
+        items=[RolResponse.model_construct(**f) for f in filas],
+        missing=faltantes
+    ))
+
+
+@router.get("/batch", response_model=BatchResponse[RolResponse])
+async def get_roles_batch(
+    ids: str = Query(..., description="Ids separados por coma (ej. 1,2,3)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios roles por ID en una sola consulta (en el orden pedido)"""
+    return _roles_por_ids(db, parse_ids(ids))
+
+
+@router.post("/batch", response_model=BatchResponse[RolResponse])
+async def post_roles_batch(
+    ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios roles por ID (lista en el cuerpo, para lotes grandes)"""
+    return _roles_por_ids(db, ids)
 
 
 @router.get("/{rol_id}", response_model=RolWithRelations)
@@ -36,16 +89,8 @@ async def get_rol(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rol no encontrado"
         )
-    
-    from app.schemas.permiso import PermisoSimple
-    from app.schemas.modulo import ModuloSimple
-    
-    response = RolWithRelations.model_validate(rol)
-    response.permisos = [PermisoSimple.model_validate(rp.permiso) for rp in rol.permisos if rp.is_active]
-    response.modulos = [ModuloSimple.model_validate(rm.modulo) for rm in rol.modulos if rm.is_active and rm.modulo.is_active]
-    response.usuarios_count = len([ur for ur in rol.usuarios if ur.is_active])
-    
-    return response
+
+    return FastJSONResponse(_rol_con_relaciones(rol))
 
 
 @router.post("", response_model=RolResponse, status_code=status.HTTP_201_CREATED)
@@ -56,7 +101,10 @@ async def create_rol(
 ):
     """Crear nuevo rol"""
     nuevo_rol = RolService.create_rol(db, rol)
-    return RolResponse.model_validate(nuevo_rol)
+    return FastJSONResponse(
+        RolResponse.model_validate(nuevo_rol),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.put("/{rol_id}", response_model=RolResponse)
@@ -68,7 +116,18 @@ async def update_rol(
 ):
     """Actualizar rol"""
     rol = RolService.update_rol(db, rol_id, rol_update)
-    return RolResponse.model_validate(rol)
+    return FastJSONResponse(RolResponse.model_validate(rol))
+
+
+@router.patch("", response_model=BulkUpdateResponse)
+async def bulk_update_roles(
+    datos: RolBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Actualizar roles en lote (ids o filtro + cambios) con un único UPDATE"""
+    afectados = RolService.bulk_update_roles(db, datos)
+    return FastJSONResponse(BulkUpdateResponse(affected=afectados))
 
 
 @router.delete("/{rol_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -91,16 +150,7 @@ async def asignar_permisos_rol(
 ):
     """Asignar permisos a rol"""
     rol = RolService.asignar_permisos(db, rol_id, permiso_ids)
-    
-    from app.schemas.permiso import PermisoSimple
-    from app.schemas.modulo import ModuloSimple
-    
-    response = RolWithRelations.model_validate(rol)
-    response.permisos = [PermisoSimple.model_validate(rp.permiso) for rp in rol.permisos if rp.is_active]
-    response.modulos = [ModuloSimple.model_validate(rm.modulo) for rm in rol.modulos if rm.is_active and rm.modulo.is_active]
-    response.usuarios_count = len([ur for ur in rol.usuarios if ur.is_active])
-    
-    return response
+    return FastJSONResponse(_rol_con_relaciones(rol))
 
 
 @router.post("/{rol_id}/modulos", response_model=RolWithRelations)
@@ -112,13 +162,4 @@ async def asignar_modulos_rol(
 ):
     """Asignar módulos a rol"""
     rol = RolService.asignar_modulos(db, rol_id, modulo_ids)
-    
-    from app.schemas.permiso import PermisoSimple
-    from app.schemas.modulo import ModuloSimple
-    
-    response = RolWithRelations.model_validate(rol)
-    response.permisos = [PermisoSimple.model_validate(rp.permiso) for rp in rol.permisos if rp.is_active]
-    response.modulos = [ModuloSimple.model_validate(rm.modulo) for rm in rol.modulos if rm.is_active and rm.modulo.is_active]
-    response.usuarios_count = len([ur for ur in rol.usuarios if ur.is_active])
-    
-    return response
+    return FastJSONResponse(_rol_con_relaciones(rol))
@@ -1,31 +1,105 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
+from app.core.batch import parse_ids, validar_ids, ordenar_por_ids
 from app.core.database import get_db
+from app.core.fields import parse_fields
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_active_user, get_current_superuser
+from app.schemas.batch import BatchResponse, BulkUpdateResponse
 from app.schemas.usuario import (
     UsuarioCreate,
     UsuarioUpdate,
     UsuarioResponse,
-    UsuarioWithRelations
+    UsuarioWithRelations,
+    UsuarioBulkUpdate,
+    RolAsignacion,
+    RolSimple,
+    ModuloSimple
 )
+from app.schemas.persona import PersonaResponse
 from app.services.usuario_service import UsuarioService
+from app.services.persona_service import PersonaService
+from app.db import queries
 from app.models.usuario import Usuario
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
+# Campos que se pueden pedir con ?fields=
+CAMPOS_USUARIO = queries.campos_respuesta(Usuario, UsuarioResponse)
+
+
+def _usuario_con_relaciones(db: Session, usuario: Usuario) -> UsuarioWithRelations:
+    """Construir la respuesta con roles, módulos calculados y persona"""
+    base = UsuarioResponse.model_validate(usuario)
+
+    # Obtener roles del usuario
+    roles = [
+        RolSimple.model_validate(ur.rol)
+        for ur in usuario.roles
+        if ur.vigente and ur.rol.is_active
+    ]
+
+    # Obtener módulos calculados desde roles
+    modulos = UsuarioService.get_modulos_from_roles(db, usuario.id)
+
+    # Persona completa en una consulta (incluye las columnas diferidas)
+    persona = PersonaService.get_persona(db, usuario.id)
+
+    # Los campos ya están validados: construcción directa sin otra pasada
+    return UsuarioWithRelations.model_construct(
+        **dict(base),
+        roles=roles,
+        modulos=[ModuloSimple.model_validate(m) for m in modulos],
+        persona=PersonaResponse.model_validate(persona) if persona else None
+    )
+
 
 @router.get("", response_model=List[UsuarioResponse])
 async def get_usuarios(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (ej. id,username)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_active_user)
 ):
     """Obtener lista de usuarios"""
-    usuarios = UsuarioService.get_usuarios(db, skip=skip, limit=limit, search=search)
-    return [UsuarioResponse.model_validate(u) for u in usuarios]
+    campos = parse_fields(fields, CAMPOS_USUARIO)
+    usuarios = UsuarioService.get_usuarios(db, skip=skip, limit=limit, search=search, campos=campos)
+    if campos is not None:
+        return FastJSONResponse([dict(u) for u in usuarios])
+    return FastJSONResponse([UsuarioResponse.model_construct(**u) for u in usuarios])
+
+
+def _usuarios_por_ids(db: Session, ids: List[int]) -> FastJSONResponse:
+    """Respuesta de lote: usuarios en el orden pedido y los ids inexistentes"""
+    ids = validar_ids(ids)
+    filas, faltantes = ordenar_por_ids(UsuarioService.get_usuarios_by_ids(db, ids), ids)
+    return FastJSONResponse(BatchResponse[UsuarioResponse].model_construct(
+        items=[UsuarioResponse.model_construct(**f) for f in filas],
+        missing=faltantes
+    ))
+
+
+@router.get("/batch", response_model=BatchResponse[UsuarioResponse])
+async def get_usuarios_batch(
+    ids: str = Query(..., description="Ids separados por coma (ej. 1,2,3)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios usuarios por ID en una sola consulta (en el orden pedido)"""
+    return _usuarios_por_ids(db, parse_ids(ids))
+
+
+@router.post("/batch", response_model=BatchResponse[UsuarioResponse])
+async def post_usuarios_batch(
+    ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Obtener varios usuarios por ID (lista en el cuerpo, para lotes grandes)"""
+    return _usuarios_por_ids(db, ids)
 
 
 @router.get("/{usuario_id}", response_model=UsuarioWithRelations)
@@ -41,29 +115,8 @@ async def get_usuario(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado"
         )
-    
-    # Cargar relaciones
-    from app.schemas.rol import RolSimple
-    from app.schemas.modulo import ModuloSimple
-    from app.schemas.persona import PersonaResponse
-    
-    response = UsuarioWithRelations.model_validate(usuario)
-    
-    # Obtener roles del usuario
-    response.roles = [
-        RolSimple.model_validate(ur.rol) 
-        for ur in usuario.roles 
-        if ur.is_active and ur.rol.is_active
-    ]
-    
-    # Obtener módulos calculados desde roles
-    modulos = UsuarioService.get_modulos_from_roles(db, usuario_id)
-    response.modulos = [ModuloSimple.model_validate(m) for m in modulos]
-    
-    if usuario.persona:
-        response.persona = PersonaResponse.model_validate(usuario.persona)
-    
-    return response
+
+    return FastJSONResponse(_usuario_con_relaciones(db, usuario))
 
 
 @router.post("", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED)
@@ -74,11 +127,10 @@ async def create_usuario(
 ):
     """Crear nuevo usuario"""
     nuevo_usuario = UsuarioService.create_usuario(db, usuario)
-    # Asignar roles si se proporcionaron
-    if usuario.rol_ids:
-        UsuarioService.asignar_roles(db, nuevo_usuario.id, usuario.rol_ids)
-        db.refresh(nuevo_usuario)
-    return UsuarioResponse.model_validate(nuevo_usuario)
+    return FastJSONResponse(
+        UsuarioResponse.model_validate(nuevo_usuario),
+        status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.put("/{usuario_id}", response_model=UsuarioResponse)
@@ -95,9 +147,20 @@ async def update_usuario(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No tienes permisos para actualizar este usuario"
         )
-    
+
     usuario = UsuarioService.update_usuario(db, usuario_id, usuario_update)
-    return UsuarioResponse.model_validate(usuario)
+    return FastJSONResponse(UsuarioResponse.model_validate(usuario))
+
+
+@router.patch("", response_model=BulkUpdateResponse)
+async def bulk_update_usuarios(
+    datos: UsuarioBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_superuser)
+):
+    """Actualizar usuarios en lote (ids o filtro + cambios) con un único UPDATE"""
+    afectados = UsuarioService.bulk_update_usuarios(db, datos, excluir_id=current_user.id)
+    return FastJSONResponse(BulkUpdateResponse(affected=afectados))
 
 
 @router.delete("/{usuario_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -114,31 +177,13 @@ async def delete_usuario(
 @router.post("/{usuario_id}/roles", response_model=UsuarioWithRelations)
 async def asignar_roles_usuario(
     usuario_id: int,
-    rol_ids: List[int],
+    rol_ids: List[Union[int, RolAsignacion]],
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_superuser)
 ):
-    """Asignar roles a usuario (los módulos se calculan automáticamente desde los roles)"""
+    """
+    Asignar roles a usuario (los módulos se calculan automáticamente desde los roles).
+    Cada elemento es un id o una asignación temporal con valid_from / valid_until.
+    """
     usuario = UsuarioService.asignar_roles(db, usuario_id, rol_ids)
-    
-    from app.schemas.rol import RolSimple
-    from app.schemas.modulo import ModuloSimple
-    from app.schemas.persona import PersonaResponse
-    
-    response = UsuarioWithRelations.model_validate(usuario)
-    
-    # Obtener roles del usuario
-    response.roles = [
-        RolSimple.model_validate(ur.rol) 
-        for ur in usuario.roles 
-        if ur.is_active and ur.rol.is_active
-    ]
-    
-    # Obtener módulos calculados desde roles
-    modulos = UsuarioService.get_modulos_from_roles(db, usuario_id)
-    response.modulos = [ModuloSimple.model_validate(m) for m in modulos]
-    
-    if usuario.persona:
-        response.persona = PersonaResponse.model_validate(usuario.persona)
-    
-    return response
+    return FastJSONResponse(_usuario_con_relaciones(db, usuario))
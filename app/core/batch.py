@@ -0,0 +1,45 @@
+"""
+Consultas por lotes (`GET /<entidad>/batch?ids=1,2,3` o `POST /<entidad>/batch`).
+
+Los servicios resuelven todos los ids con una sola consulta `IN`; aquí se
+validan los ids recibidos y se reordenan las filas según el pedido,
+reportando los que no existen.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+from fastapi import HTTPException, status
+from app.core.config import settings
+
+
+def parse_ids(ids: str) -> List[int]:
+    """Convertir `1,2,3` en lista de enteros"""
+    try:
+        return [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids debe ser una lista de enteros separados por coma"
+        )
+
+
+def validar_ids(ids: List[int]) -> List[int]:
+    """Quitar duplicados (manteniendo el orden) y aplicar el límite del lote"""
+    unicos = list(dict.fromkeys(ids))
+    if not unicos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar al menos un id"
+        )
+    if len(unicos) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.BATCH_MAX_IDS} ids por consulta"
+        )
+    return unicos
+
+
+def ordenar_por_ids(filas: Iterable[Any], ids: List[int]) -> Tuple[List[Any], List[int]]:
+    """Filas en el orden de `ids` y la lista de ids sin fila"""
+    por_id: Dict[int, Any] = {fila["id"]: fila for fila in filas}
+    encontrados = [por_id[i] for i in ids if i in por_id]
+    faltantes = [i for i in ids if i not in por_id]
+    return encontrados, faltantes
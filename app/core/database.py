@@ -1,26 +1,168 @@
-from sqlalchemy import create_engine
+import logging
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DisconnectionError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
+from app.core.replicas import ReplicaSet
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+logger = logging.getLogger(__name__)
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Clave de Session.info: la sesión escribió (INSERT/UPDATE/DELETE o flush)
+CLAVE_ESCRITURA = "escribio"
+
+
+def _ping_si_inactiva(engine, idle_seconds: float):
+    """
+    Pre-ping solo para conexiones que estuvieron inactivas más de idle_seconds.
+    Las conexiones recién devueltas al pool se entregan sin round-trip extra.
+    """
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checkin_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checkin_at = connection_record.info.get("checkin_at")
+        if checkin_at is None or time.monotonic() - checkin_at < idle_seconds:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            # El pool descarta la conexión y reintenta con una nueva
+            raise DisconnectionError()
+        finally:
+            cursor.close()
+
+
+def build_engine(url: str):
+    """
+    Crear engine con la configuración de pool de Settings.
+    En modo PgBouncer (pooling por transacción) no se mantiene pool propio:
+    cada sesión abre y cierra su conexión contra PgBouncer.
+    """
+    if settings.DB_PGBOUNCER:
+        return create_engine(url, poolclass=NullPool)
+
+    engine = create_engine(
+        url,
+        pool_pre_ping=settings.DB_PRE_PING == "always",
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    if settings.DB_PRE_PING == "idle":
+        _ping_si_inactiva(engine, settings.DB_PRE_PING_IDLE_SECONDS)
+    return engine
+
+
+def warm_up_pool(engine, connections: int):
+    """Abrir `connections` conexiones al arrancar para que queden en el pool"""
+    if connections <= 0 or isinstance(engine.pool, NullPool):
+        return
+    abiertas = []
+    try:
+        for _ in range(connections):
+            abiertas.append(engine.connect())
+    except OperationalError as e:
+        logger.warning(f"Warm-up del pool incompleto ({len(abiertas)}/{connections}): {e}")
+    finally:
+        for conexion in abiertas:
+            conexion.close()
+
+
+engine = build_engine(settings.DATABASE_URL)
+
+replicas = ReplicaSet(
+    [build_engine(url) for url in settings.replica_urls],
+    eject_seconds=settings.REPLICA_EJECT_SECONDS,
+    pin_seconds=settings.REPLICA_PIN_SECONDS
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class RoutingSession(Session):
+    """
+    Sesión que lee de la réplica asignada en `info["replica"]`.
+    Solo los SELECT van a la réplica; los flush, los INSERT/UPDATE/DELETE
+    ejecutados directamente, los SELECT ... FOR UPDATE y el SQL textual van
+    siempre al primario.
+    """
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and _es_lectura(clause):
+            return replica
+        return engine
+
+
+def _es_lectura(clause) -> bool:
+    return getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine
+)
 
 Base = declarative_base()
 
 
-def get_db():
+@event.listens_for(SessionLocal, "after_flush")
+def _marcar_flush(session: Session, flush_context) -> None:
+    session.info[CLAVE_ESCRITURA] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _marcar_dml(estado: ORMExecuteState) -> None:
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        estado.session.info[CLAVE_ESCRITURA] = True
+
+
+def get_db(request: Request):
     """
-    Dependency para obtener la sesión de base de datos
+    Dependency para obtener la sesión de base de datos.
+    Unidad de trabajo por request: los servicios solo hacen flush y aquí
+    se confirma una única vez al final, o se revierte si hubo un error.
+
+    Los SELECT de los requests de solo lectura (GET) se envían a una réplica,
+    salvo que el cliente haya escrito hace menos de REPLICA_PIN_SECONDS. Solo
+    fija al cliente al primario un request que escribió (un POST de solo
+    lectura, como /usuarios/batch o /auth/check, no lo hace).
+
+    La sesión empieza sin tenant (no ve ninguna fila de datos por cliente)
+    hasta que la autenticación lo resuelve (ver app.core.tenancy).
     """
     db = SessionLocal()
+    db.info["tenant_id"] = None
+    cliente = None
+    if replicas:
+        cliente = ReplicaSet.client_key(
+            request.headers.get("authorization")
+            or (request.client.host if request.client else "")
+        )
+        if request.method in READ_METHODS and not replicas.is_pinned(cliente):
+            db.info["replica"] = replicas.choose()
     try:
         yield db
+        db.commit()
+        if cliente is not None and db.info.get(CLAVE_ESCRITURA):
+            replicas.pin(cliente)
+    except OperationalError:
+        db.rollback()
+        if db.info.get("replica") is not None:
+            replicas.eject(db.info["replica"])
+        raise
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
@@ -0,0 +1,31 @@
+"""
+Sparse fieldsets (`?fields=id,username`).
+
+El cliente pide solo las columnas que necesita; los servicios llevan la
+proyección al SQL (columnas en el SELECT o `load_only`) y el router devuelve
+únicamente esos campos. `id` se incluye siempre para poder identificar cada
+elemento.
+"""
+from typing import List, Optional, Sequence
+from fastapi import HTTPException, status
+
+
+def parse_fields(fields: Optional[str], permitidos: Sequence[str]) -> Optional[List[str]]:
+    """
+    Validar `fields=` contra los campos permitidos.
+    Devuelve None si no se pidió proyección (respuesta completa) o la lista
+    en el orden del schema.
+    """
+    if fields is None:
+        return None
+
+    pedidos = {f.strip() for f in fields.split(",") if f.strip()}
+    desconocidos = pedidos.difference(permitidos)
+    if desconocidos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no válidos: {', '.join(sorted(desconocidos))}"
+        )
+
+    pedidos.add("id")
+    return [campo for campo in permitidos if campo in pedidos]
@@ -0,0 +1,60 @@
+"""
+Benchmark del coste de hashing de contraseñas.
+
+Mide el tiempo de verificación en el hardware actual y recomienda el valor
+de PASSWORD_HASH_ROUNDS más alto que no supera el tiempo objetivo.
+
+Uso:
+    python -m app.core.hash_benchmark --target-ms 250
+"""
+import argparse
+import statistics
+import time
+from app.core.config import settings
+from app.core.security import build_pwd_context
+
+
+def medir_verificacion(scheme: str, rounds: int, muestras: int = 3) -> float:
+    """Tiempo mediano (ms) de verificar una contraseña con el coste indicado"""
+    context = build_pwd_context(scheme, rounds)
+    hashed = context.hash("benchmark-password")
+    tiempos = []
+    for _ in range(muestras):
+        inicio = time.perf_counter()
+        context.verify("benchmark-password", hashed)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def recomendar_rounds(scheme: str, target_ms: float, muestras: int = 3) -> int:
+    """Buscar el coste más alto cuya verificación no supera target_ms"""
+    handler = build_pwd_context(scheme, settings.PASSWORD_HASH_ROUNDS).handler(scheme)
+    rounds = handler.min_rounds
+    log2 = getattr(handler, "rounds_cost", "linear") == "log2"
+    recomendado = rounds
+
+    while rounds <= handler.max_rounds:
+        ms = medir_verificacion(scheme, rounds, muestras)
+        print(f"  rounds={rounds:<10} {ms:8.1f} ms")
+        if ms > target_ms:
+            break
+        recomendado = rounds
+        rounds = rounds + 1 if log2 else rounds * 2
+
+    return recomendado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del coste de hashing de contraseñas")
+    parser.add_argument("--scheme", default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Esquema: {args.scheme} - objetivo: {args.target_ms:.0f} ms por verificación\n")
+    rounds = recomendar_rounds(args.scheme, args.target_ms, args.samples)
+    print(f"\nRecomendado: PASSWORD_HASH_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Limitador de intentos de login en memoria.
+
+Cada clave (username o IP del cliente) guarda un contador de ventana
+deslizante aproximado (ventana actual + ventana anterior ponderada) y un
+bloqueo con backoff exponencial. El rechazo ocurre antes de verificar la
+contraseña, así un ataque de fuerza bruta no consume CPU en bcrypt.
+
+El estado es un registro de tamaño fijo por clave; las entradas inactivas se
+purgan periódicamente y el número total de claves está acotado. Solo se
+descartan entradas inactivas y sin bloqueo: rotar usernames o IPs no puede
+sacar de la tabla el bloqueo de otra clave. Si la tabla sigue llena tras
+purgar, las claves nuevas se rechazan (fail closed) hasta que haya lugar.
+"""
+import threading
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+
+
+class _Entrada:
+    __slots__ = ("ventana", "actual", "anterior", "bloqueado_hasta", "visto")
+
+    def __init__(self, ventana: int, ahora: float):
+        self.ventana = ventana
+        self.actual = 0
+        self.anterior = 0
+        self.bloqueado_hasta = 0.0
+        self.visto = ahora
+
+
+class LoginThrottle:
+    def __init__(
+        self,
+        window_seconds: int,
+        max_attempts_user: int,
+        max_attempts_ip: int,
+        backoff_base: float,
+        backoff_max: float,
+        max_keys: int,
+        prune_interval: float = 60.0
+    ):
+        self.window_seconds = window_seconds
+        self.max_attempts_user = max_attempts_user
+        self.max_attempts_ip = max_attempts_ip
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._entradas: Dict[tuple, _Entrada] = {}
+        self._lock = threading.Lock()
+        self._ultima_purga = time.monotonic()
+        self.rejected_full = 0
+
+    def _rotar(self, entrada: _Entrada, ahora: float) -> None:
+        """Avanzar la ventana de la entrada hasta la actual"""
+        ventana = int(ahora // self.window_seconds)
+        if ventana != entrada.ventana:
+            entrada.anterior = entrada.actual if ventana == entrada.ventana + 1 else 0
+            entrada.actual = 0
+            entrada.ventana = ventana
+
+    def _conteo(self, entrada: _Entrada, ahora: float) -> float:
+        """Fallos estimados en los últimos window_seconds"""
+        transcurrido = (ahora % self.window_seconds) / self.window_seconds
+        return entrada.anterior * (1 - transcurrido) + entrada.actual
+
+    def _purgar(self, ahora: float) -> None:
+        """Eliminar entradas inactivas"""
+        limite = ahora - 2 * self.window_seconds
+        for clave in [
+            k for k, e in self._entradas.items()
+            if e.visto < limite and e.bloqueado_hasta <= ahora
+        ]:
+            del self._entradas[clave]
+        self._ultima_purga = ahora
+
+    def _hay_lugar(self, ahora: float) -> bool:
+        """Lugar para una clave nueva; si la tabla está llena, purga (a lo sumo cada prune_interval)"""
+        if len(self._entradas) < self.max_keys:
+            return True
+        if ahora - self._ultima_purga > self.prune_interval:
+            self._purgar(ahora)
+        return len(self._entradas) < self.max_keys
+
+    def _claves(self, username: str, ip: Optional[str]):
+        claves = [(("u", username.lower()), self.max_attempts_user)]
+        if ip:
+            claves.append((("ip", ip), self.max_attempts_ip))
+        return claves
+
+    def check(self, username: str, ip: Optional[str]) -> Optional[float]:
+        """Segundos que faltan para poder reintentar, o None si está permitido"""
+        ahora = time.monotonic()
+        espera = 0.0
+        with self._lock:
+            for clave, _ in self._claves(username, ip):
+                entrada = self._entradas.get(clave)
+                if entrada is None:
+                    if not self._hay_lugar(ahora):
+                        # Sin lugar para registrar sus fallos: no se deja intentar
+                        self.rejected_full += 1
+                        espera = max(espera, self.prune_interval)
+                elif entrada.bloqueado_hasta > ahora:
+                    espera = max(espera, entrada.bloqueado_hasta - ahora)
+        return espera or None
+
+    def register_failure(self, username: str, ip: Optional[str]) -> None:
+        """Registrar un intento fallido y aplicar backoff si se supera el límite"""
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._ultima_purga > self.prune_interval:
+                self._purgar(ahora)
+
+            for clave, max_intentos in self._claves(username, ip):
+                entrada = self._entradas.get(clave)
+                if entrada is None:
+                    if not self._hay_lugar(ahora):
+                        continue
+                    entrada = _Entrada(int(ahora // self.window_seconds), ahora)
+                    self._entradas[clave] = entrada
+                self._rotar(entrada, ahora)
+                entrada.actual += 1
+                entrada.visto = ahora
+
+                exceso = int(self._conteo(entrada, ahora)) - max_intentos
+                if exceso > 0:
+                    retardo = min(self.backoff_base * (2 ** (exceso - 1)), self.backoff_max)
+                    entrada.bloqueado_hasta = ahora + retardo
+
+    def register_success(self, username: str, ip: Optional[str]) -> None:
+        """Limpiar el historial del username tras un login correcto"""
+        with self._lock:
+            self._entradas.pop(("u", username.lower()), None)
+
+    def stats(self) -> dict:
+        """Métricas del limitador"""
+        ahora = time.monotonic()
+        with self._lock:
+            bloqueadas = sum(1 for e in self._entradas.values() if e.bloqueado_hasta > ahora)
+            return {
+                "keys": len(self._entradas),
+                "max_keys": self.max_keys,
+                "blocked": bloqueadas,
+                "rejected_full": self.rejected_full,
+            }
+
+
+login_throttle = LoginThrottle(
+    window_seconds=settings.LOGIN_WINDOW_SECONDS,
+    max_attempts_user=settings.LOGIN_MAX_ATTEMPTS_USER,
+    max_attempts_ip=settings.LOGIN_MAX_ATTEMPTS_IP,
+    backoff_base=settings.LOGIN_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.LOGIN_BACKOFF_MAX_SECONDS,
+    max_keys=settings.LOGIN_THROTTLE_MAX_KEYS
+)
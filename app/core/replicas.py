@@ -0,0 +1,87 @@
+"""
+Réplicas de lectura.
+
+Selección round-robin entre réplicas sanas, expulsión temporal de una réplica
+cuando falla la conexión, y fijación de un cliente al primario durante unos
+segundos después de escribir (read-your-writes).
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy.engine import Engine
+
+
+class ReplicaSet:
+    def __init__(self, engines: List[Engine], eject_seconds: float, pin_seconds: float, max_pins: int = 100000):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self.pin_seconds = pin_seconds
+        self.max_pins = max_pins
+        self._expulsada_hasta = [0.0] * len(engines)
+        self._siguiente = 0
+        self._pins: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+        self.reads_replica = 0
+        self.reads_primary = 0
+        self.ejections = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    @staticmethod
+    def client_key(valor: str) -> bytes:
+        """Clave del cliente (digest del header Authorization o de la IP)"""
+        return hashlib.sha256(valor.encode("utf-8")).digest()
+
+    def choose(self) -> Optional[Engine]:
+        """Siguiente réplica sana en round-robin, o None si no hay ninguna"""
+        ahora = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                i = self._siguiente
+                self._siguiente = (i + 1) % len(self.engines)
+                if self._expulsada_hasta[i] <= ahora:
+                    self.reads_replica += 1
+                    return self.engines[i]
+            self.reads_primary += 1
+            return None
+
+    def eject(self, engine: Engine) -> None:
+        """Sacar una réplica de la rotación durante eject_seconds"""
+        with self._lock:
+            for i, e in enumerate(self.engines):
+                if e is engine:
+                    self._expulsada_hasta[i] = time.monotonic() + self.eject_seconds
+                    self.ejections += 1
+        engine.dispose()
+
+    def pin(self, key: bytes) -> None:
+        """Enviar al primario las lecturas del cliente durante pin_seconds"""
+        ahora = time.monotonic()
+        with self._lock:
+            if len(self._pins) >= self.max_pins:
+                self._pins = {k: v for k, v in self._pins.items() if v > ahora}
+            self._pins[key] = ahora + self.pin_seconds
+
+    def is_pinned(self, key: bytes) -> bool:
+        hasta = self._pins.get(key)
+        if hasta is None:
+            return False
+        if hasta <= time.monotonic():
+            self._pins.pop(key, None)
+            return False
+        self.reads_primary += 1
+        return True
+
+    def stats(self) -> dict:
+        """Estado de las réplicas"""
+        ahora = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "healthy": sum(1 for t in self._expulsada_hasta if t <= ahora),
+            "pinned_clients": len(self._pins),
+            "reads_replica": self.reads_replica,
+            "reads_primary": self.reads_primary,
+            "ejections": self.ejections,
+        }
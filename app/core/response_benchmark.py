@@ -0,0 +1,86 @@
+"""
+Benchmark de serialización de respuestas.
+
+Compara, para una página de /usuarios, el camino anterior (validar en el
+router, volver a validar contra `response_model`, `jsonable_encoder` y
+`json.dumps`) con el actual (`model_validate` una vez y `FastJSONResponse`).
+No usa base de datos: las filas son objetos en memoria con los mismos
+atributos que el modelo `Usuario`.
+
+Uso:
+    python -m app.core.response_benchmark --rows 100 --iterations 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.responses import FastJSONResponse
+from app.schemas.usuario import UsuarioResponse
+
+
+def _filas(n: int) -> list:
+    ahora = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            id=i,
+            username=f"usuario{i}",
+            email=f"usuario{i}@example.com",
+            nombre_completo=f"Usuario Número {i}",
+            is_active=True,
+            is_superuser=False,
+            last_login=ahora,
+            created_at=ahora,
+            updated_at=None,
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def _medir(nombre: str, fn, iteraciones: int, filas: int) -> float:
+    fn()  # calentar caches
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        fn()
+    us = (time.perf_counter() - inicio) / iteraciones * 1_000_000
+    print(f"  {nombre:<44} {us:9.1f} µs/página {us / filas:6.2f} µs/fila")
+    return us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de respuestas")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    filas = _filas(args.rows)
+    field = create_response_field(name="response", type_=List[UsuarioResponse])
+    loop = asyncio.new_event_loop()
+
+    def anterior():
+        contenido = [UsuarioResponse.model_validate(u) for u in filas]
+        data = loop.run_until_complete(
+            serialize_response(field=field, response_content=contenido, is_coroutine=True)
+        )
+        return JSONResponse(data).body
+
+    def actual():
+        return FastJSONResponse([UsuarioResponse.model_validate(u) for u in filas]).body
+
+    # Mismo contenido (el formato de las fechas puede variar: "+00:00" vs "Z")
+    assert len(json.loads(anterior())) == len(json.loads(actual())) == args.rows
+
+    print(f"GET /usuarios ({args.rows} filas)")
+    antes = _medir("validar + response_model + json.dumps", anterior, args.iterations, args.rows)
+    despues = _medir("model_validate + FastJSONResponse", actual, args.iterations, args.rows)
+    print(f"  -> {antes / despues:.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Respuesta JSON de una sola pasada.
+
+Los routers validan los datos una vez con `Schema.model_validate(...)` y
+devuelven directamente `FastJSONResponse`; FastAPI no vuelve a validar ni a
+serializar contra `response_model` cuando recibe un `Response`, y pydantic-core
+vuelca los modelos a bytes en una sola pasada (sin json de la stdlib).
+`response_model` se mantiene en los decoradores para la documentación OpenAPI.
+
+`archivo_response` sirve archivos estáticos (fotos) con cache y rangos.
+"""
+import os
+from typing import Any, Iterator, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+CHUNK_ARCHIVO = 64 * 1024
+
+
+def _leer_rango(path: str, inicio: int, fin: int) -> Iterator[bytes]:
+    with open(path, "rb") as archivo:
+        archivo.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            chunk = archivo.read(min(CHUNK_ARCHIVO, restante))
+            if not chunk:
+                break
+            restante -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Un único rango `bytes=inicio-fin` (o `bytes=-N`); None si no es satisfacible"""
+    unidad, _, rango = header.partition("=")
+    if unidad.strip() != "bytes" or "," in rango:
+        return None
+    inicio, _, fin = rango.strip().partition("-")
+    try:
+        if inicio == "":
+            largo = int(fin)
+            if largo <= 0:
+                return None
+            return max(size - largo, 0), size - 1
+        inicio_n = int(inicio)
+        fin_n = int(fin) if fin else size - 1
+    except ValueError:
+        return None
+    if inicio_n >= size or fin_n < inicio_n:
+        return None
+    return inicio_n, min(fin_n, size - 1)
+
+
+def archivo_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    etag: str,
+    cache_control: str
+) -> Response:
+    """
+    Servir un archivo estático con ETag, 304 y rangos de bytes (206/416).
+    `Content-Encoding: identity` evita que GZipMiddleware recomprima imágenes
+    y rompa los rangos.
+    """
+    etag = f'"{etag}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        "ETag": etag,
+        "Content-Encoding": "identity",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = os.stat(path).st_size
+    rango = request.headers.get("range")
+    if rango is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    limites = _parse_range(rango, size)
+    if limites is None:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    inicio, fin = limites
+    headers["Content-Range"] = f"bytes {inicio}-{fin}/{size}"
+    headers["Content-Length"] = str(fin - inicio + 1)
+    return StreamingResponse(
+        _leer_rango(path, inicio, fin),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
@@ -7,10 +7,34 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.tenancy import establecer_tenant
+from app.core.token_cache import TokenCache
+from app.db import queries
 from app.models.usuario import Usuario
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def build_pwd_context(scheme: str, rounds: int) -> CryptContext:
+    """
+    Construir el contexto de hashing.
+    Los hashes con otro esquema o con un coste distinto a `rounds`
+    se marcan como obsoletos (needs_update) para recalcularlos en el login.
+    """
+    schemes = [scheme] if scheme == "bcrypt" else [scheme, "bcrypt"]
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        **{
+            f"{scheme}__default_rounds": rounds,
+            f"{scheme}__min_rounds": rounds,
+            f"{scheme}__max_rounds": rounds,
+        }
+    )
+
+
+pwd_context = build_pwd_context(settings.PASSWORD_HASH_SCHEME, settings.PASSWORD_HASH_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -18,6 +42,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Indica si el hash no corresponde al esquema/coste configurado"""
+    return pwd_context.needs_update(hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """Hashear contraseña"""
     # Asegurar que la contraseña sea una cadena y no exceda 72 bytes
@@ -42,19 +71,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def verify_token(token: str) -> Optional[dict]:
-    """Verificar token JWT"""
+    """Verificar token JWT (los tokens ya verificados se sirven desde cache)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    token_cache.set(token, payload)
+    return payload
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> Usuario:
-    """Obtener usuario actual desde token"""
+def usuario_desde_token(db: Session, token: str) -> Usuario:
+    """Validar el token y devolver su usuario (activo); 401/403 si no corresponde"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
@@ -66,10 +96,13 @@ async def get_current_user(
         raise credentials_exception
     
     username: str = payload.get("sub")
-    if username is None:
+    tenant_id: int = payload.get("tid")
+    if username is None or tenant_id is None:
         raise credentials_exception
     
-    user = db.query(Usuario).filter(Usuario.username == username).first()
+    # El resto de las consultas de la sesión quedan acotadas al tenant del token
+    establecer_tenant(db, tenant_id)
+    user = queries.usuario_por_username(db, username)
     if user is None:
         raise credentials_exception
     
@@ -82,6 +115,17 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """Obtener usuario actual desde token"""
+    user = usuario_desde_token(db, token)
+    # Autor de los cambios que se registren en la auditoría de este request
+    db.info["actor_id"] = user.id
+    return user
+
+
 async def get_current_active_user(
     current_user: Usuario = Depends(get_current_user)
 ) -> Usuario:
@@ -0,0 +1,93 @@
+"""
+Aislamiento de datos por tenant.
+
+El tenant de una sesión se guarda en `Session.info["tenant_id"]` (lo fija
+`usuario_desde_token` con el claim `tid` del JWT, o el login con la cabecera
+X-Tenant). Con un tenant en la sesión:
+
+- Todo SELECT, UPDATE y DELETE del ORM sobre modelos con TenantMixin (también
+  en subconsultas, joins y Session.get) recibe `tenant_id = :tenant`. Así la
+  consulta queda acotada por los índices que empiezan por tenant_id y, en las
+  tablas particionadas, PostgreSQL descarta las particiones de otros tenants.
+- Los INSERT (objetos nuevos y `insert(Model)`) reciben el tenant_id; en
+  `INSERT ... SELECT` lo debe seleccionar la consulta.
+
+get_db crea la sesión con tenant None: un request que no resolvió su tenant
+no ve ni escribe filas. Las sesiones de procesos internos (escritor de
+auditoría, last_login) no tienen la clave y no se filtran.
+"""
+from typing import Optional
+from sqlalchemy import event, select
+from sqlalchemy.sql.selectable import CompoundSelect
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from app.core.database import SessionLocal
+from app.models.tenant import Tenant, TenantMixin
+
+# Clave de Session.info con el tenant de la sesión
+CLAVE_SESION = "tenant_id"
+
+
+def establecer_tenant(db: Session, tenant_id: Optional[int]) -> None:
+    """Acotar la sesión a un tenant"""
+    db.info[CLAVE_SESION] = tenant_id
+
+
+def tenant_por_slug(db: Session, slug: str) -> Optional[Tenant]:
+    """Tenant activo por slug"""
+    return db.query(Tenant).filter(Tenant.slug == slug, Tenant.is_active == True).first()
+
+
+def bloquear_tenant(db: Session) -> None:
+    """
+    Bloquear la fila del tenant hasta el fin de la transacción: serializa
+    los cambios de jerarquía (roles, módulos), donde dos movimientos
+    concurrentes podrían cerrar un ciclo sin que ninguno lo vea.
+    """
+    tenant_id = db.info.get(CLAVE_SESION)
+    if tenant_id is not None:
+        db.execute(select(Tenant.id).where(Tenant.id == tenant_id).with_for_update())
+
+
+def _con_tenant(tabla) -> bool:
+    return "tenant_id" in tabla.c
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _filtrar_por_tenant(estado: ORMExecuteState) -> None:
+    if CLAVE_SESION not in estado.session.info:
+        return
+    # Las cargas de relaciones y columnas diferidas heredan el criterio de la
+    # consulta que cargó el objeto
+    if estado.is_column_load or estado.is_relationship_load:
+        return
+
+    tenant_id = estado.session.info[CLAVE_SESION]
+    if estado.is_insert:
+        if not _con_tenant(estado.statement.table):
+            return
+        if estado.statement.select is not None:
+            # INSERT ... SELECT: el tenant_id lo aporta el SELECT
+            return
+        if isinstance(estado.parameters, list) and estado.parameters:
+            # executemany: el tenant_id se agrega a cada fila
+            return estado.invoke_statement(params=[{"tenant_id": tenant_id}] * len(estado.parameters))
+        estado.statement = estado.statement.values(tenant_id=tenant_id)
+    elif estado.is_select or estado.is_update or estado.is_delete:
+        if isinstance(estado.statement, CompoundSelect):
+            # Los UNION cacheados conservan el tenant de la primera ejecución
+            # (SQLAlchemy 2.0): se compilan en cada ejecución
+            estado.update_execution_options(compiled_cache=None)
+        estado.statement = estado.statement.options(with_loader_criteria(
+            TenantMixin,
+            lambda cls: cls.tenant_id == tenant_id,
+            include_aliases=True
+        ))
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _asignar_tenant(session: Session, flush_context, instances) -> None:
+    if CLAVE_SESION not in session.info:
+        return
+    for obj in session.new:
+        if isinstance(obj, TenantMixin):
+            obj.tenant_id = session.info[CLAVE_SESION]
@@ -0,0 +1,71 @@
+"""
+Cache LRU de tokens JWT ya verificados.
+
+La clave es el digest SHA-256 del token (no se guarda el token en claro) y el
+valor es el payload decodificado junto con su `exp`. Mientras el token no
+expire, las peticiones repetidas evitan la verificación HMAC y el parseo.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entradas: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _clave(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Payload cacheado si el token sigue vigente"""
+        if self.max_size <= 0:
+            return None
+        clave = self._clave(token)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            payload, exp = entrada
+            if exp is not None and time.time() >= exp:
+                del self._entradas[clave]
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return payload
+
+    def set(self, token: str, payload: dict) -> None:
+        """Guardar el payload de un token verificado hasta su expiración"""
+        if self.max_size <= 0:
+            return
+        clave = self._clave(token)
+        exp = payload.get("exp")
+        with self._lock:
+            self._entradas[clave] = (payload, exp)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self) -> dict:
+        """Métricas del cache"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entradas),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,170 @@
+"""
+Consultas frecuentes pre-construidas.
+
+Los SELECT de las búsquedas más calientes (login y cada request autenticado)
+se construyen una sola vez a nivel de módulo con parámetros enlazados; así no
+se reconstruye el Query en cada llamada y SQLAlchemy reutiliza el SQL
+compilado desde su cache. Las búsquedas por clave primaria usan `Session.get`,
+que además resuelve desde el identity map sin ir a la base de datos.
+
+Los listados seleccionan solo las columnas de su schema de respuesta y
+devuelven filas (RowMapping) en lugar de objetos ORM: no se hidratan
+entidades ni se registran en la sesión, y el router construye la respuesta
+con `model_construct` porque los datos ya vienen validados de la base.
+"""
+from typing import List, Optional, Type
+from pydantic import BaseModel
+from sqlalchemy import bindparam, exists, select, union
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.orm import Session, aliased
+from app.models.usuario import Usuario
+from app.models.rol import Rol
+from app.models.modulo import Modulo
+from app.models.permiso import Permiso
+from app.models.auditoria import Auditoria
+from app.models.usuario_rol import UsuarioRol
+from app.models.rol_permiso import RolPermiso
+from app.models.rol_modulo import RolModulo
+from app.models.modulo_permiso import ModuloPermiso
+from app.models.rol_jerarquia import RolJerarquia
+from app.schemas.usuario import UsuarioResponse
+from app.schemas.rol import RolResponse
+from app.schemas.modulo import ModuloResponse
+from app.schemas.permiso import PermisoResponse
+from app.schemas.auditoria import AuditoriaResponse
+
+
+def columnas_respuesta(model, schema: Type[BaseModel], campos: Optional[List[str]] = None) -> List:
+    """
+    Columnas de la tabla que forman parte del schema de respuesta (o solo `campos`).
+    Son atributos del modelo, no columnas de la tabla: así el SELECT es del
+    ORM y recibe el filtro por tenant (ver app.core.tenancy).
+    """
+    columnas = model.__table__.c
+    nombres = campos if campos is not None else schema.model_fields
+    return [getattr(model, nombre) for nombre in nombres if nombre in columnas]
+
+
+def campos_respuesta(model, schema: Type[BaseModel]) -> List[str]:
+    """Campos del schema que se pueden pedir con `fields=` (columnas de la tabla)"""
+    return [c.key for c in columnas_respuesta(model, schema)]
+
+
+USUARIO_POR_USERNAME = (
+    select(Usuario)
+    .where(Usuario.username == bindparam("username"))
+    .limit(1)
+)
+
+PERMISO_POR_CODIGO = (
+    select(Permiso)
+    .where(Permiso.codigo == bindparam("codigo"))
+    .limit(1)
+)
+
+
+def cadena_activa(otorgante, asignado):
+    """
+    Ningún rol inactivo en la cadena entre el rol que otorga y el asignado
+    (ambos incluidos): desactivar un rol corta lo que heredan sus descendientes.
+    Es un NOT EXISTS correlacionado: los ancestros del asignado son un rango de
+    la clave de rol_jerarquia y cada uno se cruza con el otorgante por clave.
+    """
+    intermedio = aliased(Rol)
+    hasta = aliased(RolJerarquia)
+    desde = aliased(RolJerarquia)
+    return ~exists().where(
+        hasta.descendiente_id == asignado,
+        hasta.ancestro_id == intermedio.id,
+        desde.descendiente_id == intermedio.id,
+        desde.ancestro_id == otorgante,
+        intermedio.is_active == False
+    )
+
+
+# Rol asignado al usuario; `Rol` es el rol que otorga (el mismo o un ancestro,
+# unidos por la clausura de la jerarquía: un join, sin importar la profundidad)
+_ROL_ASIGNADO = aliased(Rol)
+
+
+def _roles_de_usuario(query):
+    """Unir el rol que otorga con los roles vigentes del usuario (:usuario_id)"""
+    return (
+        query
+        .join(RolJerarquia, RolJerarquia.ancestro_id == Rol.id)
+        .join(UsuarioRol, UsuarioRol.rol_id == RolJerarquia.descendiente_id)
+        .join(_ROL_ASIGNADO, _ROL_ASIGNADO.id == UsuarioRol.rol_id)
+        .where(
+            UsuarioRol.usuario_id == bindparam("usuario_id"),
+            UsuarioRol.vigente,
+            _ROL_ASIGNADO.is_active == True,
+            Rol.is_active == True,
+            cadena_activa(Rol.id, UsuarioRol.rol_id)
+        )
+    )
+
+
+# Códigos de permiso efectivos de un usuario: asignados a sus roles (o a los
+# roles de los que heredan) o a sus módulos (UNION: sin duplicados)
+PERMISOS_DE_USUARIO = union(
+    _roles_de_usuario(
+        select(Permiso.codigo)
+        .join(RolPermiso, RolPermiso.permiso_id == Permiso.id)
+        .join(Rol, Rol.id == RolPermiso.rol_id)
+    ).where(RolPermiso.is_active == True, Permiso.is_active == True),
+    _roles_de_usuario(
+        select(Permiso.codigo)
+        .join(ModuloPermiso, ModuloPermiso.permiso_id == Permiso.id)
+        .join(Modulo, Modulo.id == ModuloPermiso.modulo_id)
+        .join(RolModulo, RolModulo.modulo_id == Modulo.id)
+        .join(Rol, Rol.id == RolModulo.rol_id)
+    ).where(
+        RolModulo.is_active == True,
+        Modulo.is_active == True,
+        ModuloPermiso.is_active == True,
+        Permiso.is_active == True
+    )
+)
+
+# Módulos efectivos de un usuario (propios de sus roles y heredados)
+MODULOS_DE_USUARIO = _roles_de_usuario(
+    select(Modulo)
+    .join(RolModulo, RolModulo.modulo_id == Modulo.id)
+    .join(Rol, Rol.id == RolModulo.rol_id)
+).where(
+    RolModulo.is_active == True,
+    Modulo.is_active == True
+).distinct().order_by(Modulo.orden, Modulo.id)
+
+
+# Listados: solo las columnas de la respuesta (sin hashed_password, etc.)
+USUARIOS_LISTA = select(*columnas_respuesta(Usuario, UsuarioResponse))
+ROLES_LISTA = select(*columnas_respuesta(Rol, RolResponse))
+MODULOS_LISTA = select(*columnas_respuesta(Modulo, ModuloResponse))
+PERMISOS_LISTA = select(*columnas_respuesta(Permiso, PermisoResponse))
+AUDITORIA_LISTA = select(*columnas_respuesta(Auditoria, AuditoriaResponse))
+
+
+def filas_por_ids(db: Session, lista, model, ids: List[int]) -> List[RowMapping]:
+    """Filas de un listado pre-construido para varios ids en una sola consulta IN"""
+    return db.execute(lista.where(model.id.in_(ids))).mappings().all()
+
+
+def usuario_por_username(db: Session, username: str) -> Optional[Usuario]:
+    """Usuario por username con la sentencia pre-construida"""
+    return db.execute(USUARIO_POR_USERNAME, {"username": username}).scalar_one_or_none()
+
+
+def permiso_por_codigo(db: Session, codigo: str) -> Optional[Permiso]:
+    """Permiso por código con la sentencia pre-construida"""
+    return db.execute(PERMISO_POR_CODIGO, {"codigo": codigo}).scalar_one_or_none()
+
+
+def codigos_de_usuario(db: Session, usuario_id: int) -> List[str]:
+    """Códigos de permiso efectivos del usuario con la sentencia pre-construida"""
+    return db.execute(PERMISOS_DE_USUARIO, {"usuario_id": usuario_id}).scalars().all()
+
+
+def modulos_de_usuario(db: Session, usuario_id: int) -> List[Modulo]:
+    """Módulos efectivos del usuario con la sentencia pre-construida"""
+    return db.execute(MODULOS_DE_USUARIO, {"usuario_id": usuario_id}).scalars().all()
@@ -0,0 +1,104 @@
+"""
+Benchmark de las búsquedas frecuentes.
+
+Compara el Query construido en cada llamada con las sentencias
+pre-construidas de app.db.queries y con Session.get, y el listado ORM +
+model_validate con el de filas + model_construct. Usa SQLite en memoria
+para que el tiempo medido sea casi todo overhead de Python.
+
+Uso:
+    python -m app.db.query_benchmark --iterations 20000 --rows 1000
+"""
+import argparse
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.db import queries
+from app.models import *  # noqa: F401,F403 - registrar todos los modelos
+from app.models.tenant import Tenant
+from app.models.usuario import Usuario
+from app.models.permiso import Permiso
+from app.schemas.usuario import UsuarioResponse
+
+
+def _medir(nombre: str, fn, iteraciones: int) -> float:
+    fn()  # calentar caches
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        fn()
+    us = (time.perf_counter() - inicio) / iteraciones * 1_000_000
+    print(f"  {nombre:<40} {us:10.1f} µs/llamada")
+    return us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsquedas frecuentes")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    with Session() as db:
+        tenant = Tenant(slug="benchmark", nombre="Benchmark")
+        db.add(tenant)
+        db.flush()
+        db.add(Usuario(username="admin", email="admin@example.com", nombre_completo="Admin", hashed_password="x", tenant_id=tenant.id))
+        db.add(Permiso(nombre="Ver usuarios", codigo="usuarios.ver", tenant_id=tenant.id))
+        db.add_all([
+            Usuario(
+                username=f"usuario{i}", email=f"usuario{i}@example.com",
+                nombre_completo=f"Usuario {i}", hashed_password="x" * 60, tenant_id=tenant.id
+            )
+            for i in range(args.rows - 1)
+        ])
+        db.commit()
+
+    n = args.iterations
+    with Session() as db:
+        print("get_usuario_by_username")
+        antes = _medir(
+            "db.query(...).filter(...).first()",
+            lambda: db.query(Usuario).filter(Usuario.username == "admin").first(), n
+        )
+        despues = _medir("queries.usuario_por_username", lambda: queries.usuario_por_username(db, "admin"), n)
+        print(f"  -> {antes / despues:.1f}x\n")
+
+        print("get_permiso_by_codigo")
+        antes = _medir(
+            "db.query(...).filter(...).first()",
+            lambda: db.query(Permiso).filter(Permiso.codigo == "usuarios.ver").first(), n
+        )
+        despues = _medir("queries.permiso_por_codigo", lambda: queries.permiso_por_codigo(db, "usuarios.ver"), n)
+        print(f"  -> {antes / despues:.1f}x\n")
+
+        print("get_usuario (por ID)")
+        antes = _medir(
+            "db.query(...).filter(...).first()",
+            lambda: db.query(Usuario).filter(Usuario.id == 1).first(), n
+        )
+        despues = _medir("db.get(Usuario, id)", lambda: db.get(Usuario, 1), n)
+        print(f"  -> {antes / despues:.1f}x\n")
+
+    # Listado: cada iteración con sesión nueva, como un request
+    iter_lista = max(1, n // 1000)
+
+    def lista_orm():
+        with Session() as s:
+            return [UsuarioResponse.model_validate(u) for u in s.query(Usuario).limit(args.rows).all()]
+
+    def lista_filas():
+        with Session() as s:
+            filas = s.execute(queries.USUARIOS_LISTA.limit(args.rows)).mappings().all()
+            return [UsuarioResponse.model_construct(**f) for f in filas]
+
+    print(f"listado de usuarios ({args.rows} filas)")
+    antes = _medir("ORM + model_validate", lista_orm, iter_lista)
+    despues = _medir("filas + model_construct", lista_filas, iter_lista)
+    print(f"  -> {antes / despues:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
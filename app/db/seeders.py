@@ -1,8 +1,16 @@
 """
-Seeders para poblar la base de datos con datos iniciales
+Seeders para poblar la base de datos con datos iniciales.
+
+Los datos se crean dentro de un tenant (por defecto DEFAULT_TENANT). Para dar
+de alta un cliente nuevo con sus datos iniciales:
+    python -m app.db.seeders --tenant acme --nombre "ACME S.A."
 """
+import argparse
+from typing import Optional
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import SessionLocal
+from app.core.tenancy import establecer_tenant
 from app.core.security import get_password_hash
 from app.models.usuario import Usuario
 from app.models.rol import Rol
@@ -14,6 +22,8 @@ from app.models.rol_permiso import RolPermiso
 from app.models.modulo_permiso import ModuloPermiso
 from app.models.modulo import TipoModulo
 from app.models.persona import Persona, Genero
+from app.models.tenant import Tenant
+from app.services import rol_jerarquia
 from datetime import date
 
 
@@ -81,6 +91,7 @@ def seed_roles(db: Session):
             )
             db.add(rol)
             db.flush()
+            rol_jerarquia.agregar(db, rol.id, None)
             
             # Asignar permisos
             if rol_data["nombre"] == "Super Administrador":
@@ -288,11 +299,24 @@ def seed_personas(db: Session):
     print("✓ Personas creadas")
 
 
-def run_seeders():
-    """Ejecutar todos los seeders"""
+def seed_tenant(db: Session, slug: str, nombre: Optional[str] = None) -> Tenant:
+    """Crear el tenant si no existe y acotar la sesión a él"""
+    tenant = db.query(Tenant).filter(Tenant.slug == slug).first()
+    if not tenant:
+        tenant = Tenant(slug=slug, nombre=nombre or slug)
+        db.add(tenant)
+        db.commit()
+    establecer_tenant(db, tenant.id)
+    print(f"✓ Tenant '{slug}' (id={tenant.id})")
+    return tenant
+
+
+def run_seeders(tenant_slug: str = settings.DEFAULT_TENANT, tenant_nombre: Optional[str] = None):
+    """Ejecutar todos los seeders en un tenant"""
     db = SessionLocal()
     try:
         print("Iniciando seeders...\n")
+        seed_tenant(db, tenant_slug, tenant_nombre)
         seed_permisos(db)
         seed_roles(db)
         seed_modulos(db)
@@ -308,4 +332,8 @@ def run_seeders():
 
 
 if __name__ == "__main__":
-    run_seeders()
+    parser = argparse.ArgumentParser(description="Datos iniciales de un tenant")
+    parser.add_argument("--tenant", default=settings.DEFAULT_TENANT, help="slug del tenant")
+    parser.add_argument("--nombre", default=None, help="nombre del tenant (si se crea)")
+    args = parser.parse_args()
+    run_seeders(args.tenant, args.nombre)
@@ -1,5 +1,6 @@
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
 from app.core.middleware import (
@@ -7,6 +8,16 @@ from app.core.middleware import (
     ErrorHandlingMiddleware,
     setup_cors
 )
+from app.core.database import engine, replicas, warm_up_pool
+from app.core.login_throttle import login_throttle
+from app.core.security import get_current_superuser, token_cache
+from app.services.audit_log import audit_log
+from app.services.eventos_acceso import eventos_acceso
+from app.services.permisos_efectivos import permisos_cache
+from app.services.persona_service import facetas_directorio
+from app.services.last_login_buffer import last_login_buffer
+from app.services.vigencia_roles import vigencia_roles
+from app.services.thumbnails import thumbnails
 from app.api.v1 import api_router
 
 # Configurar logging
@@ -16,6 +27,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque y apagado de los procesos en segundo plano"""
+    warm_up_pool(engine, settings.DB_POOL_WARMUP)
+    for replica in replicas.engines:
+        warm_up_pool(replica, settings.DB_POOL_WARMUP)
+    last_login_buffer.start()
+    audit_log.start()
+    thumbnails.start()
+    eventos_acceso.start()
+    vigencia_roles.start()
+    yield
+    vigencia_roles.stop()
+    eventos_acceso.stop()
+    thumbnails.stop()
+    audit_log.stop()
+    last_login_buffer.stop()
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="Sistema de Gestión de Usuarios y Permisos",
@@ -23,7 +53,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/api/v1/openapi.json"
+    openapi_url="/api/v1/openapi.json",
+    lifespan=lifespan
 )
 
 # Configurar middlewares
@@ -53,6 +84,24 @@ async def health_check():
     return {"status": "healthy", "environment": settings.ENVIRONMENT}
 
 
+@app.get("/metrics", dependencies=[Depends(get_current_superuser)])
+async def metrics():
+    """Métricas internas de los caches y limitadores en memoria (solo superusuarios)"""
+    return {
+        "token_cache": token_cache.stats(),
+        "login_throttle": login_throttle.stats(),
+        "last_login_writer": last_login_buffer.stats(),
+        "audit_log_writer": audit_log.stats(),
+        "replicas": replicas.stats(),
+        "pool": engine.pool.status(),
+        "thumbnails": thumbnails.stats(),
+        "sse": eventos_acceso.stats(),
+        "permisos_cache": permisos_cache.stats(),
+        "vigencia_roles": vigencia_roles.stats(),
+        "directorio_facetas": facetas_directorio.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,3 +1,4 @@
+from app.models.tenant import Tenant
 from app.models.usuario import Usuario
 from app.models.rol import Rol
 from app.models.modulo import Modulo
@@ -6,9 +7,12 @@ from app.models.persona import Persona
 from app.models.usuario_rol import UsuarioRol
 from app.models.rol_modulo import RolModulo
 from app.models.rol_permiso import RolPermiso
+from app.models.rol_jerarquia import RolJerarquia
 from app.models.modulo_permiso import ModuloPermiso
+from app.models.auditoria import Auditoria
 
 __all__ = [
+    "Tenant",
     "Usuario",
     "Rol",
     "Modulo",
@@ -17,5 +21,7 @@ __all__ = [
     "UsuarioRol",
     "RolModulo",
     "RolPermiso",
+    "RolJerarquia",
     "ModuloPermiso",
+    "Auditoria",
 ]
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Identity, Index
+from app.core.database import Base
+from app.models.tenant import TenantMixin
+
+
+class Auditoria(TenantMixin, Base):
+    """
+    Registro de cambios (solo inserción).
+    En PostgreSQL la tabla está particionada por mes sobre `ocurrido_en`; por
+    eso la clave primaria incluye la columna de partición. Sin claves
+    foráneas: el registro sobrevive al borrado del actor o de la entidad.
+    """
+    __tablename__ = "auditoria"
+    __table_args__ = (
+        Index("ix_auditoria_actor_fecha", "actor_id", "ocurrido_en"),
+        Index("ix_auditoria_entidad_fecha", "entidad", "entidad_id", "ocurrido_en"),
+        Index("ix_auditoria_tenant_fecha", "tenant_id", "ocurrido_en"),
+        {"postgresql_partition_by": "RANGE (ocurrido_en)"},
+    )
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    ocurrido_en = Column(DateTime(timezone=True), primary_key=True)
+    tenant_id = Column(Integer, nullable=True)  # None: proceso sin tenant
+    actor_id = Column(Integer, nullable=True)  # None: proceso sin usuario
+    accion = Column(String(30), nullable=False)  # create, update, delete, asignar_*, bulk_update
+    entidad = Column(String(50), nullable=False)  # nombre de la tabla
+    entidad_id = Column(Integer, nullable=True)  # None en cambios masivos
+    antes = Column(JSON, nullable=True)
+    despues = Column(JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<Auditoria(id={self.id}, accion='{self.accion}', entidad='{self.entidad}')>"
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Enum as SQLEnum, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Index, Text, DateTime, Boolean, Enum as SQLEnum, ForeignKey
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 import enum
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
 class TipoModulo(str, enum.Enum):
@@ -12,18 +13,34 @@ class TipoModulo(str, enum.Enum):
     API = "api"
 
 
-class Modulo(Base):
+class Modulo(TenantMixin, Base):
     __tablename__ = "modulos"
 
+    # Recuperar created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Únicos dentro de cada tenant; (tenant_id, id) es el destino de las
+    # claves foráneas compuestas de las tablas intermedias
+    __table_args__ = (
+        Index("ix_modulos_nombre", "tenant_id", "nombre", unique=True),
+        Index("ix_modulos_tenant_id_id", "tenant_id", "id", unique=True),
+        # Subárboles por prefijo (camino LIKE '/1/5/%'): text_pattern_ops
+        # permite el rango en el índice con cualquier collation
+        Index("ix_modulos_camino", "tenant_id", "camino", postgresql_ops={"camino": "text_pattern_ops"}),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(100), nullable=False, unique=True, index=True)
+    nombre = Column(String(100), nullable=False)
     descripcion = Column(Text, nullable=True)
     ruta = Column(String(255), nullable=True)  # Ruta del módulo (ej: /usuarios, /dashboard)
     icono = Column(String(100), nullable=True)  # Icono para el frontend
     tipo = Column(SQLEnum(TipoModulo), default=TipoModulo.MENU, nullable=False)
     orden = Column(Integer, default=0, nullable=False)  # Orden de visualización
     is_active = Column(Boolean, default=True, nullable=False)
-    parent_id = Column(Integer, ForeignKey("modulos.id"), nullable=True)  # Para módulos anidados
+    parent_id = Column(Integer, ForeignKey("modulos.id", ondelete="SET NULL"), nullable=True, index=True)  # Para módulos anidados
+    # Ids de los ancestros desde la raíz: "/1/5/" (raíz: "/"). Lo mantiene ModuloService.
+    # Text: crece con la profundidad del árbol, que no tiene límite
+    camino = Column(Text, default="/", server_default="/", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -31,18 +48,24 @@ class Modulo(Base):
     roles = relationship(
         "RolModulo",
         back_populates="modulo",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación N a N con Permisos
     permisos = relationship(
         "ModuloPermiso",
         back_populates="modulo",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación recursiva para módulos padre/hijo
-    children = relationship("Modulo", backref="parent", remote_side=[id])
+    children = relationship(
+        "Modulo",
+        backref=backref("parent", remote_side=[id]),
+        passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<Modulo(id={self.id}, nombre='{self.nombre}')>"
@@ -2,17 +2,18 @@ from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class ModuloPermiso(Base):
+class ModuloPermiso(TenantMixin, Base):
     """
     Tabla intermedia para relación N a N entre Módulos y Permisos
     """
     __tablename__ = "modulo_permiso"
 
     id = Column(Integer, primary_key=True, index=True)
-    modulo_id = Column(Integer, ForeignKey("modulos.id"), nullable=False)
-    permiso_id = Column(Integer, ForeignKey("permisos.id"), nullable=False)
+    modulo_id = Column(Integer, ForeignKey("modulos.id", ondelete="CASCADE"), nullable=False, index=True)
+    permiso_id = Column(Integer, ForeignKey("permisos.id", ondelete="CASCADE"), nullable=False, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
     fecha_asignacion = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -1,15 +1,27 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Index, Text, DateTime, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class Permiso(Base):
+class Permiso(TenantMixin, Base):
     __tablename__ = "permisos"
 
+    # Recuperar created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Únicos dentro de cada tenant; (tenant_id, id) es el destino de las
+    # claves foráneas compuestas de las tablas intermedias
+    __table_args__ = (
+        Index("ix_permisos_nombre", "tenant_id", "nombre", unique=True),
+        Index("ix_permisos_codigo", "tenant_id", "codigo", unique=True),
+        Index("ix_permisos_tenant_id_id", "tenant_id", "id", unique=True),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(100), nullable=False, unique=True, index=True)
-    codigo = Column(String(50), nullable=False, unique=True, index=True)  # Ej: "usuarios.crear", "usuarios.editar"
+    nombre = Column(String(100), nullable=False)
+    codigo = Column(String(50), nullable=False)  # Ej: "usuarios.crear", "usuarios.editar"
     descripcion = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -19,14 +31,16 @@ class Permiso(Base):
     roles = relationship(
         "RolPermiso",
         back_populates="permiso",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación N a N con Módulos
     modulos = relationship(
         "ModuloPermiso",
         back_populates="permiso",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     def __repr__(self):
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Date, Text, ForeignKey, DateTime, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, Text, ForeignKey, DateTime, Index, Enum as SQLEnum
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 import enum
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
 class Genero(str, enum.Enum):
@@ -12,16 +13,34 @@ class Genero(str, enum.Enum):
     PREFIERO_NO_DECIR = "prefiero_no_decir"
 
 
-class Persona(Base):
+class Persona(TenantMixin, Base):
+    """
+    En PostgreSQL la tabla está particionada por HASH (tenant_id): la clave
+    primaria física es (tenant_id, id).
+    """
     __tablename__ = "personas"
 
+    # Recuperar created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Únicos dentro de cada tenant e índices del directorio (ubicación de
+    # mayor a menor y género + edad), todos con tenant_id al frente
+    __table_args__ = (
+        Index("ix_personas_usuario_id", "tenant_id", "usuario_id", unique=True),
+        Index("ix_personas_dni", "tenant_id", "dni", unique=True),
+        Index("ix_personas_pais_estado_ciudad", "tenant_id", "pais", "estado_provincia", "ciudad"),
+        Index("ix_personas_genero_fecha_nacimiento", "tenant_id", "genero", "fecha_nacimiento"),
+        Index("ix_personas_ciudad", "tenant_id", "ciudad"),
+        Index("ix_personas_fecha_nacimiento", "tenant_id", "fecha_nacimiento"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     
     # Foreign Key a Usuario (Relación 1 a 1)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, unique=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
     
     # Datos de identificación
-    dni = Column(String(20), nullable=True, unique=True, index=True)
+    dni = Column(String(20), nullable=True)
     fecha_nacimiento = Column(Date, nullable=True)
     genero = Column(SQLEnum(Genero), nullable=True)
     
@@ -30,8 +49,8 @@ class Persona(Base):
     telefono_alternativo = Column(String(20), nullable=True)
     email_alternativo = Column(String(255), nullable=True)
     
-    # Dirección
-    direccion = Column(Text, nullable=True)
+    # Dirección (texto largo: se carga solo cuando se pide, ver grupo "extendido")
+    direccion = deferred(Column(Text, nullable=True), group="extendido")
     ciudad = Column(String(100), nullable=True)
     estado_provincia = Column(String(100), nullable=True)
     codigo_postal = Column(String(20), nullable=True)
@@ -39,7 +58,7 @@ class Persona(Base):
     
     # Información adicional
     foto_perfil = Column(String(500), nullable=True)  # URL o path de la imagen
-    biografia = Column(Text, nullable=True)
+    biografia = deferred(Column(Text, nullable=True), group="extendido")
     sitio_web = Column(String(255), nullable=True)
     
     # Redes sociales (opcional, podrían ser campos JSON en el futuro)
@@ -1,16 +1,28 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Index, Text, DateTime, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class Rol(Base):
+class Rol(TenantMixin, Base):
     __tablename__ = "roles"
 
+    # Recuperar created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Únicos dentro de cada tenant; (tenant_id, id) es el destino de las
+    # claves foráneas compuestas de las tablas intermedias
+    __table_args__ = (
+        Index("ix_roles_nombre", "tenant_id", "nombre", unique=True),
+        Index("ix_roles_tenant_id_id", "tenant_id", "id", unique=True),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(100), nullable=False, unique=True, index=True)
+    nombre = Column(String(100), nullable=False)
     descripcion = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    parent_id = Column(Integer, ForeignKey("roles.id", ondelete="SET NULL"), nullable=True, index=True)  # Rol del que hereda permisos y módulos
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -18,21 +30,24 @@ class Rol(Base):
     usuarios = relationship(
         "UsuarioRol",
         back_populates="rol",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación N a N con Permisos
     permisos = relationship(
         "RolPermiso",
         back_populates="rol",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación N a N con Módulos
     modulos = relationship(
         "RolModulo",
         back_populates="rol",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     def __repr__(self):
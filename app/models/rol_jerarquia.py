@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.core.database import Base
+from app.models.tenant import TenantMixin
+
+
+class RolJerarquia(TenantMixin, Base):
+    """
+    Clausura transitiva de la jerarquía de roles: una fila por cada par
+    (ancestro, descendiente), incluida la del rol consigo mismo (profundidad 0).
+    Un rol hereda los permisos y módulos de todos sus ancestros, así los
+    permisos efectivos salen de un join por descendiente_id sin recorrer la
+    jerarquía. La mantiene app.services.rol_jerarquia.
+    """
+    __tablename__ = "rol_jerarquia"
+
+    # Clave (descendiente_id, ancestro_id): los ancestros de un rol son un rango del índice
+    descendiente_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
+    ancestro_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True, index=True)
+    profundidad = Column(Integer, nullable=False)  # 0: el propio rol, 1: el padre, ...
+
+    def __repr__(self):
+        return f"<RolJerarquia(ancestro_id={self.ancestro_id}, descendiente_id={self.descendiente_id})>"
@@ -2,17 +2,18 @@ from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class RolModulo(Base):
+class RolModulo(TenantMixin, Base):
     """
     Tabla intermedia para relación N a N entre Roles y Módulos
     """
     __tablename__ = "rol_modulo"
 
     id = Column(Integer, primary_key=True, index=True)
-    rol_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
-    modulo_id = Column(Integer, ForeignKey("modulos.id"), nullable=False)
+    rol_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE"), nullable=False, index=True)
+    modulo_id = Column(Integer, ForeignKey("modulos.id", ondelete="CASCADE"), nullable=False, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
     fecha_asignacion = Column(DateTime(timezone=True), server_default=func.now())
     
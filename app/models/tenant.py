@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Tenant(Base):
+    """
+    Cliente (organización) de la instalación.
+    Los datos de cada tenant están aislados: ver TenantMixin y app.core.tenancy.
+    """
+    __tablename__ = "tenants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(50), nullable=False, unique=True, index=True)  # Se envía en X-Tenant al hacer login
+    nombre = Column(String(200), nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<Tenant(id={self.id}, slug='{self.slug}')>"
+
+
+class TenantMixin:
+    """
+    Columna tenant_id de las tablas con datos por cliente.
+    Las consultas de una sesión con tenant se filtran automáticamente por esta
+    columna y las filas nuevas la reciben del tenant de la sesión.
+    """
+
+    @declared_attr
+    def tenant_id(cls):
+        # Sin índice propio: los índices de cada tabla empiezan por tenant_id
+        return Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False)
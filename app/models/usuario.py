@@ -1,15 +1,31 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class Usuario(Base):
+class Usuario(TenantMixin, Base):
+    """
+    En PostgreSQL la tabla está particionada por HASH (tenant_id): la clave
+    primaria física es (tenant_id, id). `id` sigue siendo único (secuencia
+    compartida) y es la identidad de la entidad en el ORM.
+    """
     __tablename__ = "usuarios"
 
+    # Recuperar created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Username y email únicos dentro de cada tenant
+    __table_args__ = (
+        Index("ix_usuarios_username", "tenant_id", "username", unique=True),
+        Index("ix_usuarios_email", "tenant_id", "email", unique=True),
+        Index("ix_usuarios_nombre_completo", "tenant_id", "nombre_completo"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), nullable=False, unique=True, index=True)
-    email = Column(String(255), nullable=False, unique=True, index=True)
+    username = Column(String(50), nullable=False)
+    email = Column(String(255), nullable=False)
     nombre_completo = Column(String(200), nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -24,7 +40,8 @@ class Usuario(Base):
     roles = relationship(
         "UsuarioRol",
         back_populates="usuario",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # Relación 1 a 1 con Persona
@@ -32,7 +49,8 @@ class Usuario(Base):
         "Persona",
         back_populates="usuario",
         uselist=False,
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     def __repr__(self):
@@ -1,24 +1,69 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, Index, and_, or_, text
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.tenant import TenantMixin
 
 
-class UsuarioRol(Base):
+def utc(fecha: Optional[datetime]) -> Optional[datetime]:
+    """Fecha con zona horaria (las que no la tienen se toman como UTC)"""
+    if fecha is None or fecha.tzinfo is not None:
+        return fecha
+    return fecha.replace(tzinfo=timezone.utc)
+
+
+class UsuarioRol(TenantMixin, Base):
     """
-    Tabla intermedia para relación N a N entre Usuarios y Roles
+    Tabla intermedia para relación N a N entre Usuarios y Roles.
+    En PostgreSQL está particionada por HASH (tenant_id), como usuarios.
+    Una asignación puede ser temporal (valid_from / valid_until): al vencer
+    la desactiva el programador de vigencias (app.services.vigencia_roles),
+    que también avisa su inicio.
     """
     __tablename__ = "usuario_rol"
+    __table_args__ = (
+        # Próximos vencimientos (solo las asignaciones temporales)
+        Index(
+            "ix_usuario_rol_valid_until", "valid_until",
+            postgresql_where=text("valid_until IS NOT NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
-    rol_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+    rol_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE"), nullable=False, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
     fecha_asignacion = Column(DateTime(timezone=True), server_default=func.now())
+    valid_from = Column(DateTime(timezone=True), nullable=True)  # Sin fecha: desde la asignación
+    valid_until = Column(DateTime(timezone=True), nullable=True)  # Sin fecha: sin vencimiento
+    # valid_from futuro cuyo inicio aún no avisó el programador: lo apaga el
+    # worker que lo avisa, con un UPDATE condicional (uno solo por inicio)
+    inicio_pendiente = Column(Boolean, default=False, server_default=text("false"), nullable=False)
     
     # Relaciones
     usuario = relationship("Usuario", back_populates="roles")
     rol = relationship("Rol", back_populates="usuarios")
 
+    @hybrid_property
+    def vigente(self) -> bool:
+        """Activa y dentro de su período de validez"""
+        ahora = datetime.now(timezone.utc)
+        return (
+            self.is_active
+            and (self.valid_from is None or utc(self.valid_from) <= ahora)
+            and (self.valid_until is None or utc(self.valid_until) > ahora)
+        )
+
+    @vigente.expression
+    def vigente(cls):
+        return and_(
+            cls.is_active == True,
+            or_(cls.valid_from.is_(None), cls.valid_from <= func.now()),
+            or_(cls.valid_until.is_(None), cls.valid_until > func.now())
+        )
+
     def __repr__(self):
         return f"<UsuarioRol(usuario_id={self.usuario_id}, rol_id={self.rol_id})>"
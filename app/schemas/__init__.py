@@ -35,6 +35,8 @@ from app.schemas.persona import (
     PersonaUpdate,
     PersonaResponse
 )
+from app.schemas.batch import BatchResponse, BulkUpdateResponse
+from app.schemas.auditoria import AuditoriaResponse
 
 __all__ = [
     "UsuarioBase",
@@ -64,4 +66,7 @@ __all__ = [
     "PersonaCreate",
     "PersonaUpdate",
     "PersonaResponse",
+    "BatchResponse",
+    "BulkUpdateResponse",
+    "AuditoriaResponse",
 ]
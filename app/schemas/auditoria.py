@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+
+class AuditoriaResponse(BaseModel):
+    id: int
+    ocurrido_en: datetime
+    actor_id: Optional[int] = None
+    accion: str
+    entidad: str
+    entidad_id: Optional[int] = None
+    antes: Optional[Dict[str, Any]] = None  # Solo los campos que cambiaron
+    despues: Optional[Dict[str, Any]] = None
+
+    model_config = ConfigDict(from_attributes=True)
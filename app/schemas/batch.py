@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Generic, List, TypeVar
+
+T = TypeVar("T")
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: List[T] = []  # En el orden de los ids pedidos
+    missing: List[int] = []  # Ids pedidos que no existen
+
+
+class BulkUpdateResponse(BaseModel):
+    affected: int  # Filas modificadas por el UPDATE
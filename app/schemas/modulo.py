@@ -31,8 +31,27 @@ class ModuloUpdate(BaseModel):
     permiso_ids: Optional[List[int]] = None
 
 
+class ModuloBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    parent_id: Optional[int] = None
+    tipo: Optional[TipoModulo] = None
+    is_active: Optional[bool] = None
+
+
+class ModuloBulkPatch(BaseModel):
+    is_active: Optional[bool] = None
+    orden: Optional[int] = None
+    tipo: Optional[TipoModulo] = None
+
+
+class ModuloBulkUpdate(BaseModel):
+    filtro: ModuloBulkFilter
+    cambios: ModuloBulkPatch
+
+
 class ModuloResponse(ModuloBase):
     id: int
+    camino: str = "/"  # Ids de los ancestros desde la raíz ("/1/5/")
     created_at: datetime
     updated_at: Optional[datetime] = None
 
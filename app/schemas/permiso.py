@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -21,6 +21,21 @@ class PermisoUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class PermisoBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    codigo_prefijo: Optional[str] = Field(None, min_length=1, max_length=50)  # ej. "usuarios."
+    is_active: Optional[bool] = None
+
+
+class PermisoBulkPatch(BaseModel):
+    is_active: Optional[bool] = None
+
+
+class PermisoBulkUpdate(BaseModel):
+    filtro: PermisoBulkFilter
+    cambios: PermisoBulkPatch
+
+
 class PermisoResponse(PermisoBase):
     id: int
     created_at: datetime
@@ -42,3 +57,13 @@ class PermisoWithRelations(PermisoResponse):
     modulos_count: Optional[int] = 0
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class PermisoCheckRequest(BaseModel):
+    codigos: List[str] = Field(..., min_length=1)
+    usuario_id: Optional[int] = None  # Otro usuario (solo superusuarios)
+
+
+class PermisoCheckResponse(BaseModel):
+    usuario_id: int
+    permisos: Dict[str, bool]  # código -> el usuario tiene el permiso
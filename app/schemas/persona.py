@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, Field, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, model_validator
+from typing import Dict, List, Optional
 from datetime import date, datetime
 from app.models.persona import Genero
 
@@ -48,6 +48,26 @@ class PersonaUpdate(BaseModel):
     github: Optional[str] = Field(None, max_length=255)
 
 
+class PersonaBulkItem(PersonaUpdate):
+    usuario_id: int
+
+
+class PersonaBulkUpsert(BaseModel):
+    items: List[PersonaBulkItem] = Field(..., min_length=1)
+
+
+class PersonaBulkConflicto(BaseModel):
+    usuario_id: int
+    dni: Optional[str] = None
+    motivo: str  # usuario_inexistente | dni_duplicado | dni_en_uso
+
+
+class PersonaBulkResponse(BaseModel):
+    created: int
+    updated: int
+    conflicts: List[PersonaBulkConflicto] = []  # Filas no aplicadas
+
+
 class PersonaResponse(PersonaBase):
     id: int
     usuario_id: int
@@ -55,3 +75,42 @@ class PersonaResponse(PersonaBase):
     updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class PersonaFiltros(BaseModel):
+    ciudad: Optional[str] = None
+    estado_provincia: Optional[str] = None
+    pais: Optional[str] = None
+    genero: Optional[Genero] = None
+    edad_min: Optional[int] = Field(None, ge=0, le=150)
+    edad_max: Optional[int] = Field(None, ge=0, le=150)
+
+    @model_validator(mode="after")
+    def _rango_edad(self) -> "PersonaFiltros":
+        if self.edad_min is not None and self.edad_max is not None and self.edad_min > self.edad_max:
+            raise ValueError("edad_min no puede ser mayor que edad_max")
+        return self
+
+
+class PersonaDirectorioItem(BaseModel):
+    id: int
+    usuario_id: int
+    nombre_completo: str
+    email: str
+    ciudad: Optional[str] = None
+    estado_provincia: Optional[str] = None
+    pais: Optional[str] = None
+    genero: Optional[Genero] = None
+    fecha_nacimiento: Optional[date] = None
+    foto_perfil: Optional[str] = None
+
+
+class FacetaValor(BaseModel):
+    valor: Optional[str] = None  # None = sin dato
+    total: int
+
+
+class PersonaDirectorioResponse(BaseModel):
+    total: int
+    items: List[PersonaDirectorioItem] = []
+    facetas: Dict[str, List[FacetaValor]] = {}  # ciudad, estado_provincia, pais, genero, edad
@@ -2,13 +2,14 @@ from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 from app.schemas.permiso import PermisoSimple
-# from app.schemas.modulo import ModuloSimple
+from app.schemas.usuario import ModuloSimple
 
 
 class RolBase(BaseModel):
     nombre: str = Field(..., min_length=1, max_length=100)
     descripcion: Optional[str] = None
     is_active: Optional[bool] = True
+    parent_id: Optional[int] = None  # Rol del que hereda permisos y módulos
 
 
 class RolCreate(RolBase):
@@ -19,9 +20,24 @@ class RolUpdate(BaseModel):
     nombre: Optional[str] = Field(None, min_length=1, max_length=100)
     descripcion: Optional[str] = None
     is_active: Optional[bool] = None
+    parent_id: Optional[int] = None  # null explícito: sin padre (omitido: sin cambios)
     permiso_ids: Optional[List[int]] = None
 
 
+class RolBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    is_active: Optional[bool] = None
+
+
+class RolBulkPatch(BaseModel):
+    is_active: Optional[bool] = None
+
+
+class RolBulkUpdate(BaseModel):
+    filtro: RolBulkFilter
+    cambios: RolBulkPatch
+
+
 class RolResponse(RolBase):
     id: int
     created_at: datetime
@@ -32,7 +48,7 @@ class RolResponse(RolBase):
 
 class RolWithRelations(RolResponse):
     permisos: List[PermisoSimple] = []
-    # modulos: List[ModuloSimple] = []
+    modulos: List[ModuloSimple] = []
     usuarios_count: Optional[int] = 0
 
     model_config = ConfigDict(from_attributes=True)
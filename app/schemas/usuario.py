@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, ConfigDict, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 
 
@@ -11,8 +11,16 @@ class UsuarioBase(BaseModel):
     rol_ids: Optional[List[int]] = []
 
 
+class RolAsignacion(BaseModel):
+    """Asignación de un rol acotada en el tiempo (fechas sin zona: UTC)"""
+    rol_id: int
+    valid_from: Optional[datetime] = None  # Sin fecha: desde ya
+    valid_until: Optional[datetime] = None  # Sin fecha: sin vencimiento
+
+
 class UsuarioCreate(UsuarioBase):
     password: str = Field(..., min_length=6)
+    rol_ids: Optional[List[Union[int, RolAsignacion]]] = []  # Id o asignación con vigencia
 
 
 class UsuarioUpdate(BaseModel):
@@ -21,7 +29,22 @@ class UsuarioUpdate(BaseModel):
     nombre_completo: Optional[str] = Field(None, min_length=1, max_length=200)
     password: Optional[str] = Field(None, min_length=6)
     is_active: Optional[bool] = None
-    rol_ids: Optional[List[int]] = None
+    rol_ids: Optional[List[Union[int, RolAsignacion]]] = None  # Id o asignación con vigencia
+
+
+class UsuarioBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    rol_id: Optional[int] = None  # Usuarios con este rol asignado
+    is_active: Optional[bool] = None
+
+
+class UsuarioBulkPatch(BaseModel):
+    is_active: Optional[bool] = None
+
+
+class UsuarioBulkUpdate(BaseModel):
+    filtro: UsuarioBulkFilter
+    cambios: UsuarioBulkPatch
 
 
 class RolSimple(BaseModel):
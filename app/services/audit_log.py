@@ -0,0 +1,296 @@
+"""
+Registro de auditoría asíncrono.
+
+Los servicios anotan cada cambio (antes/después) en la sesión con
+`registrar`. Al confirmarse la transacción las entradas pasan a una cola en
+memoria y un hilo en segundo plano las inserta en lotes en `auditoria`; si la
+transacción se revierte, se descartan. El request nunca espera una escritura
+de auditoría.
+
+En PostgreSQL `auditoria` está particionada por mes. El escritor crea las
+particiones del mes en curso y el siguiente al arrancar y antes de cada
+lote. Si una creación falla (p. ej. lock timeout), las filas de ese mes
+caen en `auditoria_default`; al reintentar, la partición se crea moviendo
+esas filas desde la partición por defecto, así el mes no queda ahí para
+siempre.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from pydantic_core import to_jsonable_python
+from sqlalchemy import event, insert, inspect, text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.auditoria import Auditoria
+
+logger = logging.getLogger(__name__)
+
+# Columnas que no se registran (secretos y metadatos)
+EXCLUIDOS = {"hashed_password", "created_at", "updated_at", "last_login"}
+
+# Clave de Session.info con las entradas pendientes de la transacción
+CLAVE_SESION = "auditoria"
+
+
+def instantanea(obj) -> Dict[str, Any]:
+    """Valores de las columnas de una entidad (sin las excluidas)"""
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in inspect(obj).mapper.column_attrs
+        if attr.key not in EXCLUIDOS
+    }
+
+
+def _sin_excluidos(valores: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if valores is None:
+        return None
+    return {campo: valor for campo, valor in valores.items() if campo not in EXCLUIDOS}
+
+
+def registrar(
+    db: Session,
+    accion: str,
+    model,
+    entidad_id: Optional[int],
+    antes: Optional[Dict[str, Any]] = None,
+    despues: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Anotar un cambio en la transacción de la sesión.
+    Con antes y después solo se guardan los campos que cambiaron; si no
+    cambió ninguno no se registra nada.
+    """
+    antes, despues = _sin_excluidos(antes), _sin_excluidos(despues)
+    if antes is not None and despues is not None:
+        cambiados = {c for c in antes.keys() | despues.keys() if antes.get(c) != despues.get(c)}
+        if not cambiados:
+            return
+        antes = {c: v for c, v in antes.items() if c in cambiados}
+        despues = {c: v for c, v in despues.items() if c in cambiados}
+
+    db.info.setdefault(CLAVE_SESION, []).append({
+        "ocurrido_en": datetime.now(timezone.utc),
+        "tenant_id": db.info.get("tenant_id"),
+        "actor_id": db.info.get("actor_id"),
+        "accion": accion,
+        "entidad": model.__tablename__,
+        "entidad_id": entidad_id,
+        "antes": antes,
+        "despues": despues,
+    })
+
+
+def _mes_siguiente(fecha: datetime) -> datetime:
+    if fecha.month == 12:
+        return fecha.replace(year=fecha.year + 1, month=1)
+    return fecha.replace(month=fecha.month + 1)
+
+
+class AuditLogWriter:
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._cola: Deque[dict] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._particiones: Set[Tuple[int, int]] = set()
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_lag = 0.0
+
+    def enqueue(self, entradas: List[dict]) -> None:
+        """Encolar las entradas de una transacción confirmada"""
+        with self._lock:
+            libres = max(self.max_pending - len(self._cola), 0)
+            if len(entradas) > libres:
+                self.dropped += len(entradas) - libres
+                entradas = entradas[:libres]
+            self._cola.extend(entradas)
+            lote_completo = len(self._cola) >= self.batch_size
+        if lote_completo:
+            self._despertar.set()
+
+    def flush(self) -> int:
+        """Escribir lo pendiente en lotes de batch_size; devuelve las filas escritas"""
+        escritas = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    n = min(len(self._cola), self.batch_size)
+                    lote = [self._cola.popleft() for _ in range(n)]
+                if not lote or not self._escribir(lote):
+                    return escritas
+                escritas += len(lote)
+
+    def _escribir(self, lote: List[dict]) -> bool:
+        """Un INSERT por lote; si falla, el lote vuelve al principio de la cola"""
+        inicio = time.monotonic()
+        filas = [
+            {**entrada, "antes": to_jsonable_python(entrada["antes"]), "despues": to_jsonable_python(entrada["despues"])}
+            for entrada in lote
+        ]
+        db = SessionLocal()
+        try:
+            self._asegurar_particiones(db, lote[-1]["ocurrido_en"])
+            db.execute(insert(Auditoria), filas)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.failures += 1
+            logger.exception("Error al escribir la auditoría; se reintentará")
+            self._reencolar(lote)
+            return False
+        finally:
+            db.close()
+
+        self.written += len(lote)
+        self.last_flush_rows = len(lote)
+        self.last_flush_ms = (time.monotonic() - inicio) * 1000
+        self.last_flush_lag = (datetime.now(timezone.utc) - lote[0]["ocurrido_en"]).total_seconds()
+        return True
+
+    def _asegurar_particiones(self, db: Session, fecha: datetime) -> None:
+        """
+        PostgreSQL: crear las particiones mensuales del mes de `fecha` y el
+        siguiente. Lo que no tenga partición cae en `auditoria_default`.
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        desde = fecha.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(2):
+            hasta = _mes_siguiente(desde)
+            if (desde.year, desde.month) not in self._particiones:
+                try:
+                    with db.begin_nested():
+                        self._crear_particion(db, desde, hasta)
+                    self._particiones.add((desde.year, desde.month))
+                except Exception:
+                    logger.warning("No se pudo crear la partición auditoria_%s", f"{desde:%Y_%m}", exc_info=True)
+            desde = hasta
+
+    @staticmethod
+    def _crear_particion(db: Session, desde: datetime, hasta: datetime) -> None:
+        """
+        Crear la partición [desde, hasta). Si la partición por defecto ya tiene
+        filas de ese rango (un intento anterior falló), PostgreSQL rechaza el
+        CREATE: se desvincula la partición por defecto, se crea la mensual, se
+        mueven las filas y se vuelve a vincular. DETACH bloquea `auditoria`
+        hasta el commit, así ningún INSERT queda sin partición en el medio.
+        """
+        nombre = f"auditoria_{desde:%Y_%m}"
+        if db.execute(text("SELECT to_regclass(:nombre) IS NOT NULL"), {"nombre": nombre}).scalar():
+            return
+        crear = text(
+            f"CREATE TABLE {nombre} PARTITION OF auditoria "
+            f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+        )
+        rango = {"desde": desde, "hasta": hasta}
+        en_default = db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM auditoria_default WHERE ocurrido_en >= :desde AND ocurrido_en < :hasta)"
+        ), rango).scalar()
+        if not en_default:
+            db.execute(crear)
+            return
+
+        db.execute(text("ALTER TABLE auditoria DETACH PARTITION auditoria_default"))
+        db.execute(crear)
+        movidas = db.execute(text(
+            f"WITH movidas AS ("
+            f"  DELETE FROM auditoria_default WHERE ocurrido_en >= :desde AND ocurrido_en < :hasta RETURNING *"
+            f") INSERT INTO {nombre} SELECT * FROM movidas"
+        ), rango).rowcount
+        db.execute(text("ALTER TABLE auditoria ATTACH PARTITION auditoria_default DEFAULT"))
+        logger.info("Partición %s creada; %s filas movidas desde auditoria_default", nombre, movidas)
+
+    def preparar(self) -> None:
+        """Crear por adelantado las particiones del mes en curso y el siguiente"""
+        db = SessionLocal()
+        try:
+            self._asegurar_particiones(db, datetime.now(timezone.utc))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.warning("No se pudieron preparar las particiones de auditoría", exc_info=True)
+        finally:
+            db.close()
+
+    def _reencolar(self, lote: List[dict]) -> None:
+        """Devolver un lote fallido al principio de la cola (se descartan los más antiguos si no caben)"""
+        with self._lock:
+            libres = max(self.max_pending - len(self._cola), 0)
+            if len(lote) > libres:
+                self.dropped += len(lote) - libres
+                lote = lote[len(lote) - libres:]
+            self._cola.extendleft(reversed(lote))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Cada flush_interval, o antes si se llenó un lote
+            self._despertar.wait(self.flush_interval)
+            self._despertar.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        # Antes de cualquier INSERT: las filas del mes no caen en la partición por defecto
+        self.preparar()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el hilo y escribir lo pendiente"""
+        self._stop.set()
+        self._despertar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        """Métricas de la cola de auditoría"""
+        with self._lock:
+            pendientes = len(self._cola)
+            mas_antigua = self._cola[0]["ocurrido_en"] if self._cola else None
+        lag = (datetime.now(timezone.utc) - mas_antigua).total_seconds() if mas_antigua else 0.0
+        return {
+            "pending": pendientes,
+            "current_lag_seconds": round(lag, 3),
+            "last_flush_lag_seconds": round(self.last_flush_lag, 3),
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+audit_log = AuditLogWriter(
+    flush_interval=settings.AUDIT_FLUSH_SECONDS,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    max_pending=settings.AUDIT_MAX_PENDING
+)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _encolar_confirmadas(session: Session) -> None:
+    entradas = session.info.pop(CLAVE_SESION, None)
+    if entradas:
+        audit_log.enqueue(entradas)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_revertidas(session: Session) -> None:
+    session.info.pop(CLAVE_SESION, None)
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import RowMapping
+from typing import List, Optional
+from datetime import datetime
+from app.models.auditoria import Auditoria
+from app.db import queries
+
+
+class AuditoriaService:
+    @staticmethod
+    def get_registros(
+        db: Session,
+        actor_id: Optional[int] = None,
+        entidad: Optional[str] = None,
+        entidad_id: Optional[int] = None,
+        accion: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[RowMapping]:
+        """
+        Registros de auditoría, del más reciente al más antiguo.
+        Los filtros por actor o por entidad usan sus índices compuestos con
+        la fecha; el rango de fechas además descarta particiones enteras.
+        """
+        query = queries.AUDITORIA_LISTA
+        if actor_id is not None:
+            query = query.where(Auditoria.actor_id == actor_id)
+        if entidad is not None:
+            query = query.where(Auditoria.entidad == entidad)
+        if entidad_id is not None:
+            query = query.where(Auditoria.entidad_id == entidad_id)
+        if accion is not None:
+            query = query.where(Auditoria.accion == accion)
+        if desde is not None:
+            query = query.where(Auditoria.ocurrido_en >= desde)
+        if hasta is not None:
+            query = query.where(Auditoria.ocurrido_en < hasta)
+
+        query = query.order_by(Auditoria.ocurrido_en.desc(), Auditoria.id.desc())
+        return db.execute(query.offset(skip).limit(limit)).mappings().all()
@@ -0,0 +1,62 @@
+"""
+Actualizaciones masivas.
+
+Un lote (lista de ids o filtro + cambios) se aplica con un único UPDATE en la
+base de datos, sin cargar las entidades. La sesión sincroniza en el mismo
+paso los objetos que ya tenga en memoria (identity map), así el resto del
+request ve los valores nuevos sin otro SELECT.
+"""
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.core.batch import validar_ids
+from app.services.audit_log import registrar
+from app.services.integrity import flush_or_raise
+
+
+def actualizar_en_lote(
+    db: Session,
+    model,
+    condiciones: List[Any],
+    cambios: Dict[str, Any],
+    filtro: Optional[Dict[str, Any]] = None
+) -> List[int]:
+    """
+    Aplicar `cambios` a las filas que cumplen `condiciones`; devuelve los ids afectados.
+    `filtro` es la descripción del lote que queda en la auditoría.
+    """
+    if not condiciones:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar ids o al menos un filtro"
+        )
+    if not cambios:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No hay cambios que aplicar"
+        )
+
+    # Escrituras pendientes primero: el UPDATE debe verlas
+    flush_or_raise(db)
+
+    # updated_at se actualiza por el onupdate de la columna.
+    # RETURNING id: la sincronización de la sesión ya lo pide ("auto" = "fetch"
+    # en motores con RETURNING), así que los ids no cuestan otra consulta
+    stmt = (
+        update(model)
+        .where(*condiciones)
+        .values(**cambios)
+        .returning(model.id)
+        .execution_options(synchronize_session="auto")
+    )
+    ids = db.execute(stmt).scalars().all()
+    registrar(db, "bulk_update", model, None, despues={"filtro": filtro, "cambios": cambios, "affected": len(ids)})
+    return ids
+
+
+def condicion_ids(model, ids) -> List[Any]:
+    """Condición `id IN (...)` validada contra el límite de lote, o ninguna"""
+    if ids is None:
+        return []
+    return [model.id.in_(validar_ids(ids))]
@@ -0,0 +1,314 @@
+"""
+Eventos de cambios de acceso (Server-Sent Events).
+
+Los servicios anotan en la sesión qué cambió (`notificar`) con destino a
+tópicos: `usuario:<id>` o `rol:<id>`. Los eventos solo salen si la
+transacción se confirma:
+
+- PostgreSQL: se envían con `pg_notify` dentro de la misma transacción (la
+  base de datos los entrega al confirmar) y cada worker los recibe con un
+  LISTEN propio, así llegan a las conexiones SSE de todos los workers. Detrás
+  de PgBouncer (modo transacción, sin LISTEN) el listener se conecta a
+  DATABASE_LISTEN_URL.
+- Otros motores, o PgBouncer sin DATABASE_LISTEN_URL: se publican en el
+  proceso tras el commit (solo los ve el worker que hizo el cambio).
+
+Cada conexión SSE es una `Suscripcion` con una cola acotada. Si un cliente
+no lee y su cola se llena, se vacía y recibe un único evento `resync`
+(volver a consultar /auth/me) en lugar de bloquear al resto.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+CANAL = "eventos_acceso"
+
+# Clave de Session.info con los eventos pendientes de la transacción
+CLAVE_SESION = "eventos_acceso"
+
+# pg_notify admite hasta 8000 bytes por mensaje: los eventos con muchos
+# destinatarios se parten en varios
+TOPICOS_POR_MENSAJE = 300
+
+
+def topico_usuario(usuario_id: int) -> str:
+    return f"usuario:{usuario_id}"
+
+
+def topico_rol(rol_id: int) -> str:
+    return f"rol:{rol_id}"
+
+
+def notificar(db: Session, topicos: Iterable[str], tipo: str, **datos) -> None:
+    """Anotar un evento para los tópicos dados; se envía al confirmar la transacción"""
+    topicos = sorted(set(topicos))
+    if topicos:
+        db.info.setdefault(CLAVE_SESION, []).append({"topicos": topicos, "tipo": tipo, "datos": datos})
+
+
+def _partir(evento: dict) -> List[dict]:
+    topicos = evento["topicos"]
+    return [
+        {**evento, "topicos": topicos[i:i + TOPICOS_POR_MENSAJE]}
+        for i in range(0, len(topicos), TOPICOS_POR_MENSAJE)
+    ]
+
+
+class Suscripcion:
+    """Una conexión SSE: tópicos del usuario y cola de eventos pendientes"""
+
+    def __init__(self, usuario_id: int, rol_ids: Iterable[int], max_cola: int):
+        self.usuario_id = usuario_id
+        self.rol_ids: Set[int] = set(rol_ids)
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_cola)
+        self.desbordes = 0
+
+    @property
+    def topicos(self) -> Set[str]:
+        return {topico_usuario(self.usuario_id)} | {topico_rol(r) for r in self.rol_ids}
+
+    def entregar(self, evento: dict) -> bool:
+        """Encolar sin bloquear; si la cola está llena se reemplaza por un `resync`"""
+        try:
+            self.cola.put_nowait(evento)
+            return True
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({"tipo": "resync", "datos": {}})
+            self.desbordes += 1
+            return False
+
+
+class EventHub:
+    """Reparto de eventos a las conexiones SSE de este worker"""
+
+    def __init__(self, max_conexiones: int, max_cola: int):
+        self.max_conexiones = max_conexiones
+        self.max_cola = max_cola
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._por_topico: Dict[str, Set[Suscripcion]] = {}
+        self._conexiones = 0
+        self._secuencia = itertools.count(1)
+        self._observadores: List[Callable[[dict], None]] = []
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self._motor_listen = None  # engine de DATABASE_LISTEN_URL (sin pool)
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.listener_errors = 0
+
+    @property
+    def usa_postgres(self) -> bool:
+        """Eventos por pg_notify + LISTEN (hace falta una conexión que admita LISTEN)"""
+        if engine.dialect.name != "postgresql":
+            return False
+        return not settings.DB_PGBOUNCER or bool(settings.DATABASE_LISTEN_URL)
+
+    def _conexion_listen(self):
+        """Conexión DBAPI para el LISTEN, fuera del pool"""
+        if settings.DATABASE_LISTEN_URL:
+            if self._motor_listen is None:
+                self._motor_listen = create_engine(settings.DATABASE_LISTEN_URL, poolclass=NullPool)
+            return self._motor_listen.raw_connection()
+        conexion = engine.raw_connection()
+        conexion.detach()
+        return conexion
+
+    # --- ciclo de vida (lifespan) ---
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if engine.dialect.name == "postgresql" and not self.usa_postgres:
+            logger.warning(
+                "DB_PGBOUNCER sin DATABASE_LISTEN_URL: los eventos de acceso se publican "
+                "solo en el worker que hace el cambio (SSE y cache de permisos de los demás "
+                "workers no se enteran)"
+            )
+        if self.usa_postgres and self._listener is None:
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._escuchar, name="eventos-acceso-listener", daemon=True)
+            self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join()
+            self._listener = None
+        self._loop = None
+
+    # --- conexiones (solo desde el event loop) ---
+
+    def suscribir(self, usuario_id: int, rol_ids: Iterable[int]) -> Optional[Suscripcion]:
+        """Registrar una conexión; None si el worker está al máximo"""
+        if self._conexiones >= self.max_conexiones:
+            return None
+        suscripcion = Suscripcion(usuario_id, rol_ids, self.max_cola)
+        self._indexar(suscripcion)
+        self._conexiones += 1
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion) -> None:
+        self._desindexar(suscripcion)
+        self._conexiones -= 1
+
+    def _indexar(self, suscripcion: Suscripcion) -> None:
+        for topico in suscripcion.topicos:
+            self._por_topico.setdefault(topico, set()).add(suscripcion)
+
+    def _desindexar(self, suscripcion: Suscripcion) -> None:
+        for topico in suscripcion.topicos:
+            suscriptores = self._por_topico.get(topico)
+            if suscriptores is not None:
+                suscriptores.discard(suscripcion)
+                if not suscriptores:
+                    del self._por_topico[topico]
+
+    def observar(self, funcion: Callable[[dict], None]) -> None:
+        """Llamar a `funcion` con cada evento publicado (caches que dependen de los accesos)"""
+        self._observadores.append(funcion)
+
+    # --- publicación ---
+
+    def publicar(self, eventos: List[dict]) -> None:
+        """Publicar desde cualquier hilo; el reparto se hace en el event loop"""
+        loop = self._loop
+        if loop is not None and eventos:
+            loop.call_soon_threadsafe(self._distribuir, eventos)
+
+    def _distribuir(self, eventos: List[dict]) -> None:
+        for evento in eventos:
+            self.published += 1
+            for funcion in self._observadores:
+                funcion(evento)
+            destinatarios: Set[Suscripcion] = set()
+            for topico in evento["topicos"]:
+                destinatarios.update(self._por_topico.get(topico, ()))
+            if not destinatarios:
+                continue
+
+            salida = {"id": next(self._secuencia), "tipo": evento["tipo"], "datos": evento["datos"]}
+            for suscripcion in destinatarios:
+                if evento["tipo"] == "roles" and "rol_ids" in evento["datos"]:
+                    # Roles reasignados: la conexión pasa a escuchar los nuevos
+                    self._desindexar(suscripcion)
+                    suscripcion.rol_ids = set(evento["datos"]["rol_ids"])
+                    self._indexar(suscripcion)
+                if suscripcion.entregar(salida):
+                    self.delivered += 1
+                else:
+                    self.overflows += 1
+
+    def _escuchar(self) -> None:
+        """PostgreSQL: LISTEN en una conexión dedicada, fuera del pool"""
+        while not self._stop.is_set():
+            conexion = None
+            try:
+                conexion = self._conexion_listen()
+                dbapi = conexion.driver_connection
+                dbapi.autocommit = True
+                with dbapi.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                while not self._stop.is_set():
+                    if select.select([dbapi], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi.poll()
+                    eventos = []
+                    while dbapi.notifies:
+                        eventos.append(json.loads(dbapi.notifies.pop(0).payload))
+                    self.publicar(eventos)
+            except Exception:
+                self.listener_errors += 1
+                logger.exception("Error en LISTEN de eventos de acceso; reconectando")
+                self._stop.wait(settings.SSE_HEARTBEAT_SECONDS)
+            finally:
+                if conexion is not None:
+                    conexion.close()
+
+    def stats(self) -> dict:
+        return {
+            "connections": self._conexiones,
+            "topics": len(self._por_topico),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "listener": self._listener is not None,
+            "listener_errors": self.listener_errors,
+        }
+
+
+def _formato_sse(evento: dict) -> bytes:
+    lineas = [f"id: {evento['id']}"] if "id" in evento else []
+    lineas.append(f"event: {evento['tipo']}")
+    lineas.append(f"data: {json.dumps(evento['datos'])}")
+    return ("\n".join(lineas) + "\n\n").encode()
+
+
+def _cierra_conexion(evento: dict) -> bool:
+    """Cuenta desactivada o eliminada: no tiene sentido seguir escuchando"""
+    datos = evento["datos"]
+    return evento["tipo"] == "cuenta" and (datos.get("is_active") is False or datos.get("eliminado", False))
+
+
+async def flujo_sse(suscripcion: Suscripcion) -> AsyncIterator[bytes]:
+    """
+    Cuerpo text/event-stream de una conexión.
+    Sin eventos se envía un comentario cada SSE_HEARTBEAT_SECONDS para que
+    proxies y balanceadores no corten la conexión por inactividad.
+    """
+    try:
+        yield f"retry: {int(settings.SSE_HEARTBEAT_SECONDS * 1000)}\n\n".encode()
+        while True:
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield _formato_sse(evento)
+            if _cierra_conexion(evento):
+                return
+    finally:
+        eventos_acceso.desuscribir(suscripcion)
+
+
+eventos_acceso = EventHub(
+    max_conexiones=settings.SSE_MAX_CONNECTIONS,
+    max_cola=settings.SSE_QUEUE_SIZE
+)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _enviar_pg_notify(session: Session) -> None:
+    if not session.info.get(CLAVE_SESION) or not eventos_acceso.usa_postgres:
+        return
+    eventos = session.info.pop(CLAVE_SESION)
+    mensajes = [json.dumps(parte) for evento in eventos for parte in _partir(evento)]
+    # Un solo round-trip para todos los mensajes de la transacción
+    session.execute(
+        text("SELECT pg_notify(:canal, mensaje) FROM unnest(CAST(:mensajes AS text[])) AS mensaje"),
+        {"canal": CANAL, "mensajes": mensajes}
+    )
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publicar_confirmados(session: Session) -> None:
+    eventos = session.info.pop(CLAVE_SESION, None)
+    if eventos:
+        eventos_acceso.publicar(eventos)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_revertidos(session: Session) -> None:
+    session.info.pop(CLAVE_SESION, None)
@@ -0,0 +1,228 @@
+"""
+Almacenamiento de fotos de perfil direccionado por contenido.
+
+El cuerpo multipart se procesa a medida que llega: los bytes del campo
+`foto` se escriben a un temporal y se hashean (SHA-256) sin cargar el
+archivo completo en memoria. El nombre final es el hash, así una misma
+imagen subida varias veces se guarda una sola vez y la URL nunca cambia de
+contenido (se puede cachear indefinidamente).
+
+Estructura en disco (bajo MEDIA_ROOT):
+    fotos/original/ab/<sha256>.<ext>
+    fotos/<tamaño>/ab/<sha256>.jpg     miniaturas
+    tmp/                               subidas en curso
+"""
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+CAMPO_FOTO = b"foto"
+
+# Formatos aceptados: (firma, extensión, media type)
+FORMATOS = [
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"RIFF", "webp", "image/webp"),  # + "WEBP" en el byte 8
+]
+MEDIA_TYPES = {ext: media_type for _, ext, media_type in FORMATOS}
+LARGO_FIRMA = 12
+
+NOMBRE_FOTO = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp)$")
+
+
+@dataclass
+class FotoGuardada:
+    sha256: str
+    extension: str
+    path: str
+    size: int
+    nueva: bool  # False si el contenido ya estaba almacenado
+
+    @property
+    def nombre(self) -> str:
+        return f"{self.sha256}.{self.extension}"
+
+
+def _detectar_formato(cabecera: bytes) -> Optional[str]:
+    for firma, ext, _ in FORMATOS:
+        if cabecera.startswith(firma):
+            if ext == "webp" and cabecera[8:LARGO_FIRMA] != b"WEBP":
+                continue
+            return ext
+    return None
+
+
+def path_original(sha256: str, extension: str) -> str:
+    return os.path.join(settings.MEDIA_ROOT, "fotos", "original", sha256[:2], f"{sha256}.{extension}")
+
+
+def path_miniatura(sha256: str, size: int) -> str:
+    return os.path.join(settings.MEDIA_ROOT, "fotos", str(size), sha256[:2], f"{sha256}.jpg")
+
+
+def miniaturas_pendientes(sha256: str) -> List[Tuple[int, str]]:
+    """(tamaño, destino) de las miniaturas que aún no existen"""
+    destinos = [(size, path_miniatura(sha256, size)) for size in settings.thumbnail_sizes]
+    return [(size, path) for size, path in destinos if not os.path.exists(path)]
+
+
+class _ReceptorFoto:
+    """
+    Callbacks del parser multipart.
+    Los callbacks solo acumulan; la escritura y el hash se hacen en el
+    threadpool (`escribir_pendiente`) para no bloquear el event loop.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha = hashlib.sha256()
+        self.extension: Optional[str] = None
+        self.archivo = None
+        self.encontrada = False
+        self._retenido = b""
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._en_foto = False
+        self._pendiente: List[bytes] = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._en_foto = params.get(b"name") == CAMPO_FOTO and not self.encontrada
+        if self._en_foto:
+            self.encontrada = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._en_foto:
+            self._pendiente.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._en_foto = False
+
+    def escribir_pendiente(self) -> None:
+        """Escribir y hashear lo acumulado; valida tamaño y formato"""
+        for chunk in self._pendiente:
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"La foto supera el máximo de {self.max_bytes} bytes"
+                )
+
+            if self.archivo is None:
+                # Retener hasta tener la firma completa del formato
+                self._retenido += chunk
+                if len(self._retenido) < LARGO_FIRMA:
+                    continue
+                self.extension = _detectar_formato(self._retenido)
+                if self.extension is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="Formato no soportado (JPEG, PNG o WebP)"
+                    )
+                self._abrir()
+                chunk, self._retenido = self._retenido, b""
+
+            self.sha.update(chunk)
+            self.archivo.write(chunk)
+        self._pendiente.clear()
+
+    def _abrir(self) -> None:
+        directorio = os.path.join(settings.MEDIA_ROOT, "tmp")
+        os.makedirs(directorio, exist_ok=True)
+        self.archivo = tempfile.NamedTemporaryFile(dir=directorio, delete=False)
+
+    def descartar(self) -> None:
+        if self.archivo is not None:
+            self.archivo.close()
+            try:
+                os.unlink(self.archivo.name)
+            except FileNotFoundError:
+                pass
+
+
+def _mover_a_destino(receptor: _ReceptorFoto) -> FotoGuardada:
+    """Cerrar el temporal y moverlo a su ruta final (o descartarlo si ya existe)"""
+    receptor.archivo.close()
+    sha256 = receptor.sha.hexdigest()
+    destino = path_original(sha256, receptor.extension)
+
+    if os.path.exists(destino):
+        os.unlink(receptor.archivo.name)
+        nueva = False
+    else:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Mismo sistema de archivos: el rename es atómico
+        os.replace(receptor.archivo.name, destino)
+        nueva = True
+
+    return FotoGuardada(sha256, receptor.extension, destino, receptor.size, nueva)
+
+
+async def recibir_foto(request: Request) -> FotoGuardada:
+    """Procesar el multipart del request en streaming y guardar el campo `foto`"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Se esperaba multipart/form-data con el campo 'foto'"
+        )
+
+    receptor = _ReceptorFoto(settings.FOTO_MAX_BYTES)
+    parser = MultipartParser(boundary, receptor.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receptor._pendiente:
+                await run_in_threadpool(receptor.escribir_pendiente)
+        parser.finalize()
+
+        if not receptor.encontrada or receptor.size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Falta el campo 'foto'"
+            )
+        if receptor.archivo is None:
+            # Archivo más corto que la cabecera mínima
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Formato no soportado (JPEG, PNG o WebP)"
+            )
+        return await run_in_threadpool(_mover_a_destino, receptor)
+    except BaseException:
+        receptor.descartar()
+        raise
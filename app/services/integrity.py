@@ -0,0 +1,87 @@
+"""
+Traducción de violaciones de constraints a errores HTTP.
+
+Las escrituras confían en los índices únicos y claves foráneas de la base de
+datos en lugar de hacer un SELECT previo: el INSERT/UPDATE es un único
+round-trip y sigue siendo correcto con escrituras concurrentes.
+"""
+import re
+from typing import Any, Optional
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# constraint -> (tabla.columna para motores sin nombre de constraint, status, detalle)
+CONSTRAINT_ERRORS = {
+    "ix_usuarios_username": ("usuarios.username", status.HTTP_400_BAD_REQUEST, "El username ya está en uso"),
+    "ix_usuarios_email": ("usuarios.email", status.HTTP_400_BAD_REQUEST, "El email ya está en uso"),
+    "ix_roles_nombre": ("roles.nombre", status.HTTP_400_BAD_REQUEST, "El nombre del rol ya existe"),
+    "ix_modulos_nombre": ("modulos.nombre", status.HTTP_400_BAD_REQUEST, "El nombre del módulo ya existe"),
+    "ix_permisos_codigo": ("permisos.codigo", status.HTTP_400_BAD_REQUEST, "El código del permiso ya existe"),
+    "ix_permisos_nombre": ("permisos.nombre", status.HTTP_400_BAD_REQUEST, "El nombre del permiso ya existe"),
+    "ix_personas_dni": ("personas.dni", status.HTTP_400_BAD_REQUEST, "El DNI ya está en uso"),
+    "ix_personas_usuario_id": (
+        "personas.usuario_id",
+        status.HTTP_400_BAD_REQUEST,
+        "El usuario ya tiene datos personales. Use actualizar en su lugar."
+    ),
+    "personas_usuario_id_fkey": (None, status.HTTP_404_NOT_FOUND, "Usuario no encontrado"),
+    "usuario_rol_rol_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "Uno o más roles no existen"),
+    "rol_permiso_permiso_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "Uno o más permisos no existen"),
+    "modulo_permiso_permiso_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "Uno o más permisos no existen"),
+    "rol_modulo_modulo_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "Uno o más módulos no existen"),
+    "modulos_parent_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "El módulo padre no existe"),
+    "roles_parent_id_fkey": (None, status.HTTP_400_BAD_REQUEST, "El rol padre no existe"),
+}
+
+# Índice de una partición (<índice>_p<n>, ver migración multi-tenant)
+_SUFIJO_PARTICION = re.compile(r"_p\d+$")
+
+
+def _constraint_name(error: IntegrityError) -> Optional[str]:
+    """Nombre del constraint violado (psycopg2 lo expone en diag)"""
+    diag = getattr(error.orig, "diag", None)
+    nombre = getattr(diag, "constraint_name", None)
+    if nombre:
+        # En las tablas particionadas PostgreSQL informa el índice de la partición
+        if nombre not in CONSTRAINT_ERRORS:
+            nombre = _SUFIJO_PARTICION.sub("", nombre)
+        return nombre
+
+    # Otros motores (p. ej. SQLite) solo informan la columna en el mensaje
+    mensaje = str(error.orig)
+    for constraint, (columna, _, _) in CONSTRAINT_ERRORS.items():
+        if columna and mensaje.endswith(columna):
+            return constraint
+    return None
+
+
+def http_error_from_integrity(error: IntegrityError) -> Optional[HTTPException]:
+    """HTTPException equivalente a la violación, o None si no es conocida"""
+    entrada = CONSTRAINT_ERRORS.get(_constraint_name(error))
+    if entrada is None:
+        return None
+    _, status_code, detail = entrada
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def execute_or_raise(db: Session, stmt, params: Any = None, **kwargs):
+    """execute para sentencias que escriben directamente (INSERT ... ON CONFLICT, etc.)"""
+    try:
+        return db.execute(stmt, params, **kwargs)
+    except IntegrityError as e:
+        http_error = http_error_from_integrity(e)
+        if http_error is None:
+            raise
+        raise http_error from e
+
+
+def flush_or_raise(db: Session):
+    """flush que convierte violaciones de constraints conocidas en HTTPException"""
+    try:
+        db.flush()
+    except IntegrityError as e:
+        http_error = http_error_from_integrity(e)
+        if http_error is None:
+            raise
+        raise http_error from e
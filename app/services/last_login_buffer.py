@@ -0,0 +1,141 @@
+"""
+Escritura diferida (write-behind) de `usuarios.last_login`.
+
+El login solo registra el timestamp en memoria; un hilo en segundo plano
+vuelca periódicamente todos los pendientes en un único
+UPDATE ... FROM (VALUES ...). También se vuelca al apagar la aplicación.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import DateTime, Integer, column, or_, update, values
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.usuario import Usuario
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pendientes: Dict[int, datetime] = {}
+        self._desde: Optional[float] = None  # momento del pendiente más antiguo
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_flush_lag = 0.0
+        self.last_flush_ms = 0.0
+
+    def record(self, usuario_id: int, timestamp: datetime) -> None:
+        """Registrar un login; varios logins del mismo usuario se combinan"""
+        with self._lock:
+            if usuario_id not in self._pendientes and len(self._pendientes) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pendientes[usuario_id] = timestamp
+            if self._desde is None:
+                self._desde = time.monotonic()
+
+    def flush(self) -> int:
+        """Volcar los pendientes en un único UPDATE; devuelve las filas enviadas"""
+        with self._flush_lock:
+            with self._lock:
+                lote, self._pendientes = self._pendientes, {}
+                desde, self._desde = self._desde, None
+            if not lote:
+                return 0
+
+            inicio = time.monotonic()
+            filas = values(
+                column("id", Integer),
+                column("last_login", DateTime(timezone=True)),
+                name="v"
+            ).data(list(lote.items()))
+            stmt = (
+                update(Usuario)
+                .where(Usuario.id == filas.c.id)
+                .where(or_(Usuario.last_login.is_(None), Usuario.last_login < filas.c.last_login))
+                # No tocar updated_at: un login no es una modificación del usuario
+                .values(last_login=filas.c.last_login, updated_at=Usuario.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+
+            db = SessionLocal()
+            try:
+                db.execute(stmt)
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.failures += 1
+                logger.exception("Error al volcar last_login; se reintentará")
+                self._reencolar(lote, desde)
+                return 0
+            finally:
+                db.close()
+
+            ahora = time.monotonic()
+            self.flushed += len(lote)
+            self.last_flush_ms = (ahora - inicio) * 1000
+            self.last_flush_lag = ahora - desde if desde is not None else 0.0
+            return len(lote)
+
+    def _reencolar(self, lote: Dict[int, datetime], desde: Optional[float]) -> None:
+        """Devolver un lote fallido a la cola sin pisar logins más recientes"""
+        with self._lock:
+            for usuario_id, timestamp in lote.items():
+                if usuario_id in self._pendientes:
+                    continue
+                if len(self._pendientes) >= self.max_pending:
+                    self.dropped += 1
+                    continue
+                self._pendientes[usuario_id] = timestamp
+            if desde is not None and (self._desde is None or desde < self._desde):
+                self._desde = desde
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="last-login-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el hilo y volcar lo pendiente"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        """Métricas de la cola de escritura"""
+        with self._lock:
+            pendientes = len(self._pendientes)
+            lag = time.monotonic() - self._desde if self._desde is not None else 0.0
+        return {
+            "pending": pendientes,
+            "current_lag_seconds": round(lag, 3),
+            "last_flush_lag_seconds": round(self.last_flush_lag, 3),
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+last_login_buffer = LastLoginBuffer(
+    flush_interval=settings.LAST_LOGIN_FLUSH_SECONDS,
+    max_pending=settings.LAST_LOGIN_MAX_PENDING
+)
@@ -1,16 +1,47 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import Text, distinct, func, delete, literal, select, update
+from sqlalchemy.engine import RowMapping
 from typing import List, Optional
 from fastapi import HTTPException, status
 from app.models.modulo import Modulo
 from app.models.modulo_permiso import ModuloPermiso
-from app.schemas.modulo import ModuloCreate, ModuloUpdate
+from app.models.rol import Rol
+from app.models.rol_modulo import RolModulo
+from app.models.rol_jerarquia import RolJerarquia
+from app.models.usuario_rol import UsuarioRol
+from app.schemas.modulo import ModuloCreate, ModuloUpdate, ModuloBulkUpdate
+from app.core.tenancy import bloquear_tenant
+from app.core.batch import ordenar_por_ids
+from app.db import queries
+from app.services.bulk import actualizar_en_lote, condicion_ids
+from app.services.audit_log import instantanea, registrar
+from app.services.eventos_acceso import notificar, topico_rol
+from app.services.integrity import flush_or_raise
 
 
 class ModuloService:
+    """
+    La jerarquía de módulos se guarda también como camino materializado
+    (`Modulo.camino`: ids de los ancestros, "/1/5/"). Un subárbol es un rango
+    del índice (camino LIKE '/1/5/12/%'), los ancestros salen del propio
+    camino y mover un módulo reescribe el prefijo de su subárbol con un único
+    UPDATE.
+    """
+
+    @staticmethod
+    def prefijo_subarbol(modulo: Modulo) -> str:
+        """Camino de los hijos del módulo: prefijo común de todo su subárbol"""
+        return f"{modulo.camino}{modulo.id}/"
+
+    @staticmethod
+    def ancestro_ids(camino: str) -> List[int]:
+        """Ids de los ancestros de un camino, desde la raíz"""
+        return [int(i) for i in camino.strip("/").split("/") if i]
+
     @staticmethod
     def get_modulo(db: Session, modulo_id: int) -> Optional[Modulo]:
         """Obtener módulo por ID"""
-        return db.query(Modulo).filter(Modulo.id == modulo_id).first()
+        return db.get(Modulo, modulo_id)
 
     @staticmethod
     def get_modulo_by_nombre(db: Session, nombre: str) -> Optional[Modulo]:
@@ -24,24 +55,43 @@ class ModuloService:
         limit: int = 100,
         is_active: Optional[bool] = None,
         parent_id: Optional[int] = None
-    ) -> List[Modulo]:
-        """Obtener lista de módulos"""
-        query = db.query(Modulo)
+    ) -> List[RowMapping]:
+        """Obtener lista de módulos (solo columnas de respuesta)"""
+        query = queries.MODULOS_LISTA
         if is_active is not None:
-            query = query.filter(Modulo.is_active == is_active)
+            query = query.where(Modulo.is_active == is_active)
         if parent_id is not None:
-            query = query.filter(Modulo.parent_id == parent_id)
-        return query.order_by(Modulo.orden).offset(skip).limit(limit).all()
+            query = query.where(Modulo.parent_id == parent_id)
+        return db.execute(query.order_by(Modulo.orden).offset(skip).limit(limit)).mappings().all()
+
+    @staticmethod
+    def count_usuarios(db: Session, modulo_id: int) -> int:
+        """Usuarios con acceso al módulo a través de sus roles activos (o heredados)"""
+        return db.query(func.count(distinct(UsuarioRol.usuario_id))).join(
+            RolJerarquia, RolJerarquia.descendiente_id == UsuarioRol.rol_id
+        ).join(
+            RolModulo, RolModulo.rol_id == RolJerarquia.ancestro_id
+        ).join(
+            Rol, Rol.id == UsuarioRol.rol_id
+        ).filter(
+            RolModulo.modulo_id == modulo_id,
+            RolModulo.is_active == True,
+            UsuarioRol.vigente,
+            Rol.is_active == True,
+            queries.cadena_activa(RolModulo.rol_id, UsuarioRol.rol_id)
+        ).scalar()
+
+    @staticmethod
+    def get_modulos_by_ids(db: Session, ids: List[int]) -> List[RowMapping]:
+        """Obtener varios módulos por ID en una sola consulta (sin orden garantizado)"""
+        return queries.filas_por_ids(db, queries.MODULOS_LISTA, Modulo, ids)
 
     @staticmethod
     def create_modulo(db: Session, modulo: ModuloCreate) -> Modulo:
-        """Crear nuevo módulo"""
-        if ModuloService.get_modulo_by_nombre(db, modulo.nombre):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El nombre del módulo ya existe"
-            )
-        
+        """Crear nuevo módulo (nombre único se valida por constraint)"""
+        if modulo.parent_id is not None:
+            bloquear_tenant(db)
+        camino = ModuloService._camino_bajo(db, modulo.parent_id)
         db_modulo = Modulo(
             nombre=modulo.nombre,
             descripcion=modulo.descripcion,
@@ -50,17 +100,21 @@ class ModuloService:
             tipo=modulo.tipo,
             orden=modulo.orden,
             is_active=modulo.is_active,
-            parent_id=modulo.parent_id
+            parent_id=modulo.parent_id,
+            camino=camino
         )
         db.add(db_modulo)
-        db.commit()
-        db.refresh(db_modulo)
+        flush_or_raise(db)
         
         # Asignar permisos
         if modulo.permiso_ids:
-            ModuloService.asignar_permisos(db, db_modulo.id, modulo.permiso_ids)
-            db.refresh(db_modulo)
+            db.add_all([
+                ModuloPermiso(modulo_id=db_modulo.id, permiso_id=permiso_id, is_active=True)
+                for permiso_id in modulo.permiso_ids
+            ])
+            flush_or_raise(db)
         
+        registrar(db, "create", Modulo, db_modulo.id, despues={**instantanea(db_modulo), "permiso_ids": modulo.permiso_ids or []})
         return db_modulo
 
     @staticmethod
@@ -73,12 +127,8 @@ class ModuloService:
                 detail="Módulo no encontrado"
             )
         
+        antes = instantanea(db_modulo)
         if modulo_update.nombre and modulo_update.nombre != db_modulo.nombre:
-            if ModuloService.get_modulo_by_nombre(db, modulo_update.nombre):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El nombre del módulo ya existe"
-                )
             db_modulo.nombre = modulo_update.nombre
         
         if modulo_update.descripcion is not None:
@@ -93,30 +143,136 @@ class ModuloService:
             db_modulo.orden = modulo_update.orden
         if modulo_update.is_active is not None:
             db_modulo.is_active = modulo_update.is_active
-        if modulo_update.parent_id is not None:
-            db_modulo.parent_id = modulo_update.parent_id
+        # parent_id explícito en null: pasa a ser un módulo raíz
+        if "parent_id" in modulo_update.model_fields_set and modulo_update.parent_id != db_modulo.parent_id:
+            ModuloService._mover(db, db_modulo, modulo_update.parent_id)
         
         if modulo_update.permiso_ids is not None:
-            ModuloService.asignar_permisos(db, modulo_id, modulo_update.permiso_ids)
+            ModuloService._reemplazar_permisos(db, db_modulo, modulo_update.permiso_ids)
         
-        db.commit()
-        db.refresh(db_modulo)
+        flush_or_raise(db)
+        registrar(db, "update", Modulo, modulo_id, antes, instantanea(db_modulo))
+        ModuloService._notificar_roles(db, [modulo_id])
         return db_modulo
 
+    @staticmethod
+    def bulk_update_modulos(db: Session, datos: ModuloBulkUpdate) -> int:
+        """Actualizar módulos en lote con un único UPDATE; devuelve los afectados"""
+        filtro = datos.filtro
+        condiciones = condicion_ids(Modulo, filtro.ids)
+        if filtro.parent_id is not None:
+            condiciones.append(Modulo.parent_id == filtro.parent_id)
+        if filtro.tipo is not None:
+            condiciones.append(Modulo.tipo == filtro.tipo)
+        if filtro.is_active is not None:
+            condiciones.append(Modulo.is_active == filtro.is_active)
+
+        cambios = datos.cambios.model_dump(exclude_none=True)
+        ids = actualizar_en_lote(db, Modulo, condiciones, cambios, filtro=filtro.model_dump(exclude_none=True))
+        ModuloService._notificar_roles(db, ids)
+        return len(ids)
+
     @staticmethod
     def delete_modulo(db: Session, modulo_id: int) -> bool:
         """Eliminar módulo"""
-        db_modulo = ModuloService.get_modulo(db, modulo_id)
-        if not db_modulo:
+        # Roles afectados antes de que el CASCADE borre sus asignaciones
+        ModuloService._notificar_roles(db, [modulo_id])
+        bloquear_tenant(db)
+        
+        # Un único DELETE: las filas relacionadas las borra la base de datos
+        # (ON DELETE CASCADE + passive_deletes), sin cargarlas en memoria
+        # (RETURNING: el estado previo para la auditoría sale del mismo DELETE)
+        eliminado = db.execute(
+            delete(Modulo).where(Modulo.id == modulo_id).returning(*Modulo.__table__.c)
+        ).mappings().first()
+        if not eliminado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Módulo no encontrado"
             )
         
-        db.delete(db_modulo)
-        db.commit()
+        # Los hijos quedan como raíces (parent_id: ON DELETE SET NULL)
+        ModuloService._reubicar_subarbol(db, f"{eliminado['camino']}{modulo_id}/", "/")
+        registrar(db, "delete", Modulo, modulo_id, antes=dict(eliminado))
         return True
 
+    @staticmethod
+    def get_submodulos(db: Session, modulo_id: int) -> List[RowMapping]:
+        """Todos los descendientes del módulo (un rango del índice de camino)"""
+        db_modulo = ModuloService.get_modulo(db, modulo_id)
+        if not db_modulo:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Módulo no encontrado"
+            )
+        return db.execute(
+            queries.MODULOS_LISTA
+            .where(Modulo.camino.startswith(ModuloService.prefijo_subarbol(db_modulo)))
+            .order_by(Modulo.camino, Modulo.orden, Modulo.id)
+        ).mappings().all()
+
+    @staticmethod
+    def get_ancestros(db: Session, modulo_id: int) -> List[RowMapping]:
+        """Ancestros del módulo desde la raíz, terminando en el propio módulo (breadcrumb)"""
+        db_modulo = ModuloService.get_modulo(db, modulo_id)
+        if not db_modulo:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Módulo no encontrado"
+            )
+        ids = ModuloService.ancestro_ids(db_modulo.camino) + [modulo_id]
+        filas, _ = ordenar_por_ids(queries.filas_por_ids(db, queries.MODULOS_LISTA, Modulo, ids), ids)
+        return filas
+
+    @staticmethod
+    def _camino_bajo(db: Session, parent_id: Optional[int]) -> str:
+        """Camino de un hijo de `parent_id` (raíz si es None); 400 si el padre no existe"""
+        if parent_id is None:
+            return "/"
+        padre = ModuloService.get_modulo(db, parent_id)
+        if not padre:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El módulo padre no existe"
+            )
+        return ModuloService.prefijo_subarbol(padre)
+
+    @staticmethod
+    def _mover(db: Session, db_modulo: Modulo, parent_id: Optional[int]):
+        """Cambiar el padre de un módulo y reubicar su subárbol"""
+        bloquear_tenant(db)
+        # El módulo se cargó antes del bloqueo: un movimiento concurrente de un
+        # ancestro pudo cambiar su camino. Releerlo para que el prefijo del
+        # subárbol sea el actual
+        db.refresh(db_modulo, ["camino", "parent_id"])
+        camino = ModuloService._camino_bajo(db, parent_id)
+        anterior = ModuloService.prefijo_subarbol(db_modulo)
+        # El padre nuevo no puede estar en el subárbol (ni ser el propio módulo)
+        if camino.startswith(anterior):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Un módulo no puede estar dentro de sí mismo ni de uno de sus submódulos"
+            )
+        db_modulo.parent_id = parent_id
+        db_modulo.camino = camino
+        ModuloService._reubicar_subarbol(db, anterior, ModuloService.prefijo_subarbol(db_modulo))
+
+    @staticmethod
+    def _reubicar_subarbol(db: Session, anterior: str, nuevo: str):
+        """Reemplazar el prefijo `anterior` del camino por `nuevo` en todo el subárbol"""
+        if anterior == nuevo:
+            return
+        db.execute(
+            update(Modulo)
+            .where(Modulo.camino.startswith(anterior))
+            .values(
+                camino=literal(nuevo, Text) + func.substr(Modulo.camino, len(anterior) + 1, type_=Text),
+                # El camino es derivado: mover un ancestro no es editar el módulo
+                updated_at=Modulo.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+
     @staticmethod
     def asignar_permisos(db: Session, modulo_id: int, permiso_ids: List[int]) -> Modulo:
         """Asignar permisos a módulo"""
@@ -127,18 +283,40 @@ class ModuloService:
                 detail="Módulo no encontrado"
             )
         
-        # Eliminar asignaciones existentes
-        db.query(ModuloPermiso).filter(ModuloPermiso.modulo_id == modulo_id).delete()
+        ModuloService._reemplazar_permisos(db, db_modulo, permiso_ids)
+        return db_modulo
+
+    @staticmethod
+    def _reemplazar_permisos(db: Session, db_modulo: Modulo, permiso_ids: List[int]):
+        """Reemplazar las asignaciones de permisos de un módulo ya cargado"""
+        # Eliminar asignaciones existentes (RETURNING: las anteriores, para la auditoría)
+        anteriores = db.execute(
+            delete(ModuloPermiso).where(ModuloPermiso.modulo_id == db_modulo.id).returning(ModuloPermiso.permiso_id)
+        ).scalars().all()
         
         # Crear nuevas asignaciones
-        for permiso_id in permiso_ids:
-            modulo_permiso = ModuloPermiso(
-                modulo_id=modulo_id,
-                permiso_id=permiso_id,
-                is_active=True
-            )
-            db.add(modulo_permiso)
+        db.add_all([
+            ModuloPermiso(modulo_id=db_modulo.id, permiso_id=permiso_id, is_active=True)
+            for permiso_id in permiso_ids
+        ])
+        flush_or_raise(db)
+        registrar(
+            db, "asignar_permisos", Modulo, db_modulo.id,
+            {"permiso_ids": sorted(anteriores)}, {"permiso_ids": sorted(permiso_ids)}
+        )
+        ModuloService._notificar_roles(db, [db_modulo.id])
         
-        db.commit()
-        db.refresh(db_modulo)
-        return db_modulo
+        # La colección se recarga en el próximo acceso
+        db.expire(db_modulo, ["permisos"])
+
+    @staticmethod
+    def _notificar_roles(db: Session, modulo_ids: List[int]):
+        """Evento `modulos` para los roles que tienen alguno de los módulos (propio o heredado)"""
+        if not modulo_ids:
+            return
+        rol_ids = db.execute(
+            select(distinct(RolJerarquia.descendiente_id))
+            .join(RolModulo, RolModulo.rol_id == RolJerarquia.ancestro_id)
+            .where(RolModulo.modulo_id.in_(modulo_ids))
+        ).scalars().all()
+        notificar(db, [topico_rol(r) for r in rol_ids], "modulos", modulo_ids=sorted(modulo_ids))
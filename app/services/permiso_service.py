@@ -1,20 +1,31 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import delete, distinct, select, union
+from sqlalchemy.engine import RowMapping
 from typing import List, Optional
 from fastapi import HTTPException, status
 from app.models.permiso import Permiso
-from app.schemas.permiso import PermisoCreate, PermisoUpdate
+from app.models.modulo_permiso import ModuloPermiso
+from app.models.rol_jerarquia import RolJerarquia
+from app.models.rol_modulo import RolModulo
+from app.models.rol_permiso import RolPermiso
+from app.schemas.permiso import PermisoCreate, PermisoUpdate, PermisoBulkUpdate
+from app.db import queries
+from app.services.bulk import actualizar_en_lote, condicion_ids
+from app.services.audit_log import instantanea, registrar
+from app.services.eventos_acceso import notificar, topico_rol
+from app.services.integrity import flush_or_raise
 
 
 class PermisoService:
     @staticmethod
     def get_permiso(db: Session, permiso_id: int) -> Optional[Permiso]:
         """Obtener permiso por ID"""
-        return db.query(Permiso).filter(Permiso.id == permiso_id).first()
+        return db.get(Permiso, permiso_id)
 
     @staticmethod
     def get_permiso_by_codigo(db: Session, codigo: str) -> Optional[Permiso]:
         """Obtener permiso por código"""
-        return db.query(Permiso).filter(Permiso.codigo == codigo).first()
+        return queries.permiso_por_codigo(db, codigo)
 
     @staticmethod
     def get_permisos(
@@ -22,22 +33,21 @@ class PermisoService:
         skip: int = 0,
         limit: int = 100,
         is_active: Optional[bool] = None
-    ) -> List[Permiso]:
-        """Obtener lista de permisos"""
-        query = db.query(Permiso)
+    ) -> List[RowMapping]:
+        """Obtener lista de permisos (solo columnas de respuesta)"""
+        query = queries.PERMISOS_LISTA
         if is_active is not None:
-            query = query.filter(Permiso.is_active == is_active)
-        return query.offset(skip).limit(limit).all()
+            query = query.where(Permiso.is_active == is_active)
+        return db.execute(query.offset(skip).limit(limit)).mappings().all()
+
+    @staticmethod
+    def get_permisos_by_ids(db: Session, ids: List[int]) -> List[RowMapping]:
+        """Obtener varios permisos por ID en una sola consulta (sin orden garantizado)"""
+        return queries.filas_por_ids(db, queries.PERMISOS_LISTA, Permiso, ids)
 
     @staticmethod
     def create_permiso(db: Session, permiso: PermisoCreate) -> Permiso:
-        """Crear nuevo permiso"""
-        if PermisoService.get_permiso_by_codigo(db, permiso.codigo):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El código del permiso ya existe"
-            )
-        
+        """Crear nuevo permiso (código y nombre únicos se validan por constraint)"""
         db_permiso = Permiso(
             nombre=permiso.nombre,
             codigo=permiso.codigo,
@@ -45,8 +55,8 @@ class PermisoService:
             is_active=permiso.is_active
         )
         db.add(db_permiso)
-        db.commit()
-        db.refresh(db_permiso)
+        flush_or_raise(db)
+        registrar(db, "create", Permiso, db_permiso.id, despues=instantanea(db_permiso))
         return db_permiso
 
     @staticmethod
@@ -63,12 +73,8 @@ class PermisoService:
                 detail="Permiso no encontrado"
             )
         
+        antes = instantanea(db_permiso)
         if permiso_update.codigo and permiso_update.codigo != db_permiso.codigo:
-            if PermisoService.get_permiso_by_codigo(db, permiso_update.codigo):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El código del permiso ya existe"
-                )
             db_permiso.codigo = permiso_update.codigo
         
         if permiso_update.nombre is not None:
@@ -78,20 +84,61 @@ class PermisoService:
         if permiso_update.is_active is not None:
             db_permiso.is_active = permiso_update.is_active
         
-        db.commit()
-        db.refresh(db_permiso)
+        flush_or_raise(db)
+        despues = instantanea(db_permiso)
+        registrar(db, "update", Permiso, permiso_id, antes, despues)
+        if (antes["codigo"], antes["is_active"]) != (despues["codigo"], despues["is_active"]):
+            PermisoService._notificar_roles(db, [permiso_id])
         return db_permiso
 
+    @staticmethod
+    def bulk_update_permisos(db: Session, datos: PermisoBulkUpdate) -> int:
+        """Actualizar permisos en lote con un único UPDATE; devuelve los afectados"""
+        filtro = datos.filtro
+        condiciones = condicion_ids(Permiso, filtro.ids)
+        if filtro.codigo_prefijo is not None:
+            condiciones.append(Permiso.codigo.startswith(filtro.codigo_prefijo, autoescape=True))
+        if filtro.is_active is not None:
+            condiciones.append(Permiso.is_active == filtro.is_active)
+
+        cambios = datos.cambios.model_dump(exclude_none=True)
+        ids = actualizar_en_lote(db, Permiso, condiciones, cambios, filtro=filtro.model_dump(exclude_none=True))
+        if "is_active" in cambios or "codigo" in cambios:
+            PermisoService._notificar_roles(db, ids)
+        return len(ids)
+
     @staticmethod
     def delete_permiso(db: Session, permiso_id: int) -> bool:
         """Eliminar permiso"""
-        db_permiso = PermisoService.get_permiso(db, permiso_id)
-        if not db_permiso:
+        # Roles afectados antes de que el CASCADE borre sus asignaciones
+        PermisoService._notificar_roles(db, [permiso_id])
+        # Un único DELETE: las filas relacionadas las borra la base de datos
+        # (ON DELETE CASCADE + passive_deletes), sin cargarlas en memoria
+        # (RETURNING: el estado previo para la auditoría sale del mismo DELETE)
+        eliminado = db.execute(
+            delete(Permiso).where(Permiso.id == permiso_id).returning(*Permiso.__table__.c)
+        ).mappings().first()
+        if not eliminado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Permiso no encontrado"
             )
         
-        db.delete(db_permiso)
-        db.commit()
+        registrar(db, "delete", Permiso, permiso_id, antes=dict(eliminado))
         return True
+
+    @staticmethod
+    def _notificar_roles(db: Session, permiso_ids: List[int]):
+        """Evento `permisos` para los roles que tienen alguno de los permisos (propio, por módulo o heredado)"""
+        if not permiso_ids:
+            return
+        otorgantes = union(
+            select(RolPermiso.rol_id).where(RolPermiso.permiso_id.in_(permiso_ids)),
+            select(RolModulo.rol_id)
+            .join(ModuloPermiso, ModuloPermiso.modulo_id == RolModulo.modulo_id)
+            .where(ModuloPermiso.permiso_id.in_(permiso_ids))
+        )
+        rol_ids = db.execute(
+            select(distinct(RolJerarquia.descendiente_id)).where(RolJerarquia.ancestro_id.in_(otorgantes))
+        ).scalars().all()
+        notificar(db, [topico_rol(r) for r in rol_ids], "permisos", permiso_ids=sorted(permiso_ids))
@@ -0,0 +1,135 @@
+"""
+Permisos efectivos por usuario (POST /auth/check).
+
+Los códigos de permiso de un usuario (los de sus roles activos, asignados al
+rol o a los módulos del rol) se calculan con una sola consulta y se guardan
+como un frozenset en un cache LRU por worker: cada verificación es una
+búsqueda en el conjunto, sin ir a la base de datos.
+
+Las entradas se invalidan con los eventos de acceso (también los de otros
+workers, ver app.services.eventos_acceso): `usuario:<id>` descarta al
+usuario y `rol:<id>` vacía el cache, porque no se sabe qué usuarios tienen
+el rol. Los cambios de permisos y módulos (código, activación, borrado)
+emiten el evento a los roles que los tienen.
+
+Una invalidación que llega mientras se consulta la base no debe perderse:
+`invalidar` y `clear` avanzan una generación, y `set` no guarda lo leído si
+la generación cambió desde antes de la consulta.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import queries
+from app.models.usuario import Usuario
+from app.services.eventos_acceso import eventos_acceso
+
+
+class PermisosCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entradas: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+
+    def get(self, usuario_id: int) -> Optional[FrozenSet[str]]:
+        """Códigos cacheados del usuario si la entrada sigue vigente"""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(usuario_id)
+            if entrada is None or time.monotonic() >= entrada[1]:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(usuario_id)
+            self.hits += 1
+            return entrada[0]
+
+    @property
+    def generacion(self) -> int:
+        """Leer antes de consultar la base y pasarla a `set`"""
+        return self._generacion
+
+    def set(self, usuario_id: int, codigos: FrozenSet[str], generacion: int) -> None:
+        """Guardar lo leído, salvo que hubo una invalidación desde `generacion`"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generacion != self._generacion:
+                self.stale_fills += 1
+                return
+            self._entradas[usuario_id] = (codigos, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(usuario_id)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, evento: dict) -> None:
+        """Descartar las entradas afectadas por un evento de acceso"""
+        with self._lock:
+            self._generacion += 1
+            for topico in evento["topicos"]:
+                tipo, _, valor = topico.partition(":")
+                if tipo == "rol":
+                    self._entradas.clear()
+                    break
+                if tipo == "usuario":
+                    self._entradas.pop(int(valor), None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+
+    def stats(self) -> dict:
+        """Métricas del cache"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entradas),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "stale_fills": self.stale_fills,
+        }
+
+
+permisos_cache = PermisosCache(settings.PERMISOS_CACHE_SIZE, settings.PERMISOS_CACHE_SECONDS)
+eventos_acceso.observar(permisos_cache.invalidar)
+
+
+def codigos_efectivos(db: Session, usuario_id: int) -> FrozenSet[str]:
+    """Códigos de permiso del usuario (desde el cache o con una consulta)"""
+    codigos = permisos_cache.get(usuario_id)
+    if codigos is None:
+        generacion = permisos_cache.generacion
+        codigos = frozenset(queries.codigos_de_usuario(db, usuario_id))
+        permisos_cache.set(usuario_id, codigos, generacion)
+    return codigos
+
+
+def verificar_permisos(db: Session, usuario: Usuario, codigos: List[str]) -> Dict[str, bool]:
+    """
+    Mapa código -> tiene el permiso. Un superusuario los tiene todos y un
+    usuario inactivo ninguno.
+    """
+    if len(codigos) > settings.PERMISOS_CHECK_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.PERMISOS_CHECK_MAX} códigos por consulta"
+        )
+    if not usuario.is_active:
+        return {codigo: False for codigo in codigos}
+    if usuario.is_superuser:
+        return {codigo: True for codigo in codigos}
+    efectivos = codigos_efectivos(db, usuario.id)
+    return {codigo: codigo in efectivos for codigo in codigos}
@@ -1,57 +1,294 @@
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.orm import Session, load_only, undefer_group
+from sqlalchemy import String, case, cast, func, literal, null, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import RowMapping
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date
 from fastapi import HTTPException, status
-from app.models.persona import Persona
+from app.core.config import settings
+from app.models.persona import Persona, Genero
 from app.models.usuario import Usuario
-from app.schemas.persona import PersonaCreate, PersonaUpdate
+from app.schemas.persona import PersonaCreate, PersonaUpdate, PersonaFiltros, PersonaBulkItem
+from app.services.integrity import execute_or_raise, flush_or_raise
+
+# Facetas del directorio con filtro por igualdad
+FACETAS_DIRECTORIO = ("ciudad", "estado_provincia", "pais", "genero")
+
+# Límites inferiores de los rangos de edad de la faceta "edad"
+RANGOS_EDAD = (18, 25, 35, 45, 55, 65)
+
+
+def _cambios_upsert(stmt, campos: Iterable[str]) -> dict:
+    """SET del ON CONFLICT: los campos enviados, tomados de la fila propuesta"""
+    cambios = {campo: stmt.excluded[campo] for campo in campos}
+    # El onupdate de la columna no se aplica al ON CONFLICT
+    cambios["updated_at"] = func.now()
+    return cambios
+
+
+def _hace_anios(hoy: date, anios: int) -> date:
+    """Misma fecha `anios` años atrás (29/2 pasa a 28/2)"""
+    try:
+        return hoy.replace(year=hoy.year - anios)
+    except ValueError:
+        return hoy.replace(year=hoy.year - anios, day=28)
+
+
+def _condiciones_directorio(filtros: PersonaFiltros, hoy: date, excluir: Optional[str] = None) -> list:
+    """
+    Condiciones WHERE de los filtros. `excluir` omite el filtro de una faceta
+    para contar sus alternativas (faceta disyuntiva).
+    """
+    condiciones = []
+    for campo in FACETAS_DIRECTORIO:
+        valor = getattr(filtros, campo)
+        if valor is not None and campo != excluir:
+            condiciones.append(getattr(Persona, campo) == valor)
+
+    # edad >= N  <=>  nacido en o antes de hoy - N años
+    if excluir != "edad":
+        if filtros.edad_min is not None:
+            condiciones.append(Persona.fecha_nacimiento <= _hace_anios(hoy, filtros.edad_min))
+        if filtros.edad_max is not None:
+            condiciones.append(Persona.fecha_nacimiento > _hace_anios(hoy, filtros.edad_max + 1))
+    return condiciones
+
+
+def _rango_edad(hoy: date):
+    """Expresión CASE con la etiqueta del rango de edad ("25-34", "65+", ...)"""
+    ramas = [
+        (Persona.fecha_nacimiento.is_(None), null()),
+        (Persona.fecha_nacimiento > _hace_anios(hoy, RANGOS_EDAD[0]), f"<{RANGOS_EDAD[0]}"),
+    ]
+    for inferior, superior in zip(RANGOS_EDAD, RANGOS_EDAD[1:]):
+        ramas.append((Persona.fecha_nacimiento > _hace_anios(hoy, superior), f"{inferior}-{superior - 1}"))
+    return case(*ramas, else_=f"{RANGOS_EDAD[-1]}+")
+
+
+def _contar_directorio(
+    db: Session,
+    filtros: PersonaFiltros,
+    hoy: date,
+    facetas: List[str]
+) -> Tuple[int, Dict[str, List[Tuple[Optional[str], int]]]]:
+    """
+    Total y conteos de las facetas pedidas en un único UNION ALL: una rama
+    para el total y una por faceta (cada una sin su propio filtro).
+    """
+    ramas = [
+        select(
+            literal("_total").label("faceta"),
+            cast(null(), String).label("valor"),
+            func.count().label("total")
+        ).select_from(Persona).where(*_condiciones_directorio(filtros, hoy))
+    ]
+    for faceta in facetas:
+        expresion = _rango_edad(hoy) if faceta == "edad" else cast(getattr(Persona, faceta), String)
+        # Agrupar sobre una subconsulta: el CASE lleva parámetros y no se
+        # puede repetir literalmente en el GROUP BY
+        valores = select(expresion.label("valor")).where(
+            *_condiciones_directorio(filtros, hoy, excluir=faceta)
+        ).subquery()
+        conteo = select(
+            literal(faceta).label("faceta"),
+            valores.c.valor,
+            func.count().label("total")
+        ).group_by(valores.c.valor).order_by(
+            func.count().desc()
+        ).limit(settings.DIRECTORIO_FACET_LIMIT).subquery()
+        ramas.append(select(conteo))
+
+    total = 0
+    conteos: Dict[str, List[Tuple[Optional[str], int]]] = {faceta: [] for faceta in facetas}
+    for fila in db.execute(union_all(*ramas)).mappings():
+        if fila["faceta"] == "_total":
+            total = fila["total"]
+            continue
+        valor = fila["valor"]
+        if fila["faceta"] == "genero" and valor is not None:
+            # El Enum se guarda por nombre; la API expone el valor
+            valor = Genero[valor].value
+        conteos[fila["faceta"]].append((valor, fila["total"]))
+
+    for valores in conteos.values():
+        valores.sort(key=lambda v: v[1], reverse=True)
+    return total, conteos
+
+
+def _clave_filtros(filtros: PersonaFiltros) -> tuple:
+    """Filtros normalizados: dos búsquedas con los mismos filtros comparten conteos"""
+    return tuple(
+        valor.value if isinstance(valor, Genero) else valor
+        for valor in (getattr(filtros, campo) for campo in FACETAS_DIRECTORIO + ("edad_min", "edad_max"))
+    )
+
+
+class FacetasCache:
+    """
+    Total y conteos por faceta del directorio por (tenant, día, filtros), en
+    un LRU de max_size entradas. Las escrituras de este worker descartan las
+    entradas de su tenant; las de otros workers se ven al expirar
+    (DIRECTORIO_FACET_CACHE_SECONDS).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entradas: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def activo(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, clave: tuple):
+        if not self.activo:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or time.monotonic() >= entrada[1]:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+
+    def set(self, clave: tuple, conteos) -> None:
+        if not self.activo:
+            return
+        with self._lock:
+            self._entradas[clave] = (conteos, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, tenant_id: Optional[int]) -> None:
+        with self._lock:
+            for clave in [c for c in self._entradas if c[0] == tenant_id]:
+                del self._entradas[clave]
+
+    def stats(self) -> dict:
+        return {"size": len(self._entradas), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+facetas_directorio = FacetasCache(
+    max_size=settings.DIRECTORIO_FACET_CACHE_SIZE,
+    ttl=settings.DIRECTORIO_FACET_CACHE_SECONDS
+)
 
 
 class PersonaService:
     @staticmethod
-    def get_persona(db: Session, usuario_id: int) -> Optional[Persona]:
-        """Obtener persona por usuario_id"""
-        return db.query(Persona).filter(Persona.usuario_id == usuario_id).first()
+    def get_persona(
+        db: Session,
+        usuario_id: int,
+        campos: Optional[List[str]] = None
+    ) -> Optional[Persona]:
+        """
+        Obtener persona por usuario_id.
+        Sin `campos` se carga todo (incluidas las columnas diferidas del grupo
+        "extendido"); con `campos` solo esas columnas (load_only).
+        """
+        query = db.query(Persona).filter(Persona.usuario_id == usuario_id)
+        if campos is None:
+            query = query.options(undefer_group("extendido"))
+        else:
+            query = query.options(load_only(*[getattr(Persona, c) for c in campos]))
+        return query.first()
 
     @staticmethod
     def get_persona_by_dni(db: Session, dni: str) -> Optional[Persona]:
         """Obtener persona por DNI"""
         return db.query(Persona).filter(Persona.dni == dni).first()
 
+    @staticmethod
+    def buscar_directorio(
+        db: Session,
+        filtros: PersonaFiltros,
+        skip: int = 0,
+        limit: int = 50
+    ) -> Tuple[int, List[RowMapping], Dict[str, List[Tuple[Optional[str], int]]]]:
+        """
+        Directorio de personas: página de resultados, total y conteos por faceta.
+        La página es una consulta; el total y las facetas, un UNION ALL que se
+        cachea por filtros (ver `_conteos`). Con el cache caliente el request
+        hace solo la consulta de la página.
+        """
+        hoy = date.today()
+
+        pagina = select(
+            Persona.id,
+            Persona.usuario_id,
+            Usuario.nombre_completo,
+            Usuario.email,
+            Persona.ciudad,
+            Persona.estado_provincia,
+            Persona.pais,
+            Persona.genero,
+            Persona.fecha_nacimiento,
+            Persona.foto_perfil
+        ).join(
+            Usuario, Usuario.id == Persona.usuario_id
+        ).where(
+            *_condiciones_directorio(filtros, hoy)
+        # Desempate por Usuario.id (1:1 con la persona): el orden sale del
+        # índice de nombre_completo, sin ordenar aparte los empates
+        ).order_by(Usuario.nombre_completo, Usuario.id).offset(skip).limit(limit)
+        items = db.execute(pagina).mappings().all()
+        total, facetas = PersonaService._conteos(db, filtros, hoy)
+        return total, items, facetas
+
+    @staticmethod
+    def _conteos(
+        db: Session,
+        filtros: PersonaFiltros,
+        hoy: date
+    ) -> Tuple[int, Dict[str, List[Tuple[Optional[str], int]]]]:
+        """
+        Total y facetas de los filtros, desde el cache o calculados. Las facetas
+        que ningún filtro acota (las que recorren la tabla entera) se toman de
+        los conteos sin filtros, que también quedan en el cache.
+        """
+        clave = (db.info.get("tenant_id"), hoy, _clave_filtros(filtros))
+        conteos = facetas_directorio.get(clave)
+        if conteos is not None:
+            return conteos
+
+        todas = list(FACETAS_DIRECTORIO) + ["edad"]
+        if not _condiciones_directorio(filtros, hoy):
+            conteos = _contar_directorio(db, filtros, hoy, todas)
+        else:
+            libres = [f for f in todas if not _condiciones_directorio(filtros, hoy, excluir=f)]
+            total, facetas = _contar_directorio(db, filtros, hoy, [f for f in todas if f not in libres])
+            if libres:
+                _, globales = PersonaService._conteos(db, PersonaFiltros(), hoy)
+                facetas.update({f: globales[f] for f in libres})
+            conteos = (total, {f: facetas[f] for f in todas})
+        facetas_directorio.set(clave, conteos)
+        return conteos
+
     @staticmethod
     def create_persona(
         db: Session,
         usuario_id: int,
         datos: PersonaCreate
     ) -> Persona:
-        """Crear persona para un usuario"""
-        # Verificar que el usuario existe
-        usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
-        if not usuario:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
-        
-        # Verificar que el usuario no tenga ya una persona
-        existing = PersonaService.get_persona(db, usuario_id)
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El usuario ya tiene datos personales. Use actualizar en su lugar."
-            )
-        
-        # Verificar DNI único si se proporciona
-        if datos.dni:
-            if PersonaService.get_persona_by_dni(db, datos.dni):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El DNI ya está en uso"
-                )
-        
-        db_persona = Persona(usuario_id=usuario_id, **datos.model_dump(exclude_unset=True))
+        """
+        Crear persona para un usuario.
+        La existencia del usuario (FK), la persona única por usuario y el DNI
+        único se validan por constraint en el propio INSERT.
+        """
+        # Todos los campos (también los no enviados, a None) para que las columnas
+        # diferidas queden cargadas y la respuesta no haga otro SELECT
+        db_persona = Persona(usuario_id=usuario_id, **datos.model_dump())
+        facetas_directorio.invalidar(db.info.get("tenant_id"))
         db.add(db_persona)
-        db.commit()
-        db.refresh(db_persona)
+        flush_or_raise(db)
         return db_persona
 
     @staticmethod
@@ -60,31 +297,115 @@ class PersonaService:
         usuario_id: int,
         datos_update: PersonaUpdate
     ) -> Persona:
-        """Actualizar persona de un usuario"""
-        db_persona = PersonaService.get_persona(db, usuario_id)
-        
-        if not db_persona:
-            # Si no existe, crearla
-            datos_create = PersonaCreate(**datos_update.model_dump(exclude_unset=True))
-            return PersonaService.create_persona(db, usuario_id, datos_create)
-        
-        # Verificar DNI único si se está actualizando
-        if datos_update.dni and datos_update.dni != db_persona.dni:
-            if PersonaService.get_persona_by_dni(db, datos_update.dni):
+        """
+        Crear o actualizar la persona de un usuario con una única sentencia
+        (INSERT ... ON CONFLICT (tenant_id, usuario_id) DO UPDATE).
+        Solo se modifican los campos enviados; el usuario inexistente y el DNI
+        repetido se detectan por constraint.
+        """
+        valores = datos_update.model_dump(exclude_unset=True)
+
+        # Escrituras pendientes primero: el upsert debe verlas
+        flush_or_raise(db)
+
+        stmt = insert(Persona).values(usuario_id=usuario_id, **valores)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Persona.tenant_id, Persona.usuario_id],
+            set_=_cambios_upsert(stmt, valores)
+        ).returning(Persona).options(undefer_group("extendido"))
+        facetas_directorio.invalidar(db.info.get("tenant_id"))
+        resultado = execute_or_raise(db, stmt, execution_options={"populate_existing": True})
+        return resultado.scalars().one()
+
+    @staticmethod
+    def bulk_upsert_personas(
+        db: Session,
+        items: List[PersonaBulkItem]
+    ) -> Tuple[int, int, List[dict]]:
+        """
+        Importación masiva de personas (p. ej. sincronización desde RRHH).
+        Los conflictos se detectan en conjunto antes de escribir, con dos
+        SELECT: usuarios inexistentes (y personas ya existentes) y dueños
+        actuales de los DNI del lote. Las filas en conflicto se omiten y se
+        informan; un DNI que otro usuario libera en el mismo lote también se
+        rechaza, porque el índice único se comprueba fila a fila.
+        Devuelve (creadas, actualizadas, conflictos).
+        """
+        if len(items) > settings.PERSONA_BULK_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Máximo {settings.PERSONA_BULK_MAX} personas por request"
+            )
+
+        filas: Dict[int, dict] = {}
+        for item in items:
+            if item.usuario_id in filas:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El DNI ya está en uso"
+                    detail=f"usuario_id repetido en el lote: {item.usuario_id}"
                 )
-            db_persona.dni = datos_update.dni
-        
-        # Actualizar otros campos
-        update_data = datos_update.model_dump(exclude_unset=True, exclude={"dni"})
-        for field, value in update_data.items():
-            setattr(db_persona, field, value)
-        
-        db.commit()
-        db.refresh(db_persona)
-        return db_persona
+            filas[item.usuario_id] = item.model_dump(exclude_unset=True)
+
+        flush_or_raise(db)
+
+        # usuario_id -> id de su persona (None si aún no tiene)
+        existentes = dict(db.execute(
+            select(Usuario.id, Persona.id)
+            .outerjoin(Persona, Persona.usuario_id == Usuario.id)
+            .where(Usuario.id.in_(list(filas)))
+        ).all())
+
+        conflictos = []
+
+        def rechazar(usuario_id: int, motivo: str) -> None:
+            valores = filas.pop(usuario_id)
+            conflictos.append({"usuario_id": usuario_id, "dni": valores.get("dni"), "motivo": motivo})
+
+        for usuario_id in [u for u in filas if u not in existentes]:
+            rechazar(usuario_id, "usuario_inexistente")
+
+        # DNI repetidos dentro del lote o en uso por otro usuario
+        por_dni: Dict[str, List[int]] = defaultdict(list)
+        for usuario_id, valores in filas.items():
+            if valores.get("dni"):
+                por_dni[valores["dni"]].append(usuario_id)
+        duenos = dict(db.execute(
+            select(Persona.dni, Persona.usuario_id).where(Persona.dni.in_(list(por_dni)))
+        ).all()) if por_dni else {}
+
+        for dni, usuarios in por_dni.items():
+            if len(usuarios) > 1:
+                motivo = "dni_duplicado"
+            elif duenos.get(dni, usuarios[0]) != usuarios[0]:
+                motivo = "dni_en_uso"
+            else:
+                continue
+            for usuario_id in usuarios:
+                rechazar(usuario_id, motivo)
+
+        # Un INSERT ... ON CONFLICT por combinación de campos enviados
+        # (en una sincronización completa, una sola)
+        grupos: Dict[Tuple[str, ...], List[dict]] = defaultdict(list)
+        for valores in filas.values():
+            grupos[tuple(sorted(valores))].append(valores)
+        for columnas, lote in grupos.items():
+            stmt = insert(Persona)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Persona.tenant_id, Persona.usuario_id],
+                set_=_cambios_upsert(stmt, [c for c in columnas if c != "usuario_id"])
+            )
+            execute_or_raise(db, stmt, lote)
+
+        facetas_directorio.invalidar(db.info.get("tenant_id"))
+        creadas = sum(1 for usuario_id in filas if existentes[usuario_id] is None)
+        return creadas, len(filas) - creadas, conflictos
+
+    @staticmethod
+    def set_foto_perfil(db: Session, persona: Persona, foto_url: str) -> Persona:
+        """Apuntar la foto de perfil a una imagen ya almacenada"""
+        persona.foto_perfil = foto_url
+        flush_or_raise(db)
+        return persona
 
     @staticmethod
     def delete_persona(db: Session, usuario_id: int) -> bool:
@@ -96,6 +417,7 @@ class PersonaService:
                 detail="Persona no encontrada"
             )
         
+        facetas_directorio.invalidar(db.info.get("tenant_id"))
         db.delete(db_persona)
-        db.commit()
+        flush_or_raise(db)
         return True
@@ -0,0 +1,126 @@
+"""
+Jerarquía de roles (herencia de permisos y módulos).
+
+Cada rol tiene a lo sumo un padre (`Rol.parent_id`) y hereda todo lo que
+tienen sus ancestros. La clausura transitiva (`rol_jerarquia`) se actualiza
+de forma incremental en cada cambio, con sentencias sobre el subárbol del
+rol movido y sin recorrer la jerarquía en Python:
+
+- al crear un rol: su fila propia y las de los ancestros del padre;
+- al cambiar el padre: se borran los pares (ancestro anterior, subárbol) y se
+  insertan (ancestros del padre nuevo) x (subárbol);
+- al eliminar un rol: sus descendientes se desvinculan de él y de sus
+  ancestros (sus propias filas las borra el ON DELETE CASCADE).
+
+Un rol inactivo corta la herencia: lo que otorgan él y sus ancestros no
+llega a sus descendientes (`queries.cadena_activa`, al leer; la clausura no
+cambia al activar o desactivar).
+
+Los ciclos se rechazan en la escritura: el padre nuevo no puede ser el rol
+ni uno de sus descendientes (una búsqueda en la clausura). Los cambios se
+serializan por tenant (`bloquear_tenant`).
+"""
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import delete, distinct, exists, insert, literal, select, true
+from sqlalchemy.orm import Session, aliased
+from app.core.tenancy import bloquear_tenant
+from app.models.rol import Rol
+from app.models.rol_jerarquia import RolJerarquia
+from app.services.eventos_acceso import topico_rol
+
+
+def descendientes(db: Session, rol_ids: Iterable[int]) -> List[int]:
+    """Roles que heredan de alguno de `rol_ids`, incluidos ellos mismos"""
+    rol_ids = list(rol_ids)
+    if not rol_ids:
+        return []
+    return db.execute(
+        select(distinct(RolJerarquia.descendiente_id)).where(RolJerarquia.ancestro_id.in_(rol_ids))
+    ).scalars().all()
+
+
+def topicos_herederos(db: Session, rol_ids: Iterable[int]) -> List[str]:
+    """Tópicos de eventos de los roles y de todos los que heredan de ellos"""
+    return [topico_rol(r) for r in descendientes(db, rol_ids)]
+
+
+def validar_padre(db: Session, parent_id: int, rol_id: Optional[int] = None) -> None:
+    """400 si el padre no existe (en el tenant) o si cerraría un ciclo"""
+    if db.get(Rol, parent_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El rol padre no existe"
+        )
+    if rol_id is None:
+        return
+    ciclo = parent_id == rol_id or db.execute(select(exists().where(
+        RolJerarquia.ancestro_id == rol_id,
+        RolJerarquia.descendiente_id == parent_id
+    ))).scalar()
+    if ciclo:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Un rol no puede heredar de sí mismo ni de uno de sus descendientes"
+        )
+
+
+def _enlazar(db: Session, rol_id: int, parent_id: int) -> None:
+    """Pares (ancestros del padre, incluido el padre) x (subárbol del rol)"""
+    arriba = aliased(RolJerarquia)
+    abajo = aliased(RolJerarquia)
+    db.execute(insert(RolJerarquia).from_select(
+        ["tenant_id", "ancestro_id", "descendiente_id", "profundidad"],
+        select(
+            arriba.tenant_id,
+            arriba.ancestro_id,
+            abajo.descendiente_id,
+            arriba.profundidad + abajo.profundidad + 1
+        ).select_from(arriba).join(abajo, true())
+        .where(arriba.descendiente_id == parent_id, abajo.ancestro_id == rol_id)
+    ))
+
+
+def _desenlazar(db: Session, rol_id: int, incluir_rol: bool) -> None:
+    """
+    Borrar los pares que unen el subárbol del rol con sus ancestros.
+    Con `incluir_rol` también los del propio rol con sus descendientes
+    (el rol deja de existir y sus hijos quedan sin padre).
+    """
+    subarbol = select(RolJerarquia.descendiente_id).where(RolJerarquia.ancestro_id == rol_id)
+    ancestros = select(RolJerarquia.ancestro_id).where(RolJerarquia.descendiente_id == rol_id)
+    if incluir_rol:
+        subarbol = subarbol.where(RolJerarquia.descendiente_id != rol_id)
+    else:
+        ancestros = ancestros.where(RolJerarquia.ancestro_id != rol_id)
+    db.execute(
+        delete(RolJerarquia)
+        .where(RolJerarquia.descendiente_id.in_(subarbol), RolJerarquia.ancestro_id.in_(ancestros))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def agregar(db: Session, rol_id: int, parent_id: Optional[int]) -> None:
+    """Filas de un rol recién creado (ya con id; el padre ya validado)"""
+    db.execute(insert(RolJerarquia).from_select(
+        ["tenant_id", "ancestro_id", "descendiente_id", "profundidad"],
+        select(Rol.tenant_id, Rol.id, Rol.id, literal(0)).where(Rol.id == rol_id)
+    ))
+    if parent_id is not None:
+        _enlazar(db, rol_id, parent_id)
+
+
+def mover(db: Session, rol_id: int, parent_id: Optional[int]) -> None:
+    """Cambiar el padre del rol (None: sin padre) actualizando la clausura"""
+    bloquear_tenant(db)
+    if parent_id is not None:
+        validar_padre(db, parent_id, rol_id)
+    _desenlazar(db, rol_id, incluir_rol=False)
+    if parent_id is not None:
+        _enlazar(db, rol_id, parent_id)
+
+
+def quitar(db: Session, rol_id: int) -> None:
+    """Desvincular los descendientes de un rol que se va a eliminar"""
+    bloquear_tenant(db)
+    _desenlazar(db, rol_id, incluir_rol=True)
@@ -1,17 +1,25 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from sqlalchemy.engine import RowMapping
 from typing import List, Optional
 from fastapi import HTTPException, status
 from app.models.rol import Rol
 from app.models.rol_permiso import RolPermiso
 from app.models.rol_modulo import RolModulo
-from app.schemas.rol import RolCreate, RolUpdate
+from app.schemas.rol import RolCreate, RolUpdate, RolBulkUpdate
+from app.db import queries
+from app.services.bulk import actualizar_en_lote, condicion_ids
+from app.services.audit_log import instantanea, registrar
+from app.services.eventos_acceso import notificar
+from app.services import rol_jerarquia
+from app.services.integrity import flush_or_raise
 
 
 class RolService:
     @staticmethod
     def get_rol(db: Session, rol_id: int) -> Optional[Rol]:
         """Obtener rol por ID"""
-        return db.query(Rol).filter(Rol.id == rol_id).first()
+        return db.get(Rol, rol_id)
 
     @staticmethod
     def get_rol_by_nombre(db: Session, nombre: str) -> Optional[Rol]:
@@ -24,36 +32,42 @@ class RolService:
         skip: int = 0,
         limit: int = 100,
         is_active: Optional[bool] = None
-    ) -> List[Rol]:
-        """Obtener lista de roles"""
-        query = db.query(Rol)
+    ) -> List[RowMapping]:
+        """Obtener lista de roles (solo columnas de respuesta)"""
+        query = queries.ROLES_LISTA
         if is_active is not None:
-            query = query.filter(Rol.is_active == is_active)
-        return query.offset(skip).limit(limit).all()
+            query = query.where(Rol.is_active == is_active)
+        return db.execute(query.offset(skip).limit(limit)).mappings().all()
+
+    @staticmethod
+    def get_roles_by_ids(db: Session, ids: List[int]) -> List[RowMapping]:
+        """Obtener varios roles por ID en una sola consulta (sin orden garantizado)"""
+        return queries.filas_por_ids(db, queries.ROLES_LISTA, Rol, ids)
 
     @staticmethod
     def create_rol(db: Session, rol: RolCreate) -> Rol:
-        """Crear nuevo rol"""
-        if RolService.get_rol_by_nombre(db, rol.nombre):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El nombre del rol ya existe"
-            )
-        
+        """Crear nuevo rol (nombre único se valida por constraint)"""
+        if rol.parent_id is not None:
+            rol_jerarquia.validar_padre(db, rol.parent_id)
         db_rol = Rol(
             nombre=rol.nombre,
             descripcion=rol.descripcion,
-            is_active=rol.is_active
+            is_active=rol.is_active,
+            parent_id=rol.parent_id
         )
         db.add(db_rol)
-        db.commit()
-        db.refresh(db_rol)
+        flush_or_raise(db)
+        rol_jerarquia.agregar(db, db_rol.id, rol.parent_id)
         
         # Asignar permisos
         if rol.permiso_ids:
-            RolService.asignar_permisos(db, db_rol.id, rol.permiso_ids)
-            db.refresh(db_rol)
+            db.add_all([
+                RolPermiso(rol_id=db_rol.id, permiso_id=permiso_id, is_active=True)
+                for permiso_id in rol.permiso_ids
+            ])
+            flush_or_raise(db)
         
+        registrar(db, "create", Rol, db_rol.id, despues={**instantanea(db_rol), "permiso_ids": rol.permiso_ids or []})
         return db_rol
 
     @staticmethod
@@ -66,12 +80,8 @@ class RolService:
                 detail="Rol no encontrado"
             )
         
+        antes = instantanea(db_rol)
         if rol_update.nombre and rol_update.nombre != db_rol.nombre:
-            if RolService.get_rol_by_nombre(db, rol_update.nombre):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El nombre del rol ya existe"
-                )
             db_rol.nombre = rol_update.nombre
         
         if rol_update.descripcion is not None:
@@ -79,25 +89,59 @@ class RolService:
         if rol_update.is_active is not None:
             db_rol.is_active = rol_update.is_active
         
+        # parent_id explícito en null: el rol deja de heredar
+        nuevo_padre = "parent_id" in rol_update.model_fields_set and rol_update.parent_id != db_rol.parent_id
+        if nuevo_padre:
+            rol_jerarquia.mover(db, rol_id, rol_update.parent_id)
+            db_rol.parent_id = rol_update.parent_id
+        
         if rol_update.permiso_ids is not None:
-            RolService.asignar_permisos(db, rol_id, rol_update.permiso_ids)
+            RolService._reemplazar_permisos(db, db_rol, rol_update.permiso_ids)
         
-        db.commit()
-        db.refresh(db_rol)
+        flush_or_raise(db)
+        despues = instantanea(db_rol)
+        registrar(db, "update", Rol, rol_id, antes, despues)
+        if antes["is_active"] != despues["is_active"]:
+            notificar(db, rol_jerarquia.topicos_herederos(db, [rol_id]), "rol", rol_id=rol_id, is_active=despues["is_active"])
+        elif nuevo_padre:
+            notificar(db, rol_jerarquia.topicos_herederos(db, [rol_id]), "permisos", rol_id=rol_id)
         return db_rol
 
+    @staticmethod
+    def bulk_update_roles(db: Session, datos: RolBulkUpdate) -> int:
+        """Actualizar roles en lote con un único UPDATE; devuelve los afectados"""
+        filtro = datos.filtro
+        condiciones = condicion_ids(Rol, filtro.ids)
+        if filtro.is_active is not None:
+            condiciones.append(Rol.is_active == filtro.is_active)
+
+        cambios = datos.cambios.model_dump(exclude_none=True)
+        ids = actualizar_en_lote(db, Rol, condiciones, cambios, filtro=filtro.model_dump(exclude_none=True))
+        if "is_active" in cambios:
+            notificar(db, rol_jerarquia.topicos_herederos(db, ids), "rol", is_active=cambios["is_active"])
+        return len(ids)
+
     @staticmethod
     def delete_rol(db: Session, rol_id: int) -> bool:
         """Eliminar rol"""
-        db_rol = RolService.get_rol(db, rol_id)
-        if not db_rol:
+        # Roles que heredaban de él, antes de desvincularlos
+        topicos = rol_jerarquia.topicos_herederos(db, [rol_id])
+        rol_jerarquia.quitar(db, rol_id)
+        
+        # Un único DELETE: las filas relacionadas las borra la base de datos
+        # (ON DELETE CASCADE + passive_deletes), sin cargarlas en memoria
+        # (RETURNING: el estado previo para la auditoría sale del mismo DELETE)
+        eliminado = db.execute(
+            delete(Rol).where(Rol.id == rol_id).returning(*Rol.__table__.c)
+        ).mappings().first()
+        if not eliminado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Rol no encontrado"
             )
         
-        db.delete(db_rol)
-        db.commit()
+        registrar(db, "delete", Rol, rol_id, antes=dict(eliminado))
+        notificar(db, topicos, "rol", rol_id=rol_id, eliminado=True)
         return True
 
     @staticmethod
@@ -110,20 +154,7 @@ class RolService:
                 detail="Rol no encontrado"
             )
         
-        # Eliminar asignaciones existentes
-        db.query(RolPermiso).filter(RolPermiso.rol_id == rol_id).delete()
-        
-        # Crear nuevas asignaciones
-        for permiso_id in permiso_ids:
-            rol_permiso = RolPermiso(
-                rol_id=rol_id,
-                permiso_id=permiso_id,
-                is_active=True
-            )
-            db.add(rol_permiso)
-        
-        db.commit()
-        db.refresh(db_rol)
+        RolService._reemplazar_permisos(db, db_rol, permiso_ids)
         return db_rol
 
     @staticmethod
@@ -136,18 +167,46 @@ class RolService:
                 detail="Rol no encontrado"
             )
         
-        # Eliminar asignaciones existentes
-        db.query(RolModulo).filter(RolModulo.rol_id == rol_id).delete()
+        # Eliminar asignaciones existentes (RETURNING: las anteriores, para la auditoría)
+        anteriores = db.execute(
+            delete(RolModulo).where(RolModulo.rol_id == rol_id).returning(RolModulo.modulo_id)
+        ).scalars().all()
         
         # Crear nuevas asignaciones
-        for modulo_id in modulo_ids:
-            rol_modulo = RolModulo(
-                rol_id=rol_id,
-                modulo_id=modulo_id,
-                is_active=True
-            )
-            db.add(rol_modulo)
+        db.add_all([
+            RolModulo(rol_id=rol_id, modulo_id=modulo_id, is_active=True)
+            for modulo_id in modulo_ids
+        ])
+        flush_or_raise(db)
+        registrar(
+            db, "asignar_modulos", Rol, rol_id,
+            {"modulo_ids": sorted(anteriores)}, {"modulo_ids": sorted(modulo_ids)}
+        )
+        notificar(db, rol_jerarquia.topicos_herederos(db, [rol_id]), "modulos", rol_id=rol_id)
         
-        db.commit()
-        db.refresh(db_rol)
+        # La colección se recarga en el próximo acceso
+        db.expire(db_rol, ["modulos"])
         return db_rol
+
+    @staticmethod
+    def _reemplazar_permisos(db: Session, db_rol: Rol, permiso_ids: List[int]):
+        """Reemplazar las asignaciones de permisos de un rol ya cargado"""
+        # Eliminar asignaciones existentes (RETURNING: las anteriores, para la auditoría)
+        anteriores = db.execute(
+            delete(RolPermiso).where(RolPermiso.rol_id == db_rol.id).returning(RolPermiso.permiso_id)
+        ).scalars().all()
+        
+        # Crear nuevas asignaciones
+        db.add_all([
+            RolPermiso(rol_id=db_rol.id, permiso_id=permiso_id, is_active=True)
+            for permiso_id in permiso_ids
+        ])
+        flush_or_raise(db)
+        registrar(
+            db, "asignar_permisos", Rol, db_rol.id,
+            {"permiso_ids": sorted(anteriores)}, {"permiso_ids": sorted(permiso_ids)}
+        )
+        notificar(db, rol_jerarquia.topicos_herederos(db, [db_rol.id]), "permisos", rol_id=db_rol.id)
+        
+        # La colección se recarga en el próximo acceso
+        db.expire(db_rol, ["permisos"])
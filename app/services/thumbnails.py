@@ -0,0 +1,91 @@
+"""
+Generación de miniaturas en un pool de procesos.
+
+Redimensionar una imagen es CPU pura: se hace en procesos aparte para no
+competir con el event loop ni con el GIL de los workers HTTP. El request de
+subida solo encola el trabajo y responde; mientras la miniatura no existe,
+el endpoint de descarga sirve la imagen original.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def generar_miniaturas(origen: str, destinos: List[Tuple[int, str]]) -> int:
+    """Ejecutado en el proceso hijo: una miniatura JPEG por (tamaño, destino)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(origen) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        if imagen.mode not in ("RGB", "L"):
+            imagen = imagen.convert("RGB")
+        for size, destino in destinos:
+            copia = imagen.copy()
+            copia.thumbnail((size, size))
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporal = f"{destino}.{os.getpid()}.tmp"
+            copia.save(temporal, "JPEG", quality=85, optimize=True)
+            os.replace(temporal, destino)
+    return len(destinos)
+
+
+class ThumbnailPool:
+    """Pool de procesos para miniaturas, con contadores para /metrics"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.generated = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self.workers > 0 and self._executor is None:
+            # spawn: los hijos no heredan hilos ni conexiones del proceso web
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, origen: str, destinos: List[Tuple[int, str]]) -> bool:
+        """Encolar miniaturas; False si el pool no está activo o no hay nada que hacer"""
+        if self._executor is None or not destinos:
+            return False
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(generar_miniaturas, origen, destinos)
+        future.add_done_callback(self._terminado)
+        return True
+
+    def _terminado(self, future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.generated += future.result()
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Error generando miniaturas: %s", future.exception())
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "pending": self.pending,
+            "generated": self.generated,
+            "failed": self.failed,
+        }
+
+
+thumbnails = ThumbnailPool(settings.FOTO_THUMBNAIL_WORKERS)
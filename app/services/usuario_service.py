@@ -1,25 +1,47 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import or_, select, delete
+from sqlalchemy.engine import RowMapping
+from typing import List, Optional, Union
 from fastapi import HTTPException, status
+from app.models.modulo import Modulo
 from app.models.usuario import Usuario
-from app.models.usuario_rol import UsuarioRol
+from app.models.usuario_rol import UsuarioRol, utc
 from app.models.rol_modulo import RolModulo
-from app.schemas.usuario import UsuarioCreate, UsuarioUpdate
+from app.schemas.usuario import UsuarioCreate, UsuarioUpdate, UsuarioResponse, UsuarioBulkUpdate, RolAsignacion
+from app.core.database import SessionLocal
 from app.core.security import get_password_hash
-from datetime import datetime
+from app.db import queries
+from app.services.bulk import actualizar_en_lote, condicion_ids
+from app.services.audit_log import instantanea, registrar
+from app.services.eventos_acceso import notificar, topico_usuario
+from app.services.integrity import flush_or_raise
+from app.services.last_login_buffer import last_login_buffer
+from app.services.modulo_service import ModuloService
+from app.services import vigencia_roles
+from datetime import datetime, timezone
 
 
 class UsuarioService:
     @staticmethod
     def get_usuario(db: Session, usuario_id: int) -> Optional[Usuario]:
         """Obtener usuario por ID"""
-        return db.query(Usuario).filter(Usuario.id == usuario_id).first()
+        return db.get(Usuario, usuario_id)
 
     @staticmethod
     def get_usuario_by_username(db: Session, username: str) -> Optional[Usuario]:
         """Obtener usuario por username"""
-        return db.query(Usuario).filter(Usuario.username == username).first()
+        return queries.usuario_por_username(db, username)
+
+    @staticmethod
+    def get_rol_ids(db: Session, usuario_id: int) -> List[int]:
+        """Ids de los roles vigentes asignados al usuario"""
+        return db.execute(
+            select(UsuarioRol.rol_id).where(
+                UsuarioRol.usuario_id == usuario_id,
+                UsuarioRol.vigente
+            )
+        ).scalars().all()
 
     @staticmethod
     def get_usuario_by_email(db: Session, email: str) -> Optional[Usuario]:
@@ -31,13 +53,17 @@ class UsuarioService:
         db: Session,
         skip: int = 0,
         limit: int = 100,
-        search: Optional[str] = None
-    ) -> List[Usuario]:
-        """Obtener lista de usuarios con paginación y búsqueda"""
-        query = db.query(Usuario)
-        
+        search: Optional[str] = None,
+        campos: Optional[List[str]] = None
+    ) -> List[RowMapping]:
+        """Obtener lista de usuarios con paginación y búsqueda (solo columnas de respuesta)"""
+        if campos is None:
+            query = queries.USUARIOS_LISTA
+        else:
+            query = select(*queries.columnas_respuesta(Usuario, UsuarioResponse, campos))
+
         if search:
-            query = query.filter(
+            query = query.where(
                 or_(
                     Usuario.username.ilike(f"%{search}%"),
                     Usuario.email.ilike(f"%{search}%"),
@@ -45,25 +71,16 @@ class UsuarioService:
                 )
             )
         
-        return query.offset(skip).limit(limit).all()
+        return db.execute(query.offset(skip).limit(limit)).mappings().all()
+
+    @staticmethod
+    def get_usuarios_by_ids(db: Session, ids: List[int]) -> List[RowMapping]:
+        """Obtener varios usuarios por ID en una sola consulta (sin orden garantizado)"""
+        return queries.filas_por_ids(db, queries.USUARIOS_LISTA, Usuario, ids)
 
     @staticmethod
     def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
-        """Crear nuevo usuario"""
-        # Verificar si username existe
-        if UsuarioService.get_usuario_by_username(db, usuario.username):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El username ya está en uso"
-            )
-        
-        # Verificar si email existe
-        if UsuarioService.get_usuario_by_email(db, usuario.email):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El email ya está en uso"
-            )
-        
+        """Crear nuevo usuario (username y email únicos se validan por constraint)"""
         # Crear usuario
         db_usuario = Usuario(
             username=usuario.username,
@@ -73,21 +90,15 @@ class UsuarioService:
             is_active=usuario.is_active
         )
         
+        asignaciones = UsuarioService._asignaciones(usuario.rol_ids or [])
         db.add(db_usuario)
-        db.flush()
+        flush_or_raise(db)
         
         # Asignar roles si se proporcionan
-        if usuario.rol_ids:
-            for rol_id in usuario.rol_ids:
-                usuario_rol = UsuarioRol(
-                    usuario_id=db_usuario.id,
-                    rol_id=rol_id,
-                    is_active=True
-                )
-                db.add(usuario_rol)
+        if asignaciones:
+            UsuarioService._agregar_roles(db, db_usuario.id, asignaciones)
         
-        db.commit()
-        db.refresh(db_usuario)
+        registrar(db, "create", Usuario, db_usuario.id, despues={**instantanea(db_usuario), **UsuarioService._resumen_roles(asignaciones)})
         return db_usuario
 
     @staticmethod
@@ -104,22 +115,11 @@ class UsuarioService:
                 detail="Usuario no encontrado"
             )
         
-        # Verificar username único
+        antes = instantanea(db_usuario)
+        # Username y email únicos se validan por constraint al hacer flush
         if usuario_update.username and usuario_update.username != db_usuario.username:
-            if UsuarioService.get_usuario_by_username(db, usuario_update.username):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El username ya está en uso"
-                )
             db_usuario.username = usuario_update.username
-        
-        # Verificar email único
         if usuario_update.email and usuario_update.email != db_usuario.email:
-            if UsuarioService.get_usuario_by_email(db, usuario_update.email):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El email ya está en uso"
-                )
             db_usuario.email = usuario_update.email
         
         # Actualizar otros campos
@@ -132,31 +132,71 @@ class UsuarioService:
         
         # Actualizar roles si se proporcionan
         if usuario_update.rol_ids is not None:
-            UsuarioService.asignar_roles(db, usuario_id, usuario_update.rol_ids)
+            UsuarioService._reemplazar_roles(db, db_usuario, usuario_update.rol_ids)
         
-        db.commit()
-        db.refresh(db_usuario)
+        flush_or_raise(db)
+        despues = instantanea(db_usuario)
+        if usuario_update.password is not None:
+            # El hash no se registra, solo que hubo cambio de contraseña
+            despues["password"] = "cambiada"
+        registrar(db, "update", Usuario, usuario_id, antes, despues)
+        if antes["is_active"] != despues["is_active"]:
+            notificar(db, [topico_usuario(usuario_id)], "cuenta", is_active=despues["is_active"])
         return db_usuario
 
+    @staticmethod
+    def bulk_update_usuarios(
+        db: Session,
+        datos: UsuarioBulkUpdate,
+        excluir_id: Optional[int] = None
+    ) -> int:
+        """Actualizar usuarios en lote con un único UPDATE; devuelve los afectados"""
+        filtro = datos.filtro
+        condiciones = condicion_ids(Usuario, filtro.ids)
+        if filtro.rol_id is not None:
+            condiciones.append(Usuario.id.in_(
+                select(UsuarioRol.usuario_id).where(
+                    UsuarioRol.rol_id == filtro.rol_id,
+                    UsuarioRol.vigente
+                )
+            ))
+        if filtro.is_active is not None:
+            condiciones.append(Usuario.is_active == filtro.is_active)
+
+        # El usuario que hace el cambio no se modifica a sí mismo en lote
+        if condiciones and excluir_id is not None:
+            condiciones.append(Usuario.id != excluir_id)
+
+        cambios = datos.cambios.model_dump(exclude_none=True)
+        ids = actualizar_en_lote(db, Usuario, condiciones, cambios, filtro=filtro.model_dump(exclude_none=True))
+        if "is_active" in cambios:
+            notificar(db, [topico_usuario(i) for i in ids], "cuenta", is_active=cambios["is_active"])
+        return len(ids)
+
     @staticmethod
     def delete_usuario(db: Session, usuario_id: int) -> bool:
         """Eliminar usuario"""
-        db_usuario = UsuarioService.get_usuario(db, usuario_id)
-        if not db_usuario:
+        # Un único DELETE: las filas relacionadas las borra la base de datos
+        # (ON DELETE CASCADE + passive_deletes), sin cargarlas en memoria
+        # (RETURNING: el estado previo para la auditoría sale del mismo DELETE)
+        eliminado = db.execute(
+            delete(Usuario).where(Usuario.id == usuario_id).returning(*Usuario.__table__.c)
+        ).mappings().first()
+        if not eliminado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
             )
         
-        db.delete(db_usuario)
-        db.commit()
+        registrar(db, "delete", Usuario, usuario_id, antes=dict(eliminado))
+        notificar(db, [topico_usuario(usuario_id)], "cuenta", eliminado=True)
         return True
 
     @staticmethod
     def asignar_roles(
         db: Session,
         usuario_id: int,
-        rol_ids: List[int]
+        rol_ids: List[Union[int, RolAsignacion]]
     ) -> Usuario:
         """Asignar roles a usuario"""
         db_usuario = UsuarioService.get_usuario(db, usuario_id)
@@ -166,51 +206,129 @@ class UsuarioService:
                 detail="Usuario no encontrado"
             )
         
-        # Eliminar asignaciones existentes
-        db.query(UsuarioRol).filter(UsuarioRol.usuario_id == usuario_id).delete()
-        
-        # Crear nuevas asignaciones
-        for rol_id in rol_ids:
-            usuario_rol = UsuarioRol(
+        UsuarioService._reemplazar_roles(db, db_usuario, rol_ids)
+        return db_usuario
+
+    @staticmethod
+    def _asignaciones(rol_ids: List[Union[int, RolAsignacion]]) -> List[RolAsignacion]:
+        """Normalizar ids y asignaciones temporales (fechas en UTC, período válido)"""
+        asignaciones = []
+        for item in rol_ids:
+            if isinstance(item, int):
+                item = RolAsignacion(rol_id=item)
+            desde, hasta = utc(item.valid_from), utc(item.valid_until)
+            if desde is not None and hasta is not None and hasta <= desde:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="valid_until debe ser posterior a valid_from"
+                )
+            asignaciones.append(RolAsignacion.model_construct(rol_id=item.rol_id, valid_from=desde, valid_until=hasta))
+        return asignaciones
+
+    @staticmethod
+    def _agregar_roles(db: Session, usuario_id: int, asignaciones: List[RolAsignacion]):
+        """Insertar asignaciones y programar sus inicios y vencimientos"""
+        ahora = datetime.now(timezone.utc)
+        db.add_all([
+            UsuarioRol(
                 usuario_id=usuario_id,
-                rol_id=rol_id,
-                is_active=True
+                rol_id=a.rol_id,
+                is_active=True,
+                valid_from=a.valid_from,
+                valid_until=a.valid_until,
+                inicio_pendiente=a.valid_from is not None and a.valid_from > ahora
             )
-            db.add(usuario_rol)
+            for a in asignaciones
+        ])
+        flush_or_raise(db)
+        vigencia_roles.programar(db, usuario_id, asignaciones)
+
+    @staticmethod
+    def _resumen_roles(asignaciones) -> dict:
+        """Roles para la auditoría: ids y, si las hay, las vigencias"""
+        resumen = {"rol_ids": sorted(a.rol_id for a in asignaciones)}
+        vigencias = {
+            a.rol_id: {"valid_from": a.valid_from, "valid_until": a.valid_until}
+            for a in asignaciones
+            if a.valid_from is not None or a.valid_until is not None
+        }
+        if vigencias:
+            resumen["vigencias"] = vigencias
+        return resumen
+
+    @staticmethod
+    def _reemplazar_roles(db: Session, db_usuario: Usuario, rol_ids: List[Union[int, RolAsignacion]]):
+        """Reemplazar las asignaciones de roles de un usuario ya cargado"""
+        asignaciones = UsuarioService._asignaciones(rol_ids)
+        # Eliminar asignaciones existentes (RETURNING: las anteriores, para la auditoría)
+        anteriores = db.execute(
+            delete(UsuarioRol).where(UsuarioRol.usuario_id == db_usuario.id)
+            .returning(UsuarioRol.rol_id, UsuarioRol.valid_from, UsuarioRol.valid_until)
+        ).all()
         
-        db.commit()
-        db.refresh(db_usuario)
-        return db_usuario
+        # Crear nuevas asignaciones
+        UsuarioService._agregar_roles(db, db_usuario.id, asignaciones)
+        registrar(
+            db, "asignar_roles", Usuario, db_usuario.id,
+            UsuarioService._resumen_roles(anteriores), UsuarioService._resumen_roles(asignaciones)
+        )
+        # Solo los roles ya vigentes; los que empiezan después los avisa el programador
+        ahora = datetime.now(timezone.utc)
+        vigentes = {
+            a.rol_id for a in asignaciones
+            if (a.valid_from is None or a.valid_from <= ahora) and (a.valid_until is None or a.valid_until > ahora)
+        }
+        notificar(db, [topico_usuario(db_usuario.id)], "roles", rol_ids=sorted(vigentes))
+        
+        # La colección se recarga en el próximo acceso
+        db.expire(db_usuario, ["roles"])
 
     @staticmethod
     def get_modulos_from_roles(db: Session, usuario_id: int) -> List:
         """
-        Obtener módulos del usuario calculados desde sus roles.
+        Obtener módulos del usuario calculados desde sus roles (incluidos los
+        heredados de roles padre), en una sola consulta.
         Si un módulo está en múltiples roles, se incluye una sola vez.
+        El acceso a un submódulo incluye los menús que lo contienen: los
+        ancestros que falten salen del camino y se cargan en una consulta IN.
         """
-        from app.models.modulo import Modulo
-        
-        db_usuario = UsuarioService.get_usuario(db, usuario_id)
-        if not db_usuario:
-            return []
-        
-        # Obtener todos los módulos de los roles activos del usuario
-        modulos_ids = set()
-        modulos_list = []
-        
-        for usuario_rol in db_usuario.roles:
-            if usuario_rol.is_active and usuario_rol.rol.is_active:
-                for rol_modulo in usuario_rol.rol.modulos:
-                    if rol_modulo.is_active and rol_modulo.modulo.is_active:
-                        if rol_modulo.modulo_id not in modulos_ids:
-                            modulos_ids.add(rol_modulo.modulo_id)
-                            modulos_list.append(rol_modulo.modulo)
-        
-        return modulos_list
+        modulos = queries.modulos_de_usuario(db, usuario_id)
+        presentes = {m.id for m in modulos}
+        faltantes = {a for m in modulos for a in ModuloService.ancestro_ids(m.camino)} - presentes
+        if not faltantes:
+            return modulos
+        ancestros = db.execute(
+            select(Modulo).where(Modulo.id.in_(faltantes), Modulo.is_active == True)
+        ).scalars().all()
+        return sorted([*modulos, *ancestros], key=lambda m: (m.orden, m.id))
 
     @staticmethod
     def update_last_login(db: Session, usuario: Usuario):
-        """Actualizar último login"""
-        usuario.last_login = datetime.utcnow()
-        db.commit()
-        db.refresh(usuario)
+        """
+        Actualizar último login.
+        El valor se encola y se escribe en lote (ver LastLoginBuffer); en el objeto
+        se asigna sin marcarlo como modificado para que la respuesta lo refleje.
+        """
+        ahora = datetime.now(timezone.utc)
+        last_login_buffer.record(usuario.id, ahora)
+        set_committed_value(usuario, "last_login", ahora)
+
+    @staticmethod
+    def rehash_password(usuario_id: int, old_hash: str, password: str):
+        """
+        Recalcular el hash de la contraseña con la configuración actual.
+        Se ejecuta como tarea en segundo plano tras el login, con su propia sesión.
+        Solo se escribe si el hash no cambió mientras tanto.
+        """
+        db = SessionLocal()
+        try:
+            db.query(Usuario).filter(
+                Usuario.id == usuario_id,
+                Usuario.hashed_password == old_hash
+            ).update(
+                {Usuario.hashed_password: get_password_hash(password)},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,311 @@
+"""
+Vigencia de las asignaciones de roles (valid_from / valid_until).
+
+Las consultas de acceso ya filtran por fecha (`UsuarioRol.vigente`), así que
+una asignación vencida deja de otorgar acceso en el instante exacto. El
+programador se ocupa del resto:
+
+- al vencer, desactiva las asignaciones en UPDATEs por lotes;
+- al vencer o empezar una asignación, emite el evento `roles` del usuario con
+  sus rol_ids vigentes (invalida el cache de permisos y reindexa sus
+  conexiones SSE, igual que al asignar roles).
+
+Todos los workers tienen los mismos instantes; cada aviso lo emite solo el
+que gana un UPDATE condicional (`is_active` al vencer, `inicio_pendiente` al
+empezar), para que los clientes no reciban el evento una vez por worker.
+
+Los instantes pendientes están en un min-heap en memoria y el hilo duerme
+hasta el primero, sin sondear la tabla. Los servicios anotan los instantes
+nuevos en la sesión (`programar`) y entran al heap al confirmarse la
+transacción. Cada VIGENCIA_RELOAD_SECONDS se releen de la base los próximos
+(los escritos por otros workers o antes de un reinicio); los más lejanos
+quedan para una recarga posterior y no ocupan memoria.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, event, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.usuario_rol import UsuarioRol, utc
+from app.services.eventos_acceso import notificar, topico_usuario
+
+logger = logging.getLogger(__name__)
+
+# Clave de Session.info con los instantes pendientes de la transacción
+CLAVE_SESION = "vigencia_roles"
+
+INICIA = "inicia"
+VENCE = "vence"
+
+# Espera antes de reintentar tras un error de base de datos
+REINTENTO_SECONDS = 5.0
+
+Instante = Tuple[datetime, str, int]  # (cuándo, INICIA/VENCE, usuario_id)
+
+
+def instantes(usuario_id: int, valid_from: Optional[datetime], valid_until: Optional[datetime]) -> List[Instante]:
+    """Instantes de una asignación que el programador debe atender"""
+    ahora = datetime.now(timezone.utc)
+    valid_from, valid_until = utc(valid_from), utc(valid_until)
+    resultado = []
+    if valid_from is not None and valid_from > ahora:
+        resultado.append((valid_from, INICIA, usuario_id))
+    if valid_until is not None:
+        resultado.append((valid_until, VENCE, usuario_id))
+    return resultado
+
+
+def programar(db: Session, usuario_id: int, asignaciones: Iterable) -> None:
+    """Anotar los inicios y vencimientos de las asignaciones; se programan al confirmar"""
+    pendientes = [
+        instante
+        for a in asignaciones
+        for instante in instantes(usuario_id, a.valid_from, a.valid_until)
+    ]
+    if pendientes:
+        db.info.setdefault(CLAVE_SESION, []).extend(pendientes)
+
+
+def rol_ids_vigentes(db: Session, usuario_ids: Iterable[int], ahora: datetime) -> Dict[int, List[int]]:
+    """Roles vigentes en `ahora` de cada usuario (los que no tienen ninguno, lista vacía)"""
+    resultado: Dict[int, List[int]] = {u: [] for u in usuario_ids}
+    if not resultado:
+        return resultado
+    # Mismo reloj que el heap (no el now() de la base, como UsuarioRol.vigente)
+    filas = db.execute(
+        select(UsuarioRol.usuario_id, UsuarioRol.rol_id).where(
+            UsuarioRol.usuario_id.in_(list(resultado)),
+            UsuarioRol.is_active == True,
+            or_(UsuarioRol.valid_from.is_(None), UsuarioRol.valid_from <= ahora),
+            or_(UsuarioRol.valid_until.is_(None), UsuarioRol.valid_until > ahora)
+        ).order_by(UsuarioRol.rol_id)
+    ).all()
+    for fila in filas:
+        resultado[fila.usuario_id].append(fila.rol_id)
+    return resultado
+
+
+def notificar_roles(db: Session, usuario_ids: Iterable[int], ahora: datetime, vigencia: str) -> None:
+    """Evento `roles` por usuario con sus roles vigentes, para reindexar sus conexiones"""
+    for usuario_id, rol_ids in rol_ids_vigentes(db, usuario_ids, ahora).items():
+        notificar(db, [topico_usuario(usuario_id)], "roles", rol_ids=rol_ids, vigencia=vigencia)
+
+
+class ProgramadorVigencias:
+    def __init__(self, reload_interval: float, batch_size: int):
+        self.reload_interval = reload_interval
+        self.batch_size = batch_size
+        self._heap: List[Instante] = []
+        self._en_heap: Set[Instante] = set()
+        self._horizonte: Optional[datetime] = None  # hasta dónde se leyó la base
+        self._proxima_recarga = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.expired = 0
+        self.started = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_lag = 0.0
+
+    def agregar(self, pendientes: Iterable[Instante]) -> None:
+        """Agregar instantes al heap; despierta al hilo si alguno es el más próximo"""
+        with self._cond:
+            primero = self._heap[0][0] if self._heap else None
+            for instante in pendientes:
+                if instante in self._en_heap:
+                    continue
+                if self._horizonte is not None and instante[0] > self._horizonte:
+                    # Más allá de lo leído: lo trae una recarga posterior
+                    continue
+                heapq.heappush(self._heap, instante)
+                self._en_heap.add(instante)
+            if self._heap and (primero is None or self._heap[0][0] < primero):
+                self._cond.notify()
+
+    def recargar(self) -> None:
+        """Leer de la base los inicios y vencimientos hasta el próximo horizonte"""
+        ahora = datetime.now(timezone.utc)
+        # Doble del intervalo: las recargas se solapan y ninguno queda sin leer
+        horizonte = ahora + timedelta(seconds=2 * self.reload_interval)
+        db = SessionLocal()
+        try:
+            filas = db.execute(
+                select(UsuarioRol.usuario_id, UsuarioRol.valid_from, UsuarioRol.valid_until).where(
+                    UsuarioRol.is_active == True,
+                    or_(
+                        # Incluye los ya vencidos (p. ej. durante un reinicio)
+                        UsuarioRol.valid_until <= horizonte,
+                        and_(UsuarioRol.valid_from > ahora, UsuarioRol.valid_from <= horizonte)
+                    )
+                )
+            ).all()
+        finally:
+            db.close()
+
+        with self._cond:
+            self._horizonte = horizonte
+        self.agregar(i for f in filas for i in instantes(f.usuario_id, f.valid_from, f.valid_until))
+        self._proxima_recarga = time.monotonic() + self.reload_interval
+        self.reloads += 1
+
+    def expirar(self, hasta: Optional[datetime] = None) -> int:
+        """Desactivar las asignaciones vencidas en lotes de batch_size; devuelve las desactivadas"""
+        # El corte usa el mismo reloj que el heap: un desfase con el de la
+        # base no deja sin desactivar lo que el heap ya dio por vencido
+        hasta = hasta or datetime.now(timezone.utc)
+        total = 0
+        while True:
+            lote = (
+                select(UsuarioRol.id)
+                .where(UsuarioRol.is_active == True, UsuarioRol.valid_until <= hasta)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            db = SessionLocal()
+            try:
+                usuario_ids = db.execute(
+                    update(UsuarioRol)
+                    .where(UsuarioRol.id.in_(lote))
+                    .values(is_active=False)
+                    .returning(UsuarioRol.usuario_id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                notificar_roles(db, set(usuario_ids), hasta, "vencida")
+                db.commit()
+            finally:
+                db.close()
+            total += len(usuario_ids)
+            self.expired += len(usuario_ids)
+            if len(usuario_ids) < self.batch_size:
+                return total
+
+    def _iniciar(self, usuario_ids: Set[int], ahora: datetime) -> None:
+        """Avisar a los usuarios cuyas asignaciones empezaron (los que otro worker no avisó)"""
+        db = SessionLocal()
+        try:
+            # El UPDATE concurrente de otro worker espera el bloqueo de la fila
+            # y, al confirmarse este, ya no la encuentra pendiente
+            avisados = set(db.execute(
+                update(UsuarioRol)
+                .where(
+                    UsuarioRol.usuario_id.in_(usuario_ids),
+                    UsuarioRol.inicio_pendiente == True,
+                    UsuarioRol.valid_from <= ahora
+                )
+                .values(inicio_pendiente=False)
+                .returning(UsuarioRol.usuario_id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all())
+            notificar_roles(db, avisados, ahora, "iniciada")
+            db.commit()
+        finally:
+            db.close()
+        self.started += len(avisados)
+
+    def _espera(self) -> float:
+        """Segundos hasta el próximo instante o la próxima recarga"""
+        espera = self._proxima_recarga - time.monotonic()
+        if self._heap:
+            hasta = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            espera = min(espera, hasta)
+        return espera
+
+    def _procesar(self) -> None:
+        if time.monotonic() >= self._proxima_recarga:
+            self.recargar()
+
+        ahora = datetime.now(timezone.utc)
+        vencidos: List[Instante] = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= ahora:
+                instante = heapq.heappop(self._heap)
+                self._en_heap.discard(instante)
+                vencidos.append(instante)
+        if not vencidos:
+            return
+
+        self.last_lag = (ahora - vencidos[0][0]).total_seconds()
+        try:
+            if any(tipo == VENCE for _, tipo, _ in vencidos):
+                self.expirar(ahora)
+            iniciados = {usuario_id for _, tipo, usuario_id in vencidos if tipo == INICIA}
+            if iniciados:
+                self._iniciar(iniciados, ahora)
+        except Exception:
+            self.failures += 1
+            logger.exception("Error al aplicar vigencias de roles; se reintentará")
+            reintento = ahora + timedelta(seconds=REINTENTO_SECONDS)
+            self.agregar((reintento, tipo, usuario_id) for _, tipo, usuario_id in vencidos)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                espera = self._espera()
+                if espera > 0:
+                    # Duerme hasta el primer instante; agregar() lo despierta antes
+                    self._cond.wait(espera)
+            if self._stop.is_set():
+                return
+            try:
+                self._procesar()
+            except Exception:
+                self.failures += 1
+                logger.exception("Error al recargar vigencias de roles; se reintentará")
+                self._proxima_recarga = time.monotonic() + REINTENTO_SECONDS
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._proxima_recarga = 0.0
+        self._thread = threading.Thread(target=self._run, name="vigencia-roles", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el hilo (lo pendiente se relee de la base al arrancar)"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        """Métricas del programador"""
+        with self._cond:
+            pendientes = len(self._heap)
+            proximo = self._heap[0][0] if self._heap else None
+        siguiente = (proximo - datetime.now(timezone.utc)).total_seconds() if proximo else None
+        return {
+            "pending": pendientes,
+            "next_in_seconds": round(siguiente, 3) if siguiente is not None else None,
+            "last_lag_seconds": round(self.last_lag, 3),
+            "expired": self.expired,
+            "started": self.started,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+
+vigencia_roles = ProgramadorVigencias(
+    reload_interval=settings.VIGENCIA_RELOAD_SECONDS,
+    batch_size=settings.VIGENCIA_BATCH_SIZE
+)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _programar_confirmados(session: Session) -> None:
+    pendientes = session.info.pop(CLAVE_SESION, None)
+    if pendientes:
+        vigencia_roles.agregar(pendientes)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_revertidos(session: Session) -> None:
+    session.info.pop(CLAVE_SESION, None)